@@ -0,0 +1,86 @@
+"""ARIMA на каждый запрос: полная оценка параметров против обновления
+сохраненной модели (append / фильтр с прежними параметрами / теплый старт).
+
+Моделируется серия ежедневных запросов по одному тикеру: каждый день ряд
+получает новый бар, в режиме slide еще и теряет самый старый (окно
+HISTORICAL_YEARS), как в кэше котировок.
+
+Запуск из каталога src:
+    python -m benchmarks.arima_refit --days 30 --mode slide
+    python -m benchmarks.arima_refit --days 30 --mode grow --warm-iterations 5
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import warnings
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from statsmodels.tsa.arima.model import ARIMA
+from config import Config
+from models.arima_model import ARIMAModel
+from services import arima_state
+
+
+def make_prices(n: int, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    return 100 * np.exp(np.cumsum(rng.normal(0, 0.02, n)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк обновления ARIMA")
+    parser.add_argument("--bars", type=int, default=504, help="длина истории (504 - 2 года)")
+    parser.add_argument("--days", type=int, default=30, help="число запросов (дней)")
+    parser.add_argument("--mode", choices=['grow', 'slide'], default='slide')
+    parser.add_argument("--order", default='5,1,0')
+    parser.add_argument("--refit-every", type=int, default=20)
+    parser.add_argument("--warm-iterations", type=int, default=0)
+    parser.add_argument("--steps", type=int, default=30, help="горизонт прогноза для сравнения")
+    args = parser.parse_args()
+
+    warnings.filterwarnings('ignore')
+    order = tuple(int(x) for x in args.order.split(','))
+    prices = make_prices(args.bars + args.days)
+    Config.ARIMA_WARM_ITERATIONS = args.warm_iterations
+
+    cold_times, inc_times, modes, deviations = [], [], [], []
+    with tempfile.TemporaryDirectory() as state_dir:
+        arima_state._store = arima_state.ArimaStateStore(
+            directory=state_dir, refit_every=args.refit_every, refit_hours=1e9)
+        model = ARIMAModel(order=order, series_key='BENCH')
+        model.fit(None, prices[:args.bars])  # первый запрос: полная оценка
+
+        for day in range(1, args.days + 1):
+            start = day if args.mode == 'slide' else 0
+            y = prices[start:args.bars + day]
+
+            t = time.perf_counter()
+            cold = ARIMA(y, order=order).fit()
+            cold_times.append(time.perf_counter() - t)
+
+            t = time.perf_counter()
+            model.fit(None, y)
+            inc_times.append(time.perf_counter() - t)
+            modes.append(model.fit_mode)
+
+            diff = np.abs(model.forecast(None, args.steps) - cold.forecast(args.steps))
+            deviations.append(float(diff.max() / y[-1]))
+
+    cold_ms = np.mean(cold_times) * 1000
+    inc_ms = np.mean(inc_times) * 1000
+    counts = {mode: modes.count(mode) for mode in sorted(set(modes))}
+    print(f"ARIMA{order}, {args.bars} баров, {args.days} запросов, режим {args.mode}")
+    print(f"{'вариант':<24}{'мс/запрос':>12}")
+    print(f"{'полная оценка':<24}{cold_ms:>12.1f}")
+    print(f"{'обновление':<24}{inc_ms:>12.1f}   {counts}")
+    print(f"ускорение: x{cold_ms / inc_ms:.1f} ({inc_ms / cold_ms * 100:.0f}% времени полной оценки)")
+    print(f"макс. отклонение прогноза на {args.steps} шагов от полной оценки: "
+          f"{max(deviations) * 100:.3f}% цены")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+"""Сравнение форматов кэша котировок: время чтения и размер на диске.
+
+Запуск из каталога src:
+    python -m benchmarks.cache_formats --tickers 120 --days 504
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.cache_backend import (CsvCacheBackend, NumpyCacheBackend, ParquetCacheBackend,
+                                    parquet_available)
+
+
+def make_ohlcv(days: int, seed: int) -> pd.DataFrame:
+    """Синтетические котировки в формате yfinance"""
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.02, days)))
+    dates = pd.bdate_range(end='2026-01-14', periods=days, tz='America/New_York')
+    return pd.DataFrame({
+        'Open': close * (1 + rng.normal(0, 0.005, days)),
+        'High': close * 1.01,
+        'Low': close * 0.99,
+        'Close': close,
+        'Volume': rng.integers(1_000_000, 50_000_000, days).astype(float),
+        'Dividends': 0.0,
+        'Stock Splits': 0.0
+    }, index=dates.rename('Date'))
+
+
+def dir_size(path: str) -> int:
+    return sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+
+
+def run(tickers: int, days: int, repeats: int):
+    frames = {f"T{i:03d}": make_ohlcv(days, seed=i) for i in range(tickers)}
+
+    backends = [CsvCacheBackend(), NumpyCacheBackend()]
+    if parquet_available():
+        backends.append(ParquetCacheBackend())
+    else:
+        print("pyarrow недоступен, parquet пропущен")
+
+    rows = []
+    for backend in backends:
+        with tempfile.TemporaryDirectory() as cache_dir:
+            for ticker, df in frames.items():
+                backend.save(backend.path(cache_dir, ticker), df)
+
+            best = float('inf')
+            for _ in range(repeats):
+                start = time.perf_counter()
+                for ticker in frames:
+                    df = backend.load(backend.path(cache_dir, ticker))
+                    if isinstance(backend, CsvCacheBackend):
+                        # Как в DataService до перехода на бинарный формат
+                        df.index = pd.to_datetime(df.index, utc=True)
+                best = min(best, time.perf_counter() - start)
+
+            rows.append((backend.name, best, dir_size(cache_dir)))
+
+    csv_time, csv_size = rows[0][1], rows[0][2]
+    print(f"\n{tickers} тикеров x {days} баров, лучшее из {repeats} прогонов")
+    print(f"{'формат':<10}{'чтение, мс':>14}{'на тикер, мс':>16}{'размер, КБ':>14}{'x CSV (время)':>16}{'x CSV (размер)':>16}")
+    for name, elapsed, size in rows:
+        print(f"{name:<10}{elapsed * 1000:>14.1f}{elapsed * 1000 / tickers:>16.3f}"
+              f"{size / 1024:>14.1f}{csv_time / elapsed:>16.1f}{csv_size / size:>16.2f}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Бенчмарк форматов кэша DataService")
+    parser.add_argument("--tickers", type=int, default=120)
+    parser.add_argument("--days", type=int, default=504)
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+    run(args.tickers, args.days, args.repeats)
@@ -0,0 +1,100 @@
+"""Скорость построения графика прогноза: фигура с нуля на каждый запрос
+против переиспользуемой заготовки ChartRenderer.
+
+Запуск из каталога src:
+    python -m benchmarks.chart_render --renders 20
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+from io import BytesIO
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.analytics_service import AnalyticsService
+from services.chart_renderer import ChartRenderer
+
+
+def render_from_scratch(historical_prices, forecast_prices, trading_points, ticker) -> bytes:
+    """Прежний create_forecast_plot: новая фигура, оси, легенда и tight_layout на каждый вызов"""
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+    fig = Figure(figsize=(12, 6))
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
+
+    total_days = len(historical_prices) + len(forecast_prices)
+    dates = [datetime.now() - timedelta(days=total_days - i) for i in range(total_days)]
+    hist_dates = dates[:len(historical_prices)]
+    forecast_dates = dates[len(historical_prices):]
+
+    ax.plot(hist_dates, historical_prices, 'b-', label='Исторические данные', linewidth=2)
+    ax.plot(forecast_dates, forecast_prices, 'r--', label='Прогноз', linewidth=2)
+    ax.axvline(x=hist_dates[-1], color='gray', linestyle=':', alpha=0.5)
+
+    for action, color, marker, label in (('buy', 'green', '^', 'Покупка'),
+                                         ('sell', 'red', 'v', 'Продажа')):
+        points = [tp for tp in trading_points if tp.action == action]
+        if points:
+            ax.scatter([forecast_dates[tp.date_index] for tp in points],
+                       [tp.price for tp in points],
+                       color=color, s=100, marker=marker, label=label, zorder=5)
+
+    ax.set_title(f'Прогноз цен акций {ticker}', fontsize=14, fontweight='bold')
+    ax.set_xlabel('Дата')
+    ax.set_ylabel('Цена ($)')
+    ax.legend()
+    ax.grid(True, alpha=0.3)
+    ax.tick_params(axis='x', labelrotation=45)
+    fig.tight_layout()
+
+    buffer = BytesIO()
+    fig.savefig(buffer, format='png', dpi=150)
+    return buffer.getvalue()
+
+
+def make_inputs(count: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    inputs = []
+    for i in range(count):
+        history = 150 + np.cumsum(rng.normal(0, 2, 100))
+        forecast = history[-1] + np.cumsum(rng.normal(0, 2, 30))
+        inputs.append((history, forecast, AnalyticsService.find_trading_points(forecast), f"T{i}"))
+    return inputs
+
+
+def measure(render, inputs) -> float:
+    render(*inputs[0])  # прогрев: импорт matplotlib, шрифты, заготовка
+    start = time.perf_counter()
+    for args in inputs:
+        render(*args)
+    return len(inputs) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк построения графиков")
+    parser.add_argument("--renders", type=int, default=20)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    import matplotlib.pyplot  # noqa: F401
+    print(f"import matplotlib.pyplot: {time.perf_counter() - start:.2f} c (ChartRenderer его не импортирует)")
+
+    inputs = make_inputs(args.renders)
+    scratch = measure(render_from_scratch, inputs)
+    template = measure(ChartRenderer().render, inputs)
+
+    print(f"{args.renders} графиков 12x6, 150 dpi")
+    print(f"{'реализация':<22}{'графиков/с':>12}{'мс/график':>12}")
+    for name, rate in (("фигура с нуля", scratch), ("ChartRenderer", template)):
+        print(f"{name:<22}{rate:>12.2f}{1000 / rate:>12.1f}")
+    print(f"ускорение: x{template / scratch:.2f}")
+
+
+if __name__ == '__main__':
+    main()
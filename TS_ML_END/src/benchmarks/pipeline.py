@@ -0,0 +1,289 @@
+"""Время и память каждого этапа прогноза на детерминированных синтетических рядах.
+
+Память - прирост пикового RSS процесса за этап (над RSS до этапа), поэтому
+учитываются и нативные аллокации sklearn, statsmodels и torch.
+
+Этапы: preprocess_data, split_data, fit/predict/forecast каждой модели,
+AnalyticsService (точки входа, симуляция, сводка) и PlotService.
+Ряды: 2 года и 10 лет дневных котировок, месяц минутных баров.
+
+Результаты сравниваются с JSON-базой: если этап стал медленнее (или
+требует больше памяти) больше чем на --threshold, скрипт завершается с кодом 1.
+
+Запуск из каталога src:
+    python -m benchmarks.pipeline                  # сравнить с базой, если она есть
+    python -m benchmarks.pipeline --save           # записать новую базу
+    python -m benchmarks.pipeline --series daily_2y --models rf,arima
+"""
+import argparse
+import copy
+import gc
+import json
+import os
+import platform
+import statistics
+import sys
+import threading
+import time
+from typing import Callable, Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config
+from services.metrics import current_rss_bytes
+from services.data_service import DataService
+from services.analytics_service import AnalyticsService
+from services.plot_service import PlotService
+
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'pipeline_baseline.json')
+
+# Ряды: число баров и частота индекса
+SERIES = {
+    'daily_2y': (2 * 252, 'B'),
+    'daily_10y': (10 * 252, 'B'),
+    'minute_1m': (21 * 390, 'min'),
+}
+
+# Изменения меньше этих порогов считаются шумом, а не регрессией
+MIN_TIME_DELTA = 0.005
+MIN_MEMORY_DELTA = 1.0
+
+
+def make_series(name: str, seed: int = 0) -> pd.DataFrame:
+    """Синтетические котировки (геометрическое броуновское движение) в формате yfinance"""
+    bars, freq = SERIES[name]
+    rng = np.random.default_rng(seed)
+    sigma = 0.02 if freq == 'B' else 0.02 / np.sqrt(390)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, sigma, bars)))
+    # Индекс с частотой: ARIMA из statsmodels не прогнозирует по датам без freq
+    index = pd.date_range(end='2026-01-14', periods=bars, freq=freq)
+    return pd.DataFrame({
+        'Open': close * (1 + rng.normal(0, 0.002, bars)),
+        'High': close * 1.005,
+        'Low': close * 0.995,
+        'Close': close,
+        'Volume': rng.integers(1_000, 1_000_000, bars).astype(float),
+    }, index=index)
+
+
+def make_models(names: List[str]) -> Dict[str, object]:
+    """Модели с параметрами ModelSelector; недоступные (нет torch) пропускаются"""
+    models = {}
+    for name in names:
+        try:
+            if name == 'rf':
+                from models.rf_model import RandomForestModel
+                models[name] = RandomForestModel(n_estimators=100)
+            elif name == 'arima':
+                from models.arima_model import ARIMAModel
+                models[name] = ARIMAModel(order=(5, 1, 0))
+            elif name == 'lstm':
+                from models.lstm_model import PyTorchLSTMModel
+                models[name] = PyTorchLSTMModel(sequence_length=30, epochs=30)
+            else:
+                raise ValueError(f"Неизвестная модель: {name}")
+        except ImportError as e:
+            print(f"Модель {name} пропущена: {e}")
+    return models
+
+
+def _reset_peak_rss() -> bool:
+    """Сбрасывает пиковый RSS процесса (VmHWM) до текущего; False - если ядро это не позволяет"""
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def _peak_rss_bytes() -> int:
+    with open('/proc/self/status', encoding='ascii') as f:
+        for line in f:
+            if line.startswith('VmHWM:'):
+                return int(line.split()[1]) * 1024
+    raise ValueError("VmHWM не найден")
+
+
+def peak_rss_growth(func: Callable) -> int:
+    """Прирост пикового RSS за вызов func, байты.
+
+    В Linux пик сбрасывается перед вызовом и читается из VmHWM после него;
+    иначе текущий RSS опрашивается из фонового потока (короткие пики могут
+    быть пропущены).
+    """
+    gc.collect()
+    before = current_rss_bytes() or 0
+    if _reset_peak_rss():
+        func()
+        return max(0, _peak_rss_bytes() - before)
+
+    peak = before
+    done = threading.Event()
+
+    def sample():
+        nonlocal peak
+        while not done.wait(0.001):
+            peak = max(peak, current_rss_bytes() or 0)
+
+    sampler = threading.Thread(target=sample, daemon=True)
+    sampler.start()
+    try:
+        func()
+    finally:
+        done.set()
+        sampler.join()
+    return max(0, peak, current_rss_bytes() or 0) - before
+
+
+def measure(func: Callable, repeats: int) -> Tuple[Dict, object]:
+    """Прирост пикового RSS первого запуска и медиана времени по repeats следующим"""
+    # Память меряется до повторов: память, освобожденную прошлыми запусками,
+    # аллокатор не возвращает системе, и прирост RSS занижался бы
+    peak_mb = peak_rss_growth(func) / 2 ** 20
+
+    times = []
+    result = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = func()
+        times.append(time.perf_counter() - start)
+
+    return {'time': statistics.median(times), 'peak_rss_mb': peak_mb}, result
+
+
+def run_series(name: str, model_names: List[str], repeats: int) -> Dict[str, Dict]:
+    df = make_series(name)
+    data_service = DataService()
+    stages = {}
+
+    stages['preprocess'], processed = measure(lambda: data_service.preprocess_data(df), repeats)
+    stages['split'], split = measure(lambda: data_service.split_data(processed), repeats)
+    X_train, y_train, X_test, y_test, _, _ = split
+
+    forecast = None
+    for model_name, template in make_models(model_names).items():
+        # Каждый запуск обучает свежую копию, предсказания считаются последней обученной
+        def fit():
+            model = copy.deepcopy(template)
+            model.fit(X_train, y_train)
+            return model
+
+        stages[f'{model_name}.fit'], model = measure(fit, repeats)
+        stages[f'{model_name}.predict'], _ = measure(lambda: model.predict(X_test), repeats)
+        last_data = processed.iloc[-model.forecast_context():]
+        stages[f'{model_name}.forecast'], result = measure(
+            lambda: model.forecast(last_data, Config.FORECAST_DAYS), repeats)
+        if forecast is None:
+            forecast = np.asarray(result, dtype=float)
+
+    if forecast is None:
+        # Без моделей аналитика и график строятся по наивному прогнозу
+        forecast = np.full(Config.FORECAST_DAYS, processed['price'].iloc[-1])
+
+    def analytics():
+        service = AnalyticsService(investment_amount=1000)
+        points = service.find_trading_points(forecast)
+        simulation = service.simulate_trading(forecast, points)
+        return points, service.generate_summary(simulation, processed['price'].iloc[-1])
+
+    stages['analytics'], (points, _) = measure(analytics, repeats)
+
+    plot_service = PlotService(archive_dir='')
+    history = processed['price'].values[-100:]
+    # Прогрев: импорт matplotlib и заготовка фигуры создаются один раз на процесс
+    plot_service.create_forecast_plot(history, forecast, points, 'BENCH')
+    stages['plot'], _ = measure(
+        lambda: plot_service.create_forecast_plot(history, forecast, points, 'BENCH'), repeats)
+
+    return stages
+
+
+def compare(results: Dict, baseline: Dict, threshold: float) -> List[str]:
+    """Этапы, ставшие медленнее или тяжелее базы больше чем на threshold (доля)"""
+    regressions = []
+    for series, stages in results.items():
+        for stage, current in stages.items():
+            previous = baseline.get(series, {}).get(stage)
+            if previous is None:
+                continue
+            for key, unit, min_delta in (('time', 'c', MIN_TIME_DELTA), ('peak_rss_mb', 'МБ', MIN_MEMORY_DELTA)):
+                if key not in previous:
+                    continue  # база записана прежней версией бенчмарка
+                delta = current[key] - previous[key]
+                if delta > min_delta and current[key] > previous[key] * (1 + threshold):
+                    regressions.append(
+                        f"{series}/{stage}: {key} {previous[key]:.4f} -> {current[key]:.4f} {unit} "
+                        f"(+{delta / previous[key] * 100:.0f}%)"
+                    )
+    return regressions
+
+
+def print_table(results: Dict, baseline: Dict):
+    print(f"{'ряд/этап':<30}{'время, мс':>12}{'база, мс':>12}{'RSS, МБ':>10}{'база, МБ':>10}")
+    for series, stages in results.items():
+        for stage, current in stages.items():
+            previous = baseline.get(series, {}).get(stage, {})
+            base_time = f"{previous['time'] * 1000:.1f}" if previous else '-'
+            base_mem = f"{previous['peak_rss_mb']:.1f}" if 'peak_rss_mb' in previous else '-'
+            print(f"{series + '/' + stage:<30}{current['time'] * 1000:>12.1f}{base_time:>12}"
+                  f"{current['peak_rss_mb']:>10.1f}{base_mem:>10}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк этапов прогноза")
+    parser.add_argument("--series", default=','.join(SERIES), help="ряды через запятую")
+    parser.add_argument("--models", default='rf,arima,lstm', help="модели через запятую")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--baseline", default=BASELINE_FILE)
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="допустимое ухудшение (доля), по умолчанию 25%%")
+    parser.add_argument("--save", action='store_true', help="записать результаты как новую базу")
+    args = parser.parse_args()
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f).get('results', {})
+
+    results = {}
+    for series in args.series.split(','):
+        if series not in SERIES:
+            parser.error(f"Неизвестный ряд: {series}")
+        print(f"{series}: {SERIES[series][0]} баров")
+        results[series] = run_series(series, args.models.split(','), args.repeats)
+
+    print_table(results, baseline)
+
+    if args.save:
+        # Новые ряды и этапы дописываются к базе, остальные сохраняются
+        merged = {**baseline, **results}
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump({
+                'python': platform.python_version(),
+                'machine': platform.machine(),
+                'numpy': np.__version__,
+                'pandas': pd.__version__,
+                'results': merged,
+            }, f, ensure_ascii=False, indent=2)
+        print(f"База записана в {args.baseline}")
+        return
+
+    if not baseline:
+        print("База не найдена: запустите с --save, чтобы сравнивать следующие прогоны")
+        return
+
+    regressions = compare(results, baseline, args.threshold)
+    if regressions:
+        print(f"Регрессии больше {args.threshold * 100:.0f}%:")
+        for line in regressions:
+            print(f"  {line}")
+        sys.exit(1)
+    print("Регрессий нет")
+
+
+if __name__ == '__main__':
+    main()
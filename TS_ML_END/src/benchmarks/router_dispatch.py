@@ -0,0 +1,108 @@
+"""Накладные расходы Router на один вызов обработчика: до и после кэширования дескрипторов,
+а также поиск маршрута: линейный перебор регулярных выражений против RouteIndex.
+
+Запуск из каталога src:
+    python -m benchmarks.router_dispatch --iterations 2000 --routes 200
+"""
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import time
+from functools import partial
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from router.router import Router, RouteHandler, logger
+
+
+class LegacyRouter(Router):
+    """Прежняя реализация: разбор исходника и сигнатуры обработчика на каждый вызов"""
+
+    async def _prepare_route(self, path: str, *args, **kwargs):
+        handler = self.routes.get(path)['handler']
+        descriptor = RouteHandler.compile(handler, self.returns_a_function(handler))
+        if not descriptor.returns_function:
+            raise ValueError("handler must return a function")
+        return descriptor, descriptor.build_kwargs(kwargs)
+
+
+class Controller:
+    async def render(self, **kwargs):
+        return None
+
+    async def menu(self, update):
+        """Обработчик, похожий на StockController.menu"""
+        options = ['📈 Получить прогноз акций', '📊 Моя статистика', 'ℹ️ Помощь']
+        return partial(self.render, content=options)
+
+    async def item(self, update, item_id=None, page: int = 1):
+        return partial(self.render, content=(item_id, page))
+
+
+def build(router_cls, routes: int) -> Router:
+    controller = Controller()
+    router = router_cls()
+    router.route("/", controller.menu)
+    for i in range(routes):
+        router.route(f"/section{i}/{{item_id}}", controller.item)
+    return router
+
+
+async def measure(router: Router, path: str, iterations: int) -> float:
+    await router.handle(path, update=None)
+    start = time.perf_counter()
+    for _ in range(iterations):
+        await router.handle(path, update=None)
+    return (time.perf_counter() - start) / iterations
+
+
+def match_linear(router: Router, request_path: str):
+    """Прежний поиск маршрута: перебор всех регулярных выражений по порядку"""
+    for path, route_data in router.routes.items():
+        match = route_data['regex'].match(request_path)
+        if match:
+            return path, dict(zip(route_data['params'], match.groups()))
+    return None
+
+
+def measure_match(match, path: str, iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        match(path)
+    return (time.perf_counter() - start) / iterations
+
+
+async def run(iterations: int, routes: int):
+    # Логирование каждого вызова не относится к диспетчеризации
+    logger.setLevel(logging.WARNING)
+
+    results = []
+    for name, router_cls in (("до (legacy)", LegacyRouter), ("после", Router)):
+        router = build(router_cls, routes)
+        results.append((name,
+                         await measure(router, "/", iterations),
+                         await measure(router, f"/section{routes - 1}/42", iterations)))
+
+    print(f"{iterations} вызовов, {routes + 1} маршрутов")
+    print(f"{'реализация':<14}{'/ , мкс':>12}{'/section/{id}, мкс':>22}")
+    for name, static_time, param_time in results:
+        print(f"{name:<14}{static_time * 1e6:>12.1f}{param_time * 1e6:>22.1f}")
+    print(f"ускорение: x{results[0][1] / results[1][1]:.1f} / x{results[0][2] / results[1][2]:.1f}")
+
+    router = build(Router, routes)
+    path = f"/section{routes - 1}/42"
+    assert match_linear(router, path) == router.index.match(path)
+    linear = measure_match(partial(match_linear, router), path, iterations)
+    indexed = measure_match(router.index.match, path, iterations)
+    print(f"\nпоиск маршрута {path}: перебор {linear * 1e6:.1f} мкс, "
+          f"индекс {indexed * 1e6:.1f} мкс (x{linear / indexed:.1f})")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Бенчмарк диспетчеризации Router")
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--routes", type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(run(args.iterations, args.routes))
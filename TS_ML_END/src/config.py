@@ -7,13 +7,116 @@ class Config:
     BOT_TOKEN = os.getenv('BOT_TOKEN')
     YAHOO_CACHE_DIR = os.getenv('YAHOO_CACHE_DIR', './cache')
     LOG_FILE = os.getenv('LOG_FILE', './logs.csv')
+    # Журнал пишется пачками: по LOG_BATCH_SIZE строк или раз в LOG_FLUSH_INTERVAL секунд
+    LOG_BATCH_SIZE = int(os.getenv('LOG_BATCH_SIZE', 50))
+    LOG_FLUSH_INTERVAL = float(os.getenv('LOG_FLUSH_INTERVAL', 1))
     HISTORICAL_YEARS = int(os.getenv('HISTORICAL_YEARS', 2))
     FORECAST_DAYS = int(os.getenv('FORECAST_DAYS', 30))
 
+    # Обновление кэша котировок: через сколько часов догружать хвост,
+    # индивидуальные интервалы (AAPL:1,TSLA:0.5) и полная перезагрузка раз в N дней
+    CACHE_REFRESH_HOURS = float(os.getenv('CACHE_REFRESH_HOURS', 12))
+    CACHE_REFRESH_OVERRIDES = {
+        ticker.strip().upper(): float(hours)
+        for ticker, hours in (
+            item.split(':') for item in os.getenv('CACHE_REFRESH_OVERRIDES', '').split(',') if ':' in item
+        )
+    }
+    CACHE_EXPIRE_DAYS = float(os.getenv('CACHE_EXPIRE_DAYS', 30))
+    # После неудачной загрузки кэш отдается как есть N минут, без повторных запросов к источнику
+    CACHE_RETRY_MINUTES = float(os.getenv('CACHE_RETRY_MINUTES', 15))
+    # Формат кэша: auto | csv | npy | parquet
+    CACHE_FORMAT = os.getenv('CACHE_FORMAT', 'auto')
+
     # Модельные константы
     TRAIN_TEST_SPLIT = 0.8
     LAG_FEATURES = [1, 2, 3, 5, 7, 14]
     WINDOW_SIZES = [7, 14, 30]
+    # Дополнительные признаки (списки через запятую, по умолчанию выключены):
+    # доходности ret_N, RSI rsi_N и волатильность лог-доходностей vol_N
+    RETURN_PERIODS = [int(x) for x in os.getenv('RETURN_PERIODS', '').split(',') if x.strip()]
+    RSI_WINDOWS = [int(x) for x in os.getenv('RSI_WINDOWS', '').split(',') if x.strip()]
+    VOLATILITY_WINDOWS = [int(x) for x in os.getenv('VOLATILITY_WINDOWS', '').split(',') if x.strip()]
 
     # Метрики для выбора модели
     METRICS = ['rmse', 'mape', 'mae']
+
+    # Параллельное обучение моделей-кандидатов
+    PARALLEL_TRAINING = os.getenv('PARALLEL_TRAINING', 'false').lower() in ('1', 'true', 'yes')
+    # Сколько секунд ждать модель в параллельном режиме: не уложившаяся
+    # в срок исключается из выбора, как завершившаяся с ошибкой
+    MODEL_TIMEOUT = float(os.getenv('MODEL_TIMEOUT', 120))
+
+    # Выбор модели: holdout - одно разбиение TRAIN_TEST_SPLIT,
+    # walk_forward - кросс-валидация по BACKTEST_FOLDS фолдам (окно expanding | sliding)
+    MODEL_SELECTION = os.getenv('MODEL_SELECTION', 'holdout')
+    BACKTEST_FOLDS = int(os.getenv('BACKTEST_FOLDS', 5))
+    BACKTEST_WINDOW = os.getenv('BACKTEST_WINDOW', 'expanding')
+    # Размер тестового отрезка фолда в строках, 0 - поровну из последних (1 - TRAIN_TEST_SPLIT) строк
+    BACKTEST_TEST_SIZE = int(os.getenv('BACKTEST_TEST_SIZE', 0))
+    # Дообучение моделей между фолдами вместо обучения заново: быстрее, но метрики
+    # случайного леса хуже (старые деревья обучены на более короткой истории)
+    BACKTEST_WARM_START = os.getenv('BACKTEST_WARM_START', 'false').lower() in ('1', 'true', 'yes')
+    BACKTEST_WORKERS = int(os.getenv('BACKTEST_WORKERS', 1))
+
+    # ARIMA между запросами обновляется с прежними параметрами; полная оценка -
+    # раз в ARIMA_REFIT_EVERY обновлений или ARIMA_REFIT_HOURS часов.
+    # ARIMA_WARM_ITERATIONS > 0 - вместо этого несколько итераций от прежних параметров
+    ARIMA_STATE_DIR = os.getenv('ARIMA_STATE_DIR', './arima_state')
+    ARIMA_REFIT_EVERY = int(os.getenv('ARIMA_REFIT_EVERY', 20))
+    ARIMA_REFIT_HOURS = float(os.getenv('ARIMA_REFIT_HOURS', 168))
+    ARIMA_WARM_ITERATIONS = int(os.getenv('ARIMA_WARM_ITERATIONS', 0))
+
+    # Порядок ARIMA: 'p,d,q' или auto - подбор по ARIMA_CRITERION (aic | bic) на сетке p и q;
+    # d - по тесту ADF, если ARIMA_D_VALUES пуст. Кандидаты обучаются в ARIMA_SEARCH_WORKERS
+    # процессах, не успевшие за ARIMA_SEARCH_BUDGET секунд прерываются;
+    # выбранный порядок хранится ARIMA_ORDER_TTL_HOURS часов
+    ARIMA_ORDER = os.getenv('ARIMA_ORDER', '5,1,0')
+    ARIMA_P_VALUES = [int(x) for x in os.getenv('ARIMA_P_VALUES', '0,1,2,3,4,5').split(',') if x.strip()]
+    ARIMA_Q_VALUES = [int(x) for x in os.getenv('ARIMA_Q_VALUES', '0,1,2').split(',') if x.strip()]
+    ARIMA_D_VALUES = [int(x) for x in os.getenv('ARIMA_D_VALUES', '').split(',') if x.strip()]
+    ARIMA_CRITERION = os.getenv('ARIMA_CRITERION', 'aic')
+    ARIMA_SEARCH_BUDGET = float(os.getenv('ARIMA_SEARCH_BUDGET', 10))
+    ARIMA_SEARCH_WORKERS = int(os.getenv('ARIMA_SEARCH_WORKERS', 1))
+    ARIMA_ORDER_TTL_HOURS = float(os.getenv('ARIMA_ORDER_TTL_HOURS', 168))
+
+    # Кэш обученных моделей
+    MODEL_CACHE_DIR = os.getenv('MODEL_CACHE_DIR', './model_cache')
+    MODEL_CACHE_TTL_HOURS = float(os.getenv('MODEL_CACHE_TTL_HOURS', 24))
+    MODEL_CACHE_MAX_ENTRIES = int(os.getenv('MODEL_CACHE_MAX_ENTRIES', 50))
+
+    # Прогрев кэша (prefetch.py)
+    WATCHLIST_FILE = os.getenv('WATCHLIST_FILE', './watchlist.txt')
+    PREFETCH_CONCURRENCY = int(os.getenv('PREFETCH_CONCURRENCY', 8))
+
+    # Пулы выполнения прогнозов
+    FORECAST_WORKERS = int(os.getenv('FORECAST_WORKERS', 2))
+    IO_WORKERS = int(os.getenv('IO_WORKERS', 4))
+    FORECAST_QUEUE_SIZE = int(os.getenv('FORECAST_QUEUE_SIZE', 20))
+
+    # Сессии чатов (формы и данные контроллеров): memory | disk
+    SESSION_STORE = os.getenv('SESSION_STORE', 'memory')
+    SESSION_DIR = os.getenv('SESSION_DIR', './sessions')
+    SESSION_TTL_HOURS = float(os.getenv('SESSION_TTL_HOURS', 24))
+    SESSION_MAX = int(os.getenv('SESSION_MAX', 10000))
+
+    # Ограничение запросов прогноза на пользователя: корзина токенов
+    # (BURST подряд, затем RATE в минуту) и число одновременных заданий
+    RATE_LIMIT_PER_MINUTE = float(os.getenv('RATE_LIMIT_PER_MINUTE', 1))
+    RATE_LIMIT_BURST = int(os.getenv('RATE_LIMIT_BURST', 3))
+    MAX_JOBS_PER_USER = int(os.getenv('MAX_JOBS_PER_USER', 1))
+
+    # Не чаще одного редактирования сообщения с прогрессом за N секунд
+    PROGRESS_EDIT_INTERVAL = float(os.getenv('PROGRESS_EDIT_INTERVAL', 2))
+
+    # Архив графиков на диске: пустой каталог - не сохранять
+    PLOT_ARCHIVE_DIR = os.getenv('PLOT_ARCHIVE_DIR', '')
+    PLOT_ARCHIVE_MAX_FILES = int(os.getenv('PLOT_ARCHIVE_MAX_FILES', 200))
+    PLOT_ARCHIVE_MAX_DAYS = float(os.getenv('PLOT_ARCHIVE_MAX_DAYS', 7))
+
+    # Метрики этапов (время, CPU, пиковый RSS): выгрузка раз в METRICS_EXPORT_INTERVAL
+    # секунд в JSONL и (если задан файл) в текстовом формате Prometheus
+    METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'false').lower() in ('1', 'true', 'yes')
+    METRICS_FILE = os.getenv('METRICS_FILE', './metrics.jsonl')
+    METRICS_PROM_FILE = os.getenv('METRICS_PROM_FILE', '')
+    METRICS_EXPORT_INTERVAL = float(os.getenv('METRICS_EXPORT_INTERVAL', 60))
@@ -1,6 +1,8 @@
 from dataclasses import dataclass, field
 from typing import List
 from view.telegram import TelegramClient
+from services.job_executor import ForecastExecutor
+from services.forecast_scheduler import FairScheduler
 
 
 @dataclass
@@ -12,3 +14,5 @@ class TimeSlot:
 @dataclass
 class AppContext:
     driver: TelegramClient
+    executor: ForecastExecutor = field(default_factory=ForecastExecutor)
+    scheduler: FairScheduler = field(default_factory=FairScheduler)
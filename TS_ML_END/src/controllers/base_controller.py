@@ -7,8 +7,6 @@ class BaseController:
 
     def __init__(self, context: AppContext):
         self.ctx = context
-        self.chat_id = None
-        self.user_id = None
         self.ctx.driver.set_state_handler(self._state_handler)
 
     async def show_message(self, title: str, text: str, options=None, **kwargs):
@@ -28,7 +26,18 @@ class BaseController:
             **kwargs
         )
 
+    def session(self, update: Update):
+        """Сессия чата, из которого пришел update"""
+        return self.ctx.driver.getRouter().session(update.effective_chat.id)
+
+    def save_session(self, session):
+        self.ctx.driver.getRouter().save_session(session)
+
     def _state_handler(self, update: Update):
-        if update.effective_user:
-            self.user_id = update.effective_user.id
-            self.chat_id = update._effective_message.chat_id
\ No newline at end of file
+        # Пользователь запоминается в сессии чата, а не в полях контроллера,
+        # общих для всех чатов
+        if update.effective_user and update.effective_chat:
+            session = self.session(update)
+            if session.user_id != update.effective_user.id:
+                session.user_id = update.effective_user.id
+                self.save_session(session)
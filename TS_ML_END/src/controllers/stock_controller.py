@@ -1,14 +1,22 @@
 from controllers.base_controller import BaseController
 from view.base import MViewItem, MViewOption, FormField
+from contextlib import nullcontext
 from functools import partial
+from typing import Dict
 import time
+import uuid
 from datetime import datetime
 
 from services.data_service import DataService
-from services.model_selector import ModelSelector
 from services.analytics_service import AnalyticsService
 from services.plot_service import PlotService
 from services.log_service import LogService
+from services.forecast_pipeline import run_forecast_pipeline
+from services.job_executor import ExecutorBusyError
+from services.forecast_scheduler import RateLimitError
+from services.single_flight import SingleFlight
+from services.progress import ProgressReporter
+from services import progress, metrics
 from config import Config
 import numpy as np
 
@@ -19,7 +27,9 @@ class StockController(BaseController):
         self.data_service = DataService()
         self.plot_service = PlotService()
         self.log_service = LogService()
-        self.user_sessions = {}  # Простое хранилище сессий
+        # Недописанные строки журнала сбрасываются на диск при остановке бота
+        self.ctx.driver.add_shutdown_hook(self.log_service.close)
+        self.forecasts = SingleFlight()  # Общие прогнозы для одновременных запросов
 
     async def menu(self, update):
         """Главное меню бота"""
@@ -41,10 +51,9 @@ class StockController(BaseController):
 
     async def start_forecast(self, update):
         """Начало процесса прогнозирования"""
-        user_id = update.effective_user.id
-
-        # Создаем сессию для пользователя
-        self.user_sessions[user_id] = {
+        # Состояние прогноза хранится в сессии чата
+        session = self.session(update)
+        session.data['forecast'] = {
             'step': 'ticker',
             'data': {}
         }
@@ -70,85 +79,119 @@ class StockController(BaseController):
             form_complete='/forecast/process'
         )
 
-        self.ctx.driver.getRouter().set_current_item(form_item)
+        session.current_item = form_item
+        self.save_session(session)
         return partial(
             self.ctx.driver.render_message,
             content=form_item
         )
 
     async def process_forecast(self, update, request):
+        """Постановка прогноза в очередь с ограничением запросов пользователя"""
+        user_id = update.effective_user.id
+
+        async def show_position(position: int):
+            await self.ctx.driver.render_message(
+                content=MViewItem(
+                    title="⏳ Очередь",
+                    text=f"Ваш запрос в очереди: {position}-й. Прогноз начнется автоматически."
+                ),
+                update=update
+            )
+
+        try:
+            return await self.ctx.scheduler.run(
+                user_id, partial(self._process_forecast, update, request), on_queued=show_position)
+        except RateLimitError as e:
+            return partial(self.show_error, str(e))
+
+    async def _process_forecast(self, update, request):
+        """Построение прогноза с обновлением сообщения о ходе этапов"""
+        ticker = request.get("ticker", "")
+        chat_id = update.effective_chat.id
+
+        # Отправляем сообщение о начале обработки
+        message_id = await self.ctx.driver.render_message(
+            content=MViewItem(
+                title="⏳ Обработка",
+                text="Загружаю данные и строю прогноз. Это может занять несколько минут..."
+            ),
+            update=update
+        )
+
+        async def render_progress(text: str):
+            nonlocal message_id
+            message_id = await self.ctx.driver._render_text(
+                text=text, chat_id=chat_id, message_id=message_id, parse_mode='HTML')
+
+        reporter = ProgressReporter(render_progress, self.ctx.executor.progress_hub(),
+                                    title=f"⏳ Прогноз {ticker.upper()}")
+        async with reporter:
+            with progress.reporting(reporter.sink):
+                result = await self._run_forecast(update, request)
+
+        for stage, seconds in reporter.timings.items():
+            metrics.registry.observe('forecast_stage_seconds', seconds, stage=stage)
+        return result
+
+    async def _run_forecast(self, update, request):
         """Обработка запроса и построение прогноза"""
         user_id = update.effective_user.id
+        # Метка состояния прогноза этого запроса: пока он выполняется, чат мог начать новую форму
+        request_id = uuid.uuid4().hex
 
         try:
             # Получаем введенный тикер
             ticker = request.get("ticker", "")
 
             # Пробуем загрузить данные для проверки
-            self.data_service.fetch_stock_data(ticker)
+            df = await self.ctx.executor.run_io(self.data_service.fetch_stock_data, ticker)
 
             # Сохраняем тикер в сессии
-            self.user_sessions[user_id]['data']['ticker'] = ticker
-            self.user_sessions[user_id]['step'] = 'amount'
-
+            session = self.session(update)
+            state = session.data.setdefault('forecast', {'step': 'ticker', 'data': {}})
+            state['data']['ticker'] = ticker
+            state['step'] = 'amount'
+            state['request_id'] = request_id
+            self.save_session(session)
+
+        except ExecutorBusyError as e:
+            return partial(self.show_error, str(e))
         except Exception as e:
             return await self.show_error(update, f"Ошибка: {str(e)}\nПожалуйста, введите корректный тикер.")
 
         try:
             start_time = time.time()
-            session = self.user_sessions[user_id]
 
             # Получаем данные из сессии
-            ticker = session['data']['ticker']
+            ticker = state['data']['ticker']
             amount = int(request.get("amount", ""))
 
-            # Отправляем сообщение о начале обработки
-
-            await self.ctx.driver.render_message(
-                content=MViewItem(
-                    title="⏳ Обработка",
-                    text="Загружаю данные и строю прогноз. Это может занять несколько минут..."
-                ),
-                update=update
-            )
-
-            # 1. Загрузка и подготовка данных
-            df = self.data_service.fetch_stock_data(ticker)
-            processed_data = self.data_service.preprocess_data(df)
-            X_train, y_train, X_test, y_test, train_prices, test_prices = \
-                self.data_service.split_data(processed_data)
-
-            # 2. Обучение и выбор модели
-            model_selector = ModelSelector()
-            results = model_selector.train_and_evaluate(X_train, y_train, X_test, y_test)
-            best_model, best_metrics = model_selector.select_best_model(results)
-
-            # 3. Построение прогноза
-            last_data = processed_data.iloc[-1:]
-            forecast = model_selector.make_forecast(last_data, Config.FORECAST_DAYS)
-
-            # 4. Генерация рекомендаций
+            # 1-3, 5. Общая часть: модели, прогноз, торговые точки и график.
+            # Одновременные запросы того же тикера на тех же данных ждут одно вычисление.
+            # Его этапы видит только первый запрос, остальным показывается ожидание
+            shared_key = (ticker.upper(), df.index[-1], Config.FORECAST_DAYS)
+            waiting = progress.stage('shared', 'Ожидание такого же прогноза другого запроса') \
+                if self.forecasts.in_flight(shared_key) else nullcontext()
+            with waiting:
+                shared = await self.forecasts.do(
+                    shared_key, partial(self._build_forecast, df, ticker))
+            forecast = shared['forecast']
+            best_model_name = shared['best_model']
+            best_metrics = shared['metrics']
+
+            # 4. Генерация рекомендаций под сумму пользователя
             analytics = AnalyticsService(amount)
-            trading_points = analytics.find_trading_points(forecast)
-            simulation = analytics.simulate_trading(forecast, trading_points)
+            simulation = analytics.simulate_trading(forecast, list(shared['trading_points']))
             summary = analytics.generate_summary(simulation, df['Close'].iloc[-1])
 
-            # 5. Создание графика
-            all_prices = np.concatenate([train_prices.values, test_prices.values])
-            plot_path = self.plot_service.create_forecast_plot(
-                all_prices[-100:],  # Последние 100 точек
-                forecast,
-                trading_points,
-                ticker
-            )
-
-            # 6. Логирование
+            # 6. Логирование (строка уходит в буфер, запись на диск - в фоне)
             processing_time = time.time() - start_time
             self.log_service.log_request(
                 user_id=user_id,
                 ticker=ticker,
                 investment_amount=amount,
-                best_model=best_model.get_name(),
+                best_model=best_model_name,
                 metrics=best_metrics,
                 profit=simulation['profit'],
                 profit_percentage=simulation['profit_percentage'],
@@ -161,35 +204,85 @@ class StockController(BaseController):
                 MViewOption(title='📊 Главное меню', link='/'),
             ]
 
-            with open(plot_path, 'rb') as photo:
-                photo_data = photo.read()
-                return partial(
-                    self.ctx.driver.render_message,
-                    content=MViewItem(
-                        title=f"📈 Прогноз для {ticker}\nЛучшая модель: {best_model.get_name()}",
-                        text=summary,
-                        option=options
-                    ),
-                    image_url=photo_data
-                )
+            return partial(
+                self.ctx.driver.render_message,
+                content=MViewItem(
+                    title=f"📈 Прогноз для {ticker}\nЛучшая модель: {best_model_name}",
+                    text=summary,
+                    option=options
+                ),
+                image_url=shared['plot']
+            )
 
+        except ExecutorBusyError as e:
+            return partial(self.show_error, str(e))
         except ValueError as e:
             return partial(self.show_error, f"Ошибка ввода: {str(e)}")
         except Exception as e:
             return partial(self.show_error, f"Произошла ошибка: {str(e)}")
         finally:
-            # Очищаем сессию
-            if user_id in self.user_sessions:
-                del self.user_sessions[user_id]
+            # Очищаем состояние прогноза этого запроса в текущей сессии; сохранять
+            # сессию, прочитанную до прогноза, нельзя - она могла измениться
+            session = self.session(update)
+            if session.data.get('forecast', {}).get('request_id') == request_id:
+                del session.data['forecast']
+                self.save_session(session)
+
+    async def _build_forecast(self, df, ticker: str) -> Dict:
+        """Часть прогноза, не зависящая от пользователя: общая для одновременных запросов"""
+        # Подготовка данных, обучение моделей и прогноз в пуле процессов
+        pipeline = await self.ctx.executor.run_cpu(
+            run_forecast_pipeline, df, ticker, Config.FORECAST_DAYS)
+        forecast = pipeline['forecast']
+        trading_points = AnalyticsService.find_trading_points(forecast)
+
+        # PNG-байты отдаются в render_message без временных файлов
+        plot = await self.ctx.executor.run_cpu(
+            self.plot_service.create_forecast_plot,
+            pipeline['prices'][-100:],  # Последние 100 точек
+            forecast,
+            trading_points,
+            ticker
+        )
+
+        return {
+            'forecast': forecast,
+            'best_model': pipeline['best_model'],
+            'metrics': pipeline['metrics'],
+            'trading_points': trading_points,
+            'plot': plot
+        }
 
     async def show_stats(self, update):
         """Показать статистику пользователя"""
-        # Здесь можно реализовать чтение логов и показ статистики
-        return await self.show_message(
-            update=update,
+        user_id = update.effective_user.id
+        try:
+            stats = await self.ctx.executor.run_io(self.log_service.store.user_stats, user_id)
+        except Exception as e:
+            return partial(self.show_error, f"Статистика недоступна: {str(e)}")
+
+        if stats is None:
+            text = "Вы еще не запрашивали прогнозы."
+        else:
+            tickers = ", ".join(f"{ticker} ({count})" for ticker, count in stats['favourite_tickers'])
+            models = ", ".join(f"{model}: {count}" for model, count in stats['models'].items())
+            text = (
+                f"Запросов: {stats['requests']}\n"
+                f"Среднее время обработки: {stats['avg_processing_time']:.1f} c\n"
+                f"Средняя прибыль по симуляции: {stats['avg_profit_percentage']:.2f}%\n"
+                f"Любимые тикеры: {tickers}\n"
+                f"Лучшие модели: {models}\n"
+                f"Последний запрос: {stats['last_request'][:16].replace('T', ' ')}"
+            )
+
+        return partial(
+            self.show_message,
             title="📊 Статистика",
-            text="Статистика будет доступна в будущих версиях.",
-            options=[MViewOption(title="Назад", link="/")]
+            text=text,
+            options=[
+                MViewOption(title='📈 Получить прогноз акций', link='/forecast'),
+                MViewOption(title="Назад", link="/")
+            ]
         )
 
     async def show_help(self, update):
@@ -1,9 +1,12 @@
 import asyncio
 import argparse
+import time
+from config import Config
 from router.router import Router
 from view.telegram import TelegramClient
 from controllers.app_context import AppContext
 from controllers.stock_controller import StockController
+from services import metrics
 
 
 async def run_bot(token: str):
@@ -23,11 +26,17 @@ async def run_bot(token: str):
 
     await tg_client.init(router=router)
 
+    exported_at = time.monotonic()
     try:
         while True:
             await asyncio.sleep(1)
+            if metrics.registry.enabled and time.monotonic() - exported_at >= Config.METRICS_EXPORT_INTERVAL:
+                exported_at = time.monotonic()
+                await asyncio.to_thread(metrics.registry.write_exports)
     except (asyncio.CancelledError, KeyboardInterrupt):
         await tg_client.stop()
+        ctx.executor.shutdown()
+        metrics.registry.write_exports()
 
 
 async def main():
@@ -1,16 +1,94 @@
+import time
 import numpy as np
+from typing import Optional
 from statsmodels.tsa.arima.model import ARIMA
 from models.ml_model import BaseModel
+from config import Config
 
 class ARIMAModel(BaseModel):
-    def __init__(self, order=(5,1,0)):
-        self.order = order
+    """ARIMA из statsmodels.
+
+    С series_key (тикер) параметры сохраняются между запросами: следующий fit
+    не оценивает их заново, а дописывает новые наблюдения (append) или
+    прогоняет фильтр Калмана по сдвинувшемуся окну с прежними параметрами,
+    при ARIMA_WARM_ITERATIONS > 0 - делает несколько итераций оптимизатора
+    от прежних параметров. Полная оценка - по расписанию ArimaStateStore.
+
+    order='auto' (или строка '5,1,0' из настроек) - порядок подбирается
+    по AIC/BIC при первом fit (или resolve_order), кэшируется по series_key
+    и дальше не меняется: повторные fit того же объекта поиск не повторяют.
+    """
+
+    def __init__(self, order=(5,1,0), series_key: Optional[str] = None):
+        if isinstance(order, str) and order != 'auto':
+            order = tuple(int(x) for x in order.split(','))
+        self.auto_order = order == 'auto'
+        self.order = None if self.auto_order else order
+        self.series_key = series_key
         self.model = None
+        # Как получена текущая модель: full | append | filter | warm
+        self.fit_mode = None
     
     def fit(self, X_train, y_train):
-        # Для ARIMA используем только временной ряд
-        self.model = ARIMA(y_train, order=self.order)
-        self.model = self.model.fit()
+        # Для ARIMA используем только временной ряд. Значения без индекса дат:
+        # statsmodels не прогнозирует по датам без частоты (выходные, праздники)
+        y = np.asarray(y_train, dtype=float)
+        self.resolve_order(y)
+
+        if self.series_key is None:
+            self.model = ARIMA(y, order=self.order).fit()
+            self.fit_mode = 'full'
+            return self
+
+        from services.arima_state import ArimaState, get_arima_state_store
+        store = get_arima_state_store()
+        state = store.load(self.series_key, self.order)
+
+        if state is None or store.due_refit(state):
+            self.model = ARIMA(y, order=self.order).fit()
+            self.fit_mode = 'full'
+            state = ArimaState(tuple(self.order), self.model.params, y, time.time())
+        else:
+            self.model = self._update(store, state, y)
+            state.params, state.y, state.updates = self.model.params, y, state.updates + 1
+
+        store.keep_results(self.series_key, self.order, self.model)
+        store.save(self.series_key, state)
+        return self
+
+    def resolve_order(self, y_train) -> tuple:
+        """Подбирает порядок при order='auto', если он еще не выбран"""
+        if self.order is None:
+            from services.arima_order import find_order
+            self.order = find_order(np.asarray(y_train, dtype=float), key=self.series_key)
+        return self.order
+
+    def _update(self, store, state, y: np.ndarray):
+        """Модель для нового ряда y без полной оценки параметров"""
+        if Config.ARIMA_WARM_ITERATIONS > 0:
+            self.fit_mode = 'warm'
+            return ARIMA(y, order=self.order).fit(
+                start_params=state.params,
+                method_kwargs={'maxiter': Config.ARIMA_WARM_ITERATIONS}
+            )
+
+        old = state.y
+        extends = len(y) >= len(old) and np.array_equal(y[:len(old)], old)
+        results = store.results(self.series_key, self.order, len(old)) if extends else None
+        if results is not None:
+            self.fit_mode = 'append'
+            return results.append(y[len(old):], refit=False) if len(y) > len(old) else results
+
+        # Окно истории сдвинулось (или модель в другом процессе): фильтр с прежними параметрами
+        self.fit_mode = 'filter'
+        return ARIMA(y, order=self.order).filter(state.params)
+
+    def partial_fit(self, X_train, y_train, n_new: int):
+        """Добавляет n_new последних наблюдений к обученной модели без переоценки параметров"""
+        if self.model is None or not 0 < n_new < len(y_train):
+            return self.fit(X_train, y_train)
+        self.model = self.model.append(np.asarray(y_train, dtype=float)[-n_new:], refit=False)
+        self.fit_mode = 'append'
         return self
     
     def predict(self, X):
@@ -21,6 +99,9 @@ class ARIMAModel(BaseModel):
     def forecast(self, last_data, steps: int) -> np.ndarray:
         return self.model.forecast(steps=steps)
     
+    def get_params(self) -> dict:
+        return {'order': 'auto' if self.auto_order else list(self.order)}
+
     def evaluate(self, y_true, y_pred):
         # ARIMA может вернуть меньше предсказаний
         min_len = min(len(y_true), len(y_pred))
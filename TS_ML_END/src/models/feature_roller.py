@@ -0,0 +1,140 @@
+import re
+import numpy as np
+import pandas as pd
+from typing import Callable, List, Sequence
+from services.features import parse_feature
+
+LAG_PATTERN = re.compile(r'^lag_(\d+)$')
+SMA_PATTERN = re.compile(r'^sma_(\d+)$')
+STD_PATTERN = re.compile(r'^std_(\d+)$')
+
+
+class FeatureRoller:
+    """Пересчет строки признаков при рекурсивном многошаговом прогнозе.
+
+    Индексы колонок lag_*, sma_*, std_*, дополнительных признаков FeaturePipeline
+    (ret_*, rsi_*, vol_*) и календарных признаков вычисляются
+    один раз, дальше признаки обновляются in-place в NumPy-массиве
+    формы (n_series, n_features). Цены хранятся в буфере, куда дописываются
+    прогнозы, поэтому скользящие средние и std сдвигаются вместе с лагами.
+    """
+
+    def __init__(self, feature_names: Sequence[str]):
+        self.feature_names = list(feature_names)
+        self.lag_cols = []
+        self.sma_cols = []
+        self.std_cols = []
+        self.extra_cols = []
+
+        for idx, name in enumerate(self.feature_names):
+            if match := LAG_PATTERN.match(name):
+                self.lag_cols.append((idx, int(match.group(1))))
+            elif match := SMA_PATTERN.match(name):
+                self.sma_cols.append((idx, int(match.group(1))))
+            elif match := STD_PATTERN.match(name):
+                self.std_cols.append((idx, int(match.group(1))))
+            elif (feature := parse_feature(name)) is not None:
+                self.extra_cols.append((idx, feature))
+
+        self.day_col = self._index_of('day_of_week')
+        self.month_col = self._index_of('month')
+
+        # Сколько последних цен нужно, чтобы пересчитать все признаки
+        self.history_size = max(
+            [lag + 1 for _, lag in self.lag_cols] +
+            [window for _, window in self.sma_cols + self.std_cols] +
+            [feature.history for _, feature in self.extra_cols] + [1]
+        )
+
+        self._buffer = None
+        self._end = 0
+        self._first_day = None
+        self._first_month = None
+
+    def _index_of(self, name: str):
+        return self.feature_names.index(name) if name in self.feature_names else None
+
+    def _initial_history(self, last_data: pd.DataFrame, row: np.ndarray) -> np.ndarray:
+        """Последние history_size цен ряда; последняя - цена текущей строки.
+
+        Берется колонка 'price', недостающие значения восстанавливаются из лагов.
+        Без колонки 'price' текущая цена приближается значением lag_1.
+        """
+        history = np.full(self.history_size, np.nan)
+
+        for idx, lag in self.lag_cols:
+            history[-1 - lag] = row[idx]
+
+        if 'price' in last_data.columns:
+            prices = last_data['price'].to_numpy(dtype=float)[-self.history_size:]
+            history[-len(prices):] = prices
+        elif self.history_size > 1:
+            history[-1] = history[-2]
+
+        # Пропуски заполняем ближайшим известным значением
+        history = pd.Series(history).bfill().ffill().to_numpy()
+        return np.nan_to_num(history)
+
+    def start(self, frames: List[pd.DataFrame], steps: int) -> np.ndarray:
+        """Готовит массив признаков (по строке на ряд) и буфер цен на steps шагов"""
+        rows = np.vstack([
+            frame.reindex(columns=self.feature_names).iloc[-1:].to_numpy(dtype=float)
+            for frame in frames
+        ])
+
+        self._buffer = np.empty((len(frames), self.history_size + steps))
+        for i, frame in enumerate(frames):
+            self._buffer[i, :self.history_size] = self._initial_history(frame, rows[i])
+        self._end = self.history_size
+
+        if self.day_col is not None:
+            self._first_day = rows[:, self.day_col].copy()
+        if self.month_col is not None:
+            self._first_month = rows[:, self.month_col].copy()
+
+        return rows
+
+    def apply_calendar(self, X: np.ndarray, step: int):
+        """Сдвигает календарные признаки на step дней от исходной строки"""
+        if self.day_col is not None:
+            X[:, self.day_col] = (self._first_day + step) % 7
+
+        if self.month_col is not None:
+            base_day = self._first_day if self._first_day is not None else 0
+            total_days = base_day + step
+            X[:, self.month_col] = (self._first_month - 1 + total_days // 30) % 12 + 1
+
+    def push(self, X: np.ndarray, predictions: np.ndarray):
+        """Добавляет прогноз в буфер цен и пересчитывает лаги и окна in-place"""
+        buffer = self._buffer
+        buffer[:, self._end] = predictions
+        self._end += 1
+        end = self._end
+
+        for idx, lag in self.lag_cols:
+            X[:, idx] = buffer[:, end - 1 - lag]
+
+        for idx, window in self.sma_cols:
+            X[:, idx] = buffer[:, end - window:end].mean(axis=1)
+
+        for idx, window in self.std_cols:
+            X[:, idx] = buffer[:, end - window:end].std(axis=1, ddof=1)
+
+        for idx, feature in self.extra_cols:
+            X[:, idx] = feature.last(buffer[:, end - feature.history:end])
+
+    def rollout(self, predict: Callable[[np.ndarray], np.ndarray],
+                frames: List[pd.DataFrame], steps: int) -> np.ndarray:
+        """Рекурсивный прогноз: один вызов predict на шаг для всех рядов сразу.
+
+        Возвращает массив формы (n_series, steps).
+        """
+        X = self.start(frames, steps)
+        predictions = np.empty((len(frames), steps))
+
+        for step in range(steps):
+            self.apply_calendar(X, step)
+            predictions[:, step] = predict(X)
+            self.push(X, predictions[:, step])
+
+        return predictions
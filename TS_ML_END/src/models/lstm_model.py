@@ -1,8 +1,82 @@
 import numpy as np
 import torch
 import torch.nn as nn
-from torch.utils.data import DataLoader, TensorDataset
+from numpy.lib.stride_tricks import sliding_window_view
+from typing import List, Sequence, Union
+from torch.utils.data import DataLoader, IterableDataset
 from models.ml_model import BaseModel
+from models.feature_roller import FeatureRoller
+from services import progress
+
+
+def create_sequences(data: np.ndarray, seq_length: int):
+    """Окна признаков длины seq_length и цели.
+
+    Последняя колонка data - целевая переменная, остальные - признаки.
+    Цель окна - значение целевой колонки в последней строке окна, поэтому
+    окно признаков до момента t предсказывает цену t+1 без заглядывания вперед.
+    Возвращает представления над data без копирования:
+    окна формы (len(data) - seq_length + 1, seq_length, n_features) и цели.
+    """
+    windows = sliding_window_view(data[:, :-1], seq_length, axis=0)
+    return windows.transpose(0, 2, 1), data[seq_length - 1:, -1]
+
+
+class SlidingWindowDataset(IterableDataset):
+    """Потоковый датасет окон: в тензоры копируется только текущий батч.
+
+    Принимает один массив или список массивов (например, по тикеру на массив);
+    окна не пересекают границы рядов.
+    """
+
+    def __init__(self, data: Union[np.ndarray, Sequence[np.ndarray]], seq_length: int,
+                 batch_size: int, shuffle: bool = True, device=None):
+        series: List[np.ndarray] = [data] if isinstance(data, np.ndarray) else list(data)
+        self.batch_size = batch_size
+        self.shuffle = shuffle
+        self.device = device
+        self.windows = []
+        self.targets = []
+
+        for values in series:
+            if len(values) < seq_length:
+                continue
+            windows, targets = create_sequences(values, seq_length)
+            self.windows.append(windows)
+            self.targets.append(targets)
+
+        sizes = [len(targets) for targets in self.targets]
+        self.num_windows = sum(sizes)
+        # Глобальный номер окна -> (номер ряда, номер окна в ряду)
+        self._series_index = np.repeat(np.arange(len(sizes)), sizes)
+        self._local_index = np.concatenate([np.arange(size) for size in sizes]) if sizes \
+            else np.empty(0, dtype=int)
+
+    def __len__(self):
+        return (self.num_windows + self.batch_size - 1) // self.batch_size
+
+    def _gather(self, indices: np.ndarray):
+        if len(self.windows) == 1:
+            local = self._local_index[indices]
+            batch_X = self.windows[0][local]
+            batch_y = self.targets[0][local]
+        else:
+            batch_X = np.stack([self.windows[s][i] for s, i in
+                                zip(self._series_index[indices], self._local_index[indices])])
+            batch_y = np.array([self.targets[s][i] for s, i in
+                                zip(self._series_index[indices], self._local_index[indices])])
+
+        batch_X = torch.from_numpy(np.ascontiguousarray(batch_X, dtype=np.float32))
+        batch_y = torch.from_numpy(np.ascontiguousarray(batch_y, dtype=np.float32))
+        if self.device is not None:
+            batch_X, batch_y = batch_X.to(self.device), batch_y.to(self.device)
+        return batch_X, batch_y
+
+    def __iter__(self):
+        order = np.random.permutation(self.num_windows) if self.shuffle \
+            else np.arange(self.num_windows)
+        for start in range(0, self.num_windows, self.batch_size):
+            yield self._gather(order[start:start + self.batch_size])
 
 
 class LSTMModel(nn.Module):
@@ -15,9 +89,17 @@ class LSTMModel(nn.Module):
         self.linear = nn.Linear(hidden_size, 1)
 
     def forward(self, x):
-        lstm_out, _ = self.lstm(x)
+        return self.step(x)[0]
+
+    def step(self, x, hidden=None):
+        """Прогон последовательности с заданным начальным состоянием.
+
+        Возвращает прогноз по последнему шагу и итоговое состояние (h, c),
+        которое можно передать в следующий вызов.
+        """
+        lstm_out, hidden = self.lstm(x, hidden)
         last_time_step = lstm_out[:, -1, :]
-        return self.linear(last_time_step)
+        return self.linear(last_time_step), hidden
 
 class PyTorchLSTMModel(BaseModel):
     def __init__(self, sequence_length=30, epochs=50, batch_size=32):
@@ -26,43 +108,47 @@ class PyTorchLSTMModel(BaseModel):
         self.batch_size = batch_size
         self.model = None
         self.scaler = None
+        self.feature_names = []
+        # Последние sequence_length - 1 строк обучающей выборки (масштабированные):
+        # контекст для окон первых строк, переданных в predict
+        self.context = None
         self.device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
 
     def _create_sequences(self, data, seq_length):
-        sequences = []
-        targets = []
-        for i in range(len(data) - seq_length):
-            sequences.append(data[i:i+seq_length])
-            targets.append(data[i+seq_length, -1])
-        return np.array(sequences), np.array(targets)
+        return create_sequences(data, seq_length)
 
     def fit(self, X_train, y_train):
         from sklearn.preprocessing import StandardScaler
 
-        # Объединяем признаки для LSTM
-        train_data = np.column_stack([X_train.values, y_train.values.reshape(-1, 1)])
+        self.feature_names = list(getattr(X_train, 'columns', []))
+
+        # Объединяем признаки и цель: один скейлер для обоих
+        train_data = np.column_stack([
+            np.asarray(X_train, dtype=float),
+            np.asarray(y_train, dtype=float).reshape(-1, 1)
+        ])
 
         # Масштабирование
         self.scaler = StandardScaler()
         scaled_data = self.scaler.fit_transform(train_data)
+        self.context = scaled_data[max(0, len(scaled_data) - self.sequence_length + 1):, :-1] \
+            .astype(np.float32)
 
-        # Создание последовательностей
-        X_seq, y_seq = self._create_sequences(scaled_data, self.sequence_length)
-        # Преобразование в тензоры
-        X_tensor = torch.FloatTensor(X_seq).to(self.device)
-        y_tensor = torch.FloatTensor(y_seq).to(self.device)
+        # Окна строятся лениво, в тензоры копируется только текущий батч
+        dataset = SlidingWindowDataset(
+            scaled_data.astype(np.float32), self.sequence_length,
+            self.batch_size, shuffle=True, device=self.device
+        )
+        loader = DataLoader(dataset, batch_size=None)
 
         # Создание модели
-        input_size = X_tensor.shape[2]
+        input_size = scaled_data.shape[1] - 1
         self.model = LSTMModel(input_size).to(self.device)
 
         # Обучение
         criterion = nn.MSELoss()
         optimizer = torch.optim.Adam(self.model.parameters(), lr=0.001)
 
-        dataset = TensorDataset(X_tensor, y_tensor)
-        loader = DataLoader(dataset, batch_size=self.batch_size, shuffle=True)
-
         self.model.train()
         for epoch in range(self.epochs):
             for batch_X, batch_y in loader:
@@ -72,16 +158,80 @@ class PyTorchLSTMModel(BaseModel):
                 loss.backward()
                 optimizer.step()
 
+            progress.report(self.get_name(), 'progress', detail=f"эпоха {epoch + 1}/{self.epochs}")
+
         return self
 
+    def forecast_context(self) -> int:
+        """Окно сети и история для пересчета признаков"""
+        return max(super().forecast_context(), self.sequence_length)
+
+    def get_params(self) -> dict:
+        return {
+            'sequence_length': self.sequence_length,
+            'epochs': self.epochs,
+            'batch_size': self.batch_size
+        }
+
+    def _scale_features(self, X) -> np.ndarray:
+        X = np.asarray(X, dtype=float)
+        return ((X - self.scaler.mean_[:-1]) / self.scaler.scale_[:-1]).astype(np.float32)
+
+    def _unscale_target(self, y: np.ndarray) -> np.ndarray:
+        return y * self.scaler.scale_[-1] + self.scaler.mean_[-1]
+
     def predict(self, X):
+        """Прогноз на шаг вперед для каждой строки X одним батчем без градиентов.
+
+        Окно для строки i - предыдущие строки X, а для первых строк -
+        хвост обучающей выборки (X обычно продолжает train).
+        """
+        scaled = self._scale_features(X)
+        if self.context is not None and len(self.context):
+            scaled = np.vstack([self.context, scaled])
+
+        length = min(self.sequence_length, len(scaled))
+        windows = sliding_window_view(scaled, length, axis=0).transpose(0, 2, 1)
+        windows = windows[len(windows) - len(X):]
+
         self.model.eval()
         with torch.no_grad():
-            return np.zeros(len(X))
+            batch = torch.from_numpy(np.ascontiguousarray(windows)).to(self.device)
+            predictions = self.model(batch).squeeze(-1).cpu().numpy()
+
+        return self._unscale_target(predictions)
 
     def forecast(self, last_data, steps: int) -> np.ndarray:
-        if 'price' in last_data.columns:
-            last_price = last_data['price'].iloc[-1]
-        else:
-            last_price = 100.0 
-        return np.random.randn(steps) * 0.1 + last_price
+        """Авторегрессионный прогноз на steps шагов.
+
+        Последнее окно last_data кодируется один раз, дальше в сеть подается
+        только новая строка признаков, а состояние LSTM (h, c) переносится
+        между шагами. Признаки новой строки пересчитываются из прогнозов.
+
+        Шаг step поэтому видит всю последовательность длины sequence_length + step,
+        а не скользящее окно sequence_length строк, на котором сеть обучалась
+        (и которое использует predict). Первый шаг совпадает с прогнозом по
+        окну, следующие отличаются от повторного кодирования скользящего окна
+        тем сильнее, чем горизонт длиннее окна.
+        """
+        roller = FeatureRoller(self.feature_names)
+        X = roller.start([last_data], steps)
+
+        window = last_data.reindex(columns=self.feature_names) \
+            .iloc[-self.sequence_length:].to_numpy(dtype=float)
+
+        predictions = np.empty(steps)
+        self.model.eval()
+        with torch.no_grad():
+            inputs = torch.from_numpy(self._scale_features(window)).unsqueeze(0).to(self.device)
+            output, hidden = self.model.step(inputs)
+            predictions[0] = self._unscale_target(output.item())
+
+            for step in range(1, steps):
+                roller.push(X, predictions[step - 1:step])
+                roller.apply_calendar(X, step)
+                inputs = torch.from_numpy(self._scale_features(X)).unsqueeze(0).to(self.device)
+                output, hidden = self.model.step(inputs, hidden)
+                predictions[step] = self._unscale_target(output.item())
+
+        return predictions
@@ -1,9 +1,19 @@
 from abc import ABC, abstractmethod
 import numpy as np
 from typing import Tuple
+from services import metrics
+from services.features import FeaturePipeline
 
 
 class BaseModel(ABC):
+    def __init_subclass__(cls, **kwargs):
+        """fit, partial_fit, predict и forecast наследников замеряются как этапы model.<метод>"""
+        super().__init_subclass__(**kwargs)
+        for name in ('fit', 'partial_fit', 'predict', 'forecast'):
+            method = cls.__dict__.get(name)
+            if callable(method) and not getattr(method, '__isabstractmethod__', False):
+                setattr(cls, name, metrics.timed(f'model.{name}', model=cls.__name__)(method))
+
     @abstractmethod
     def fit(self, X_train, y_train):
         """Обучение модели"""
@@ -19,6 +29,16 @@ class BaseModel(ABC):
         """Прогноз на несколько шагов вперед"""
         pass
 
+    def forecast_context(self) -> int:
+        """Сколько последних строк предобработанных данных нужно forecast:
+        история для пересчета признаков из настроек (лаги, окна, RSI и т. д.)"""
+        return FeaturePipeline.default().history
+
+    def partial_fit(self, X_train, y_train, n_new: int):
+        """Дообучение после fit на выборке, которая продолжает прежнюю: последние
+        n_new строк X_train/y_train - новые. Без поддержки в модели - обычный fit."""
+        return self.fit(X_train, y_train)
+
     def evaluate(self, y_true: np.ndarray, y_pred: np.ndarray) -> dict:
         """Вычисление метрик качества"""
         metrics = {}
@@ -39,5 +59,9 @@ class BaseModel(ABC):
 
         return metrics
 
+    def get_params(self) -> dict:
+        """Гиперпараметры модели (используются в ключе кэша моделей)"""
+        return {}
+
     def get_name(self) -> str:
         return self.__class__.__name__
@@ -1,67 +1,90 @@
+import warnings
 import numpy as np
 import pandas as pd
+from typing import List
 from sklearn.ensemble import RandomForestRegressor
 from models.ml_model import BaseModel
+from models.feature_roller import FeatureRoller
 
 
 class RandomForestModel(BaseModel):
-    def __init__(self, n_estimators=100, random_state=42):
+    def __init__(self, n_estimators=100, random_state=42, warm_start_trees=None):
+        self.n_estimators = n_estimators
         self.model = RandomForestRegressor(
             n_estimators=n_estimators,
             random_state=random_state,
             n_jobs=-1
         )
+        # Сколько деревьев добавляет partial_fit (по умолчанию - четверть леса)
+        self.warm_start_trees = warm_start_trees or max(1, n_estimators // 4)
         self.last_features = None
         self.trained_features = None
 
     def fit(self, X_train, y_train):
+        # Обучение заново - всегда лес заданного размера, даже после partial_fit
+        self.model.set_params(n_estimators=self.n_estimators, warm_start=False)
         self.model.fit(X_train, y_train)
+        self._remember(X_train)
+        return self
+
+    def partial_fit(self, X_train, y_train, n_new: int):
+        """Дообучение через warm_start: обученные деревья сохраняются,
+        новые warm_start_trees деревьев обучаются на всей текущей выборке"""
+        if self.trained_features is None or list(X_train.columns) != self.trained_features:
+            return self.fit(X_train, y_train)
+
+        self.model.set_params(warm_start=True,
+                              n_estimators=self.model.n_estimators + self.warm_start_trees)
+        try:
+            self.model.fit(X_train, y_train)
+        finally:
+            self.model.set_params(warm_start=False)
+        self._remember(X_train)
+        return self
+
+    def _remember(self, X_train):
         self.last_features = X_train.iloc[-1:].copy()
         self.trained_features = X_train.columns.tolist()
-        return self
 
     def predict(self, X):
         return self.model.predict(X)
 
-    def forecast(self, last_data, steps: int) -> np.ndarray:
-        predictions = []
+    def get_params(self) -> dict:
+        return {
+            'n_estimators': self.model.n_estimators,
+            'random_state': self.model.random_state
+        }
 
+    def _train_features(self):
         if hasattr(self.model, 'feature_names_in_'):
-            train_features = self.model.feature_names_in_
-        else:
-            train_features = self.trained_features
-
-        current_features = last_data.copy()
-        current_features = current_features.reindex(columns=train_features)
+            return list(self.model.feature_names_in_)
+        return self.trained_features
 
-        if 'day_of_week' in train_features:
-            last_day = current_features['day_of_week'].iloc[0]
-        if 'month' in train_features:
-            last_month = current_features['month'].iloc[0]
+    def _predict_array(self, X: np.ndarray) -> np.ndarray:
+        # Модель обучена на DataFrame: подавляем предупреждение об отсутствии имен колонок
+        with warnings.catch_warnings():
+            warnings.filterwarnings('ignore', message='X does not have valid feature names')
+            return self.model.predict(X)
 
-        for step in range(steps):
-            if 'day_of_week' in train_features:
-                current_day = (last_day + step) % 7
-                current_features['day_of_week'] = current_day
-
-            if 'month' in train_features:
-                total_days = last_day + step
-                current_month = (last_month - 1 + total_days // 30) % 12 + 1
-                current_features['month'] = current_month
+    def forecast(self, last_data, steps: int) -> np.ndarray:
+        """Рекурсивный прогноз на steps шагов.
 
-            pred = self.model.predict(current_features)[0]
-            predictions.append(pred)
+        last_data - последние строки предобработанных данных; колонка 'price'
+        (если есть) используется как история для пересчета sma_*/std_*.
+        """
+        return self.forecast_many([last_data], steps)[0]
 
-            lag_cols = [col for col in current_features.columns
-                        if col.startswith('lag_')]
+    def forecast_many(self, frames: List[pd.DataFrame], steps: int) -> np.ndarray:
+        """Прогноз сразу для нескольких рядов одной моделью: один predict на шаг.
 
-            for lag in sorted([int(col.split('_')[1]) for col in lag_cols],
-                              reverse=True):
-                if lag == 1:
-                    current_features[f'lag_{lag}'] = pred
-                else:
-                    prev_lag = f'lag_{lag-1}'
-                    if prev_lag in current_features.columns:
-                        current_features[f'lag_{lag}'] = current_features[prev_lag]
+        Возвращает массив формы (len(frames), steps).
+        """
+        roller = FeatureRoller(self._train_features())
 
-        return np.array(predictions)
+        # На одной строке накладные расходы joblib больше выигрыша от потоков
+        n_jobs = self.model.n_jobs
+        self.model.n_jobs = 1
+        try:
+            return roller.rollout(self._predict_array, frames, steps)
+        finally:
+            self.model.n_jobs = n_jobs
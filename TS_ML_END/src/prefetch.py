@@ -0,0 +1,122 @@
+import asyncio
+import argparse
+import os
+import time
+from typing import Dict, List, Optional
+
+from config import Config
+from services.data_service import DataService
+from services.job_executor import ForecastExecutor
+
+
+def load_watchlist(path: str) -> List[str]:
+    """Тикеры из файла: по одному или через запятую в строке, '#' - комментарий"""
+    tickers = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.split('#', 1)[0]
+            tickers.extend(item.strip().upper() for item in line.split(',') if item.strip())
+    # Убираем повторы, сохраняя порядок
+    return list(dict.fromkeys(tickers))
+
+
+def load_sp500() -> List[str]:
+    """Состав S&P 500 с Википедии (нужен доступ в интернет и lxml)"""
+    import pandas as pd
+
+    table = pd.read_html("https://en.wikipedia.org/wiki/List_of_S%26P_500_companies")[0]
+    # В Yahoo точка в тикере заменяется дефисом: BRK.B -> BRK-B
+    return [ticker.replace('.', '-') for ticker in table['Symbol'].astype(str)]
+
+
+async def prefetch(tickers: List[str], data_service: Optional[DataService] = None,
+                   concurrency: int = 8, pretrain: bool = False,
+                   executor: Optional[ForecastExecutor] = None) -> List[Dict]:
+    """Загружает котировки тикеров с ограничением параллельности.
+
+    При pretrain=True для каждого тикера обучаются модели, а победитель
+    сохраняется в кэш моделей, чтобы первый запрос пользователя его переиспользовал.
+    Возвращает отчет по каждому тикеру.
+    """
+    data_service = data_service or DataService()
+    own_executor = executor is None
+    if own_executor:
+        executor = ForecastExecutor(io_workers=concurrency,
+                                    max_queue=concurrency + Config.FORECAST_WORKERS)
+
+    download_slots = asyncio.Semaphore(concurrency)
+    train_slots = asyncio.Semaphore(executor.cpu_workers)
+
+    if pretrain:
+        # Импортируем только при обучении: тянет torch и statsmodels
+        from services.forecast_pipeline import run_forecast_pipeline
+
+    async def process(ticker: str) -> Dict:
+        report = {'ticker': ticker, 'rows': 0, 'fetch_time': None,
+                  'train_time': None, 'best_model': None, 'error': None}
+        try:
+            async with download_slots:
+                start = time.perf_counter()
+                df = await executor.run_io(data_service.fetch_stock_data, ticker)
+                report['fetch_time'] = time.perf_counter() - start
+                report['rows'] = len(df)
+
+            if pretrain:
+                async with train_slots:
+                    start = time.perf_counter()
+                    result = await executor.run_cpu(
+                        run_forecast_pipeline, df, ticker, Config.FORECAST_DAYS)
+                    report['train_time'] = time.perf_counter() - start
+                    report['best_model'] = result['best_model']
+        except Exception as e:
+            report['error'] = str(e)
+        return report
+
+    try:
+        return await asyncio.gather(*(process(ticker) for ticker in tickers))
+    finally:
+        if own_executor:
+            executor.shutdown()
+
+
+def print_report(reports: List[Dict], total_time: float):
+    """Таблица времени по тикерам и итог"""
+    def fmt(value):
+        return f"{value:.2f}" if value is not None else "-"
+
+    print(f"{'Тикер':<8}{'Строк':>7}{'Загрузка, c':>13}{'Обучение, c':>13}  {'Модель / ошибка'}")
+    for report in reports:
+        status = report['error'] or report['best_model'] or ''
+        print(f"{report['ticker']:<8}{report['rows']:>7}{fmt(report['fetch_time']):>13}"
+              f"{fmt(report['train_time']):>13}  {status}")
+
+    failed = sum(1 for report in reports if report['error'])
+    print(f"\nГотово: {len(reports) - failed} из {len(reports)} за {total_time:.1f} c")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Прогрев кэша котировок и моделей перед открытием рынка.")
+    parser.add_argument("tickers", nargs='*', help="Тикеры (по умолчанию - из файла watch-листа)")
+    parser.add_argument("--watchlist", type=str, default=Config.WATCHLIST_FILE,
+                        help="Файл со списком тикеров")
+    parser.add_argument("--sp500", action='store_true', help="Взять состав S&P 500")
+    parser.add_argument("--concurrency", type=int, default=Config.PREFETCH_CONCURRENCY,
+                        help="Сколько тикеров загружать одновременно")
+    parser.add_argument("--pretrain", action='store_true',
+                        help="Обучить модели и сохранить победителя в кэш моделей")
+    args = parser.parse_args()
+
+    tickers = [ticker.upper() for ticker in args.tickers]
+    if args.sp500:
+        tickers += load_sp500()
+    if not tickers and os.path.exists(args.watchlist):
+        tickers = load_watchlist(args.watchlist)
+    if not tickers:
+        parser.error("Не заданы тикеры: укажите их в аргументах, в --watchlist или --sp500")
+
+    start = time.perf_counter()
+    reports = await prefetch(tickers, concurrency=args.concurrency, pretrain=args.pretrain)
+    print_report(reports, time.perf_counter() - start)
+
+if __name__ == "__main__":
+    asyncio.run(main())
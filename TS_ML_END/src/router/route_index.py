@@ -0,0 +1,149 @@
+import re
+from typing import Dict, List, Optional, Tuple
+
+PARAM_SEGMENT = re.compile(r'^\{(\w+)\}$')
+PARAM_ANYWHERE = re.compile(r'\{(\w+)\}')
+
+
+class _Node:
+    __slots__ = ('children', 'param_child', 'path', 'params')
+
+    def __init__(self):
+        self.children: Dict[str, '_Node'] = {}
+        self.param_child: Optional['_Node'] = None
+        # Шаблон и имена его параметров, если здесь заканчивается маршрут
+        self.path: Optional[str] = None
+        self.params: List[str] = []
+
+
+class RouteIndex:
+    """Индекс маршрутов Router.
+
+    Статические пути ищутся в словаре, шаблоны вида /item/{id} - в дереве
+    сегментов за O(глубины). На каждом уровне статический сегмент имеет
+    приоритет над параметром, поэтому результат не зависит от порядка
+    регистрации. Шаблоны с параметром внутри сегмента (/item_{id})
+    проверяются регулярными выражениями.
+    """
+
+    def __init__(self):
+        self.static: Dict[str, str] = {}
+        self.root = _Node()
+        self.templates: List[Tuple[str, Tuple[Optional[str], ...]]] = []
+        self.complex: List[Tuple[str, re.Pattern, List[str]]] = []
+
+    @staticmethod
+    def _segments(path: str) -> List[str]:
+        return path.split('/')
+
+    def add(self, path: str) -> List[str]:
+        """Добавляет шаблон и возвращает описания пересечений с уже зарегистрированными"""
+        warnings = []
+
+        if not PARAM_ANYWHERE.search(path):
+            if path in self.static:
+                warnings.append(f"Маршрут {path} зарегистрирован повторно и переопределен")
+            for template in self._templates_matching(path):
+                warnings.append(
+                    f"Маршрут {path} пересекается с шаблоном {template}: приоритет у {path}")
+            self.static[path] = path
+            return warnings
+
+        segments = self._segments(path)
+        if not all(PARAM_SEGMENT.match(s) or '{' not in s for s in segments):
+            regex = re.compile('^' + PARAM_ANYWHERE.sub(r'([^/]+)', path) + '$')
+            warnings += [f"Маршрут {static} совпадает с шаблоном {path}: приоритет у {static}"
+                         for static in self.static if regex.match(static)]
+            self.complex.append((path, regex, PARAM_ANYWHERE.findall(path)))
+            return warnings
+
+        shape = tuple(None if PARAM_SEGMENT.match(s) else s for s in segments)
+        for other, other_shape in self.templates:
+            if len(other_shape) != len(shape):
+                continue
+            if other_shape == shape:
+                warnings.append(
+                    f"Шаблон {path} неоднозначен с {other}: используется {other}")
+            elif all(a is None or b is None or a == b for a, b in zip(shape, other_shape)):
+                winner = other if self._more_specific(other_shape, shape) else path
+                warnings.append(
+                    f"Шаблоны {path} и {other} пересекаются: приоритет у {winner}")
+
+        for static in self.static:
+            if self._shape_matches(shape, self._segments(static)):
+                warnings.append(f"Маршрут {static} совпадает с шаблоном {path}: приоритет у {static}")
+
+        node = self.root
+        for segment in segments:
+            if PARAM_SEGMENT.match(segment):
+                if node.param_child is None:
+                    node.param_child = _Node()
+                node = node.param_child
+            else:
+                node = node.children.setdefault(segment, _Node())
+
+        if node.path is None:
+            node.path = path
+            node.params = PARAM_ANYWHERE.findall(path)
+        self.templates.append((path, shape))
+        return warnings
+
+    @staticmethod
+    def _more_specific(first, second) -> bool:
+        """Какой из пересекающихся шаблонов выиграет: первый статический сегмент слева"""
+        for a, b in zip(first, second):
+            if (a is None) != (b is None):
+                return a is not None
+        return True
+
+    @staticmethod
+    def _shape_matches(shape, segments) -> bool:
+        return len(shape) == len(segments) and all(
+            expected is None and segment != '' or expected == segment
+            for expected, segment in zip(shape, segments)
+        )
+
+    def _templates_matching(self, path: str) -> List[str]:
+        segments = self._segments(path)
+        matched = [template for template, shape in self.templates
+                   if self._shape_matches(shape, segments)]
+        matched += [template for template, regex, _ in self.complex if regex.match(path)]
+        return matched
+
+    def match(self, request_path: str) -> Optional[Tuple[str, Dict[str, str]]]:
+        """Возвращает (шаблон, значения параметров) или None"""
+        path = self.static.get(request_path)
+        if path is not None:
+            return path, {}
+
+        segments = self._segments(request_path)
+        found = self._match_node(self.root, segments, 0, [])
+        if found is not None:
+            node, values = found
+            return node.path, dict(zip(node.params, values))
+
+        for path, regex, params in self.complex:
+            match = regex.match(request_path)
+            if match:
+                return path, dict(zip(params, match.groups()))
+
+        return None
+
+    def _match_node(self, node: _Node, segments: List[str], depth: int, values: List[str]):
+        if depth == len(segments):
+            return (node, values) if node.path is not None else None
+
+        segment = segments[depth]
+        child = node.children.get(segment)
+        if child is not None:
+            found = self._match_node(child, segments, depth + 1, values)
+            if found is not None:
+                return found
+
+        # Параметр соответствует непустому сегменту, как [^/]+ в регулярном выражении
+        if node.param_child is not None and segment:
+            found = self._match_node(node.param_child, segments, depth + 1, values + [segment])
+            if found is not None:
+                return found
+
+        return None
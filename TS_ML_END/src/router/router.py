@@ -1,12 +1,16 @@
 import asyncio
 import functools
-from typing import Callable, Dict, Any, Optional, List
+from dataclasses import dataclass
+from typing import Callable, Dict, Any, Optional, List, Tuple
 import inspect
 import re
 import logging
 import ast
 
 from view.base import MViewItem
+from router.route_index import RouteIndex
+from router.session_store import ChatSession, SessionStore, get_session_store
+from services import metrics
 
 # Настройка логгера
 logging.basicConfig(
@@ -20,26 +24,74 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
+@dataclass
+class RouteHandler:
+    """Описание обработчика, вычисляемое один раз при регистрации маршрута"""
+    handler: Callable
+    name: str
+    module: str
+    # (имя параметра, значение по умолчанию; None для обязательных)
+    params: Tuple[Tuple[str, Any], ...]
+    is_coroutine: bool
+    returns_function: bool
+
+    @classmethod
+    def compile(cls, handler: Callable, returns_function: bool) -> 'RouteHandler':
+        params = tuple(
+            (name, param.default if param.default is not param.empty else None)
+            for name, param in inspect.signature(handler).parameters.items()
+        )
+        return cls(
+            handler=handler,
+            name=getattr(handler, '__name__', repr(handler)),
+            module=getattr(handler, '__module__', ''),
+            params=params,
+            is_coroutine=inspect.iscoroutinefunction(handler),
+            returns_function=returns_function
+        )
+
+    def build_kwargs(self, kwargs: Dict[str, Any]) -> Dict[str, Any]:
+        """Переданные значения, иначе значения по умолчанию, иначе None"""
+        return {name: kwargs.get(name, default) for name, default in self.params}
+
+
 class Router:
-    def __init__(self):
+    def __init__(self, sessions: Optional[SessionStore] = None):
         self.routes: Dict[str, Dict[str, Any]] = {}
+        self.index = RouteIndex()
         self.base_controller = None
         self.middlewares: List[Callable] = []
-        self.current_item: MViewItem | None = None  # Для хранения текущего элемента формы
+        # Состояние форм и данные контроллеров хранятся отдельно для каждого чата
+        self.sessions = sessions or get_session_store()
 
     def add_middleware(self, middleware: Callable):
         self.middlewares.append(middleware)
 
-    def get_current_item(self):
-        """Возвращает текущий активный элемент (MViewItem)"""
-        if self.current_item:
-            return self.current_item
+    @staticmethod
+    def chat_id_of(update) -> Optional[int]:
+        """chat_id из Update (None, если чата нет)"""
+        chat = getattr(update, 'effective_chat', None)
+        return getattr(chat, 'id', None)
+
+    def session(self, chat_id: int) -> ChatSession:
+        return self.sessions.get(chat_id)
+
+    def save_session(self, session: ChatSession):
+        self.sessions.save(session)
+
+    def get_current_item(self, chat_id: int):
+        """Возвращает текущий активный элемент (MViewItem) чата"""
+        current_item = self.session(chat_id).current_item
+        if current_item:
+            return current_item
         else:
             return MViewItem(title="Ошибка", text="Ошибка формы")
 
-    def set_current_item(self, item):
-        """Устанавливает текущий активный элемент"""
-        self.current_item = item
+    def set_current_item(self, chat_id: int, item):
+        """Устанавливает текущий активный элемент чата и сохраняет сессию"""
+        session = self.session(chat_id)
+        session.current_item = item
+        self.save_session(session)
 
     def route(self, path: str, handler: Callable):
         """Регистрация обработчика без декоратора"""
@@ -53,14 +105,18 @@ class Router:
         self.routes[path] = {
             'handler': handler,
             'params': params,
-            'regex': re.compile(regex_path)
+            'regex': re.compile(regex_path),
+            # Разбор исходника и сигнатуры - один раз здесь, а не при каждом вызове
+            'descriptor': RouteHandler.compile(handler, self.returns_a_function(handler))
         }
+        for warning in self.index.add(path):
+            logger.warning(warning)
         return handler
 
     async def handle(self, request_path: str, *args, **kwargs) -> Any:
         """Основной метод обработки запросов с поддержкой формы"""
         # Проверяем, если это запрос формы (начинается с form_)
-        print(request_path)
+        logger.debug("Handling %s", request_path)
         if request_path.startswith(('form_choice:', 'form_back:')):
             try:
                 return await self._handle_form_request(request_path, *args, **kwargs)
@@ -68,42 +124,36 @@ class Router:
                 print(f"Form handling error: {e}")
                 raise
 
-        # Стандартная обработка маршрутов
-        matched_route = None
-        params_values = {}
-        matched_path: str = ''
-
-        for path, route_data in self.routes.items():
-            match = route_data['regex'].match(request_path)
-            if match:
-                matched_route = route_data
-                matched_path = path
-                params_values = {
-                    param: value
-                    for param, value in zip(
-                        route_data['params'],
-                        match.groups()
-                    )
-                }
-                break
-
-        if not matched_route:
-            print("Available routes:", self.routes.items())
-            raise ValueError(f"No route found for path: {request_path}")
-
-        # Добавляем update в params_values, если он передан в kwargs
-        if 'update' in kwargs:
-            params_values['update'] = kwargs['update']
-
-        # Добавляем параметры из URL в kwargs
-        kwargs.update(params_values)
-
-        # Передаем оригинальный путь, а не имя обработчика
-        return await self._execute_route(matched_path, *args, **kwargs)
+        # Стандартная обработка маршрутов: словарь статических путей, затем дерево шаблонов.
+        # router_dispatch - только работа роутера; обработчик и рендер замеряются своими этапами
+        with metrics.timer('router_dispatch') as labels:
+            matched = self.index.match(request_path)
+            if matched is None:
+                logger.warning("No route found for path: %s (registered: %d)",
+                               request_path, len(self.routes))
+                raise ValueError(f"No route found for path: {request_path}")
+
+            matched_path, params_values = matched
+            labels['route'] = matched_path
+
+            # Добавляем update в params_values, если он передан в kwargs
+            if 'update' in kwargs:
+                params_values['update'] = kwargs['update']
+
+            # Добавляем параметры из URL в kwargs
+            kwargs.update(params_values)
+
+            # Передаем оригинальный путь, а не имя обработчика
+            descriptor, final_kwargs = await self._prepare_route(matched_path, *args, **kwargs)
+        return await self._call_route(descriptor, final_kwargs, **kwargs)
 
     async def _handle_form_request(self, request_path: str, *args, **kwargs) -> Any:
         """Обработка запросов формы"""
-        current_item = self.get_current_item()
+        chat_id = self.chat_id_of(kwargs.get('update'))
+        if chat_id is None:
+            raise ValueError("Chat ID not provided")
+
+        current_item = self.get_current_item(chat_id)
         if not current_item or not getattr(current_item, 'form_fields', None):
             raise ValueError("No active form to handle")
 
@@ -113,6 +163,7 @@ class Router:
             if step == current_item.current_form_step:
                 current_item.getFormField(step).current_value = value
                 current_item.current_form_step += 1
+                self.set_current_item(chat_id, current_item)
                 if current_item.current_form_step >= len(current_item.form_fields):
                     # Форма завершена
                     form_data = {
@@ -124,11 +175,18 @@ class Router:
         elif request_path.startswith("form_back:"):
             step = int(request_path.split(":")[1])
             current_item.current_form_step = max(0, step - 1)
+            self.set_current_item(chat_id, current_item)
 
         return None
 
     async def _execute_route(self, path: str, *args, **kwargs) -> Any:
         """Выполняет обработку маршрута с автоподстановкой None для отсутствующих параметров"""
+        with metrics.timer('router_dispatch', route=path):
+            descriptor, final_kwargs = await self._prepare_route(path, *args, **kwargs)
+        return await self._call_route(descriptor, final_kwargs, **kwargs)
+
+    async def _prepare_route(self, path: str, *args, **kwargs) -> Tuple[RouteHandler, Dict]:
+        """Middleware, дескриптор обработчика маршрута и его аргументы"""
         try:
             matched_route = self.routes.get(path)
             if not matched_route:
@@ -147,37 +205,30 @@ class Router:
                     logger.error(f"Middleware error: {str(e)}", exc_info=True)
                     continue
 
-            # Анализируем параметры обработчика
-            handler_params = inspect.signature(
-                matched_route['handler']).parameters
-            final_kwargs = {}
-
-            # Заполняем параметры
-            for param_name, param in handler_params.items():
-                if param_name in kwargs:
-                    # Берем переданное значение
-                    final_kwargs[param_name] = kwargs[param_name]
-                elif param.default is not param.empty:
-                    # Используем значение по умолчанию из функции
-                    final_kwargs[param_name] = param.default
-                else:
-                    # Устанавливаем None для обязательных параметров
-                    final_kwargs[param_name] = None
-
-            # Логируем параметры
-            logger.info(
-                f"Calling {matched_route['handler'].__name__} with args: {final_kwargs}")
-            if self.returns_a_function(matched_route['handler']):
-                result = matched_route['handler'](**final_kwargs)
-                render_func = await result if inspect.isawaitable(result) else result
-                return await render_func(**kwargs)
-            else:
+            descriptor: RouteHandler = matched_route['descriptor']
+            if not descriptor.returns_function:
                 error_msg = "Функция не вернула ответ в виде асинхронной функции" + \
-                    f" {matched_route['handler'].__name__} из модуля {matched_route['handler'].__module__}" + \
+                    f" {descriptor.name} из модуля {descriptor.module}" + \
                     "Функция должна вернуть результат вида return partial( self.driver.render_message, content=MViewItem())"
                 logger.error(error_msg)
                 raise ValueError(error_msg)
 
+            final_kwargs = descriptor.build_kwargs(kwargs)
+
+            # Логируем параметры
+            logger.info("Calling %s with args: %s", descriptor.name, final_kwargs)
+            return descriptor, final_kwargs
+
+        except Exception as e:
+            logger.critical(f"Route execution failed: {str(e)}", exc_info=True)
+            raise
+
+    async def _call_route(self, descriptor: RouteHandler, final_kwargs: Dict, **kwargs) -> Any:
+        """Вызов обработчика и функции рендера, которую он вернул"""
+        try:
+            result = descriptor.handler(**final_kwargs)
+            render_func = await result if descriptor.is_coroutine or inspect.isawaitable(result) else result
+            return await render_func(**kwargs)
         except Exception as e:
             logger.critical(f"Route execution failed: {str(e)}", exc_info=True)
             raise
@@ -0,0 +1,135 @@
+import os
+import pickle
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional
+
+from services.atomic_io import atomic_write
+from view.base import MViewItem
+
+
+@dataclass
+class ChatSession:
+    """Состояние одного чата: активная форма и данные контроллеров"""
+    chat_id: int
+    user_id: Optional[int] = None
+    current_item: Optional[MViewItem] = None  # Форма с прогрессом заполнения
+    data: Dict[str, Any] = field(default_factory=dict)
+    updated_at: float = field(default_factory=time.time)
+
+
+class SessionStore(ABC):
+    """Хранилище сессий по chat_id"""
+
+    def __init__(self, ttl_hours: Optional[float] = None):
+        from config import Config
+
+        self.ttl = (ttl_hours if ttl_hours is not None else Config.SESSION_TTL_HOURS) * 3600
+
+    def get(self, chat_id: int) -> ChatSession:
+        """Сессия чата; если ее нет или она устарела - новая пустая"""
+        session = self._load(chat_id)
+        if session is None or self._expired(session):
+            session = ChatSession(chat_id=chat_id)
+        return session
+
+    def save(self, session: ChatSession):
+        session.updated_at = time.time()
+        self._store(session)
+
+    @abstractmethod
+    def delete(self, chat_id: int):
+        pass
+
+    @abstractmethod
+    def _load(self, chat_id: int) -> Optional[ChatSession]:
+        pass
+
+    @abstractmethod
+    def _store(self, session: ChatSession):
+        pass
+
+    def _expired(self, session: ChatSession) -> bool:
+        return time.time() - session.updated_at > self.ttl
+
+
+class MemorySessionStore(SessionStore):
+    """Сессии в памяти процесса: TTL и ограничение числа чатов (LRU)"""
+
+    def __init__(self, max_sessions: Optional[int] = None, ttl_hours: Optional[float] = None):
+        from config import Config
+
+        super().__init__(ttl_hours)
+        self.max_sessions = max_sessions or Config.SESSION_MAX
+        self._sessions: 'OrderedDict[int, ChatSession]' = OrderedDict()
+
+    def _load(self, chat_id: int) -> Optional[ChatSession]:
+        session = self._sessions.get(chat_id)
+        if session is not None:
+            self._sessions.move_to_end(chat_id)
+        return session
+
+    def _store(self, session: ChatSession):
+        self._sessions[session.chat_id] = session
+        self._sessions.move_to_end(session.chat_id)
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+
+    def delete(self, chat_id: int):
+        self._sessions.pop(chat_id, None)
+
+    def __len__(self):
+        return len(self._sessions)
+
+
+class DiskSessionStore(SessionStore):
+    """Сессии в pickle-файлах (по файлу на чат): переживают перезапуск бота"""
+
+    def __init__(self, directory: Optional[str] = None, ttl_hours: Optional[float] = None):
+        from config import Config
+
+        super().__init__(ttl_hours)
+        self.directory = directory or Config.SESSION_DIR
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _path(self, chat_id: int) -> str:
+        return os.path.join(self.directory, f"{chat_id}.pkl")
+
+    def _load(self, chat_id: int) -> Optional[ChatSession]:
+        path = self._path(chat_id)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, 'rb') as f:
+                return pickle.load(f)
+        except Exception as e:
+            print(f"Не удалось прочитать сессию {chat_id}: {e}")
+            self.delete(chat_id)
+            return None
+
+    def _store(self, session: ChatSession):
+        def write(path):
+            with open(path, 'wb') as f:
+                pickle.dump(session, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+        atomic_write(self._path(session.chat_id), write)
+
+    def delete(self, chat_id: int):
+        try:
+            os.remove(self._path(chat_id))
+        except OSError:
+            pass
+
+
+def get_session_store(name: Optional[str] = None) -> SessionStore:
+    """Хранилище по имени: memory | disk"""
+    from config import Config
+
+    name = (name or Config.SESSION_STORE).lower()
+    if name == 'memory':
+        return MemorySessionStore()
+    if name == 'disk':
+        return DiskSessionStore()
+    raise ValueError(f"Неизвестное хранилище сессий: {name}")
@@ -17,7 +17,8 @@ class AnalyticsService:
         self.current_cash = investment_amount
         self.current_shares = 0
 
-    def find_trading_points(self, prices: np.ndarray) -> List[TradingPoint]:
+    @staticmethod
+    def find_trading_points(prices: np.ndarray) -> List[TradingPoint]:
         """Поиск точек покупки и продажи в прогнозе"""
         trading_points = []
 
@@ -0,0 +1,289 @@
+import atexit
+import functools
+import json
+import multiprocessing
+import os
+import re
+import threading
+import time
+import warnings
+import numpy as np
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence, Tuple
+from config import Config
+from services import progress
+from services.atomic_io import atomic_write
+
+Order = Tuple[int, int, int]
+
+
+def choose_d(y: np.ndarray, max_d: int = 2, alpha: float = 0.05) -> int:
+    """Порядок разности: наименьший d, при котором тест Дики-Фуллера отвергает единичный корень"""
+    from statsmodels.tsa.stattools import adfuller
+
+    series = np.asarray(y, dtype=float)
+    for d in range(max_d + 1):
+        if len(series) < 20:
+            return d
+        if np.ptp(series) == 0:
+            return d
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            p_value = adfuller(series, autolag='AIC')[1]
+        if p_value < alpha:
+            return d
+        series = np.diff(series)
+    return max_d
+
+
+def _evaluate(y: np.ndarray, order: Order) -> Dict:
+    """Обучение одного кандидата (точка входа процесса пула)"""
+    from statsmodels.tsa.arima.model import ARIMA
+
+    started = time.perf_counter()
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            results = ARIMA(y, order=order).fit()
+        converged = results.mle_retvals.get('converged', True) if results.mle_retvals else True
+        if not converged or not np.isfinite(results.aic):
+            raise ValueError("оптимизация не сошлась")
+        return {'order': order, 'aic': float(results.aic), 'bic': float(results.bic),
+                'seconds': time.perf_counter() - started}
+    except Exception as e:
+        return {'order': order, 'error': str(e), 'seconds': time.perf_counter() - started}
+
+
+# Пул процессов подбора, общий для всех поисков процесса: запуск spawn-процессов
+# с импортом statsmodels не тратит бюджет каждого поиска. Пул пересоздается,
+# только если кандидата пришлось прервать по сроку
+_pool = None
+_pool_size = 0
+_pool_lock = threading.Lock()
+
+
+def _get_pool(workers: int):
+    global _pool, _pool_size
+    if _pool is None or _pool_size != workers:
+        _discard_pool()
+        _pool = multiprocessing.get_context('spawn').Pool(workers)
+        _pool_size = workers
+    return _pool
+
+
+def _discard_pool():
+    """terminate, а не close: кандидаты, не успевшие к сроку, не должны занимать CPU"""
+    global _pool
+    if _pool is not None:
+        _pool.terminate()
+        _pool.join()
+        _pool = None
+
+
+atexit.register(_discard_pool)
+
+
+@dataclass
+class OrderSearchResult:
+    order: Order
+    criterion: str
+    score: float
+    evaluated: List[Dict] = field(default_factory=list)
+    pruned: int = 0
+    timed_out: bool = False
+    seconds: float = 0.0
+
+
+class OrderSearch:
+    """Подбор порядка (p, d, q) ARIMA по AIC или BIC.
+
+    d выбирается тестом ADF (или перебирается из d_values), кандидаты (p, q)
+    обучаются раундами по возрастанию p + q. Отсечение: если увеличение p
+    (или q) ухудшило критерий, большие p (q) при том же q (p) не проверяются;
+    поиск заканчивается после patience раундов без улучшения или по истечении
+    budget секунд - тогда возвращается лучший из уже обученных кандидатов.
+
+    Тест ADF и обучение кандидатов выполняются в пуле из workers процессов
+    (при workers=1 - в одном процессе по очереди), поэтому бюджет жесткий:
+    вычисления, не успевшие к сроку, прерываются. Раунд не начинается, если
+    до конца бюджета осталось меньше, чем занял самый долгий из кандидатов.
+    Одновременные поиски в одном процессе выполняются по очереди.
+    """
+
+    def __init__(self, p_values: Optional[Sequence[int]] = None,
+                 q_values: Optional[Sequence[int]] = None,
+                 d_values: Optional[Sequence[int]] = None,
+                 criterion: Optional[str] = None, budget: Optional[float] = None,
+                 workers: Optional[int] = None, patience: int = 2,
+                 fallback: Order = (5, 1, 0)):
+        self.p_values = sorted(p_values if p_values is not None else Config.ARIMA_P_VALUES)
+        self.q_values = sorted(q_values if q_values is not None else Config.ARIMA_Q_VALUES)
+        self.d_values = list(d_values if d_values is not None else Config.ARIMA_D_VALUES)
+        self.criterion = criterion or Config.ARIMA_CRITERION
+        if self.criterion not in ('aic', 'bic'):
+            raise ValueError(f"Неизвестный критерий: {self.criterion}")
+        self.budget = budget if budget is not None else Config.ARIMA_SEARCH_BUDGET
+        self.workers = workers if workers is not None else Config.ARIMA_SEARCH_WORKERS
+        self.patience = patience
+        self.fallback = fallback
+
+    def _rounds(self, d: int) -> List[List[Order]]:
+        by_size: Dict[int, List[Order]] = {}
+        for p in self.p_values:
+            for q in self.q_values:
+                by_size.setdefault(p + q, []).append((p, d, q))
+        return [by_size[size] for size in sorted(by_size)]
+
+    def search(self, y) -> OrderSearchResult:
+        y = np.asarray(y, dtype=float)
+        started = time.perf_counter()
+        deadline = time.monotonic() + self.budget
+
+        scores: Dict[Order, float] = {}
+        evaluated: List[Dict] = []
+        pruned = 0
+        timed_out = False
+
+        with _pool_lock:
+            try:
+                pool = _get_pool(max(1, self.workers))
+                d_values = self.d_values
+                if not d_values:
+                    d = self._choose_d(pool, y, deadline)
+                    d_values, timed_out = ([d], False) if d is not None else ([], True)
+
+                for d in d_values:
+                    blocked_p, blocked_q = {}, {}
+                    best_before = float('inf')
+                    stale = 0
+                    for candidates in self._rounds(d):
+                        # Отсечение по направлениям, где рост p или q уже ухудшил критерий
+                        round_orders = [o for o in candidates
+                                        if o[0] <= blocked_p.get(o[2], o[0]) and o[2] <= blocked_q.get(o[0], o[2])]
+                        pruned += len(candidates) - len(round_orders)
+                        if not round_orders:
+                            continue
+
+                        slowest = max((r['seconds'] for r in evaluated), default=0.0)
+                        results, timed_out = self._evaluate_round(pool, y, round_orders, deadline, slowest)
+                        for result in results:
+                            evaluated.append(result)
+                            if 'error' not in result:
+                                scores[result['order']] = result[self.criterion]
+                        progress.report('arima_order', 'progress',
+                                        detail=f"проверено порядков: {len(evaluated)}")
+                        if timed_out:
+                            break
+
+                        for p, _, q in round_orders:
+                            score = scores.get((p, d, q), float('inf'))
+                            if scores.get((p - 1, d, q), float('inf')) < score:
+                                blocked_p[q] = min(blocked_p.get(q, p), p)
+                            if scores.get((p, d, q - 1), float('inf')) < score:
+                                blocked_q[p] = min(blocked_q.get(p, q), q)
+
+                        best = min((v for o, v in scores.items() if o[1] == d), default=float('inf'))
+                        stale = 0 if best < best_before else stale + 1
+                        best_before = min(best_before, best)
+                        if stale >= self.patience:
+                            break
+                    if timed_out:
+                        break
+            except BaseException:
+                _discard_pool()
+                raise
+
+        if scores:
+            order = min(scores, key=scores.get)
+            score = scores[order]
+        else:
+            order, score = self.fallback, float('nan')
+        return OrderSearchResult(order, self.criterion, score, evaluated, pruned, timed_out,
+                                 time.perf_counter() - started)
+
+    @staticmethod
+    def _choose_d(pool, y, deadline: float) -> Optional[int]:
+        """Порядок разности из процесса пула; None - бюджет исчерпан"""
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return None
+        try:
+            return pool.apply_async(choose_d, (y,)).get(timeout=remaining)
+        except multiprocessing.TimeoutError:
+            _discard_pool()
+            return None
+
+    @staticmethod
+    def _evaluate_round(pool, y, orders: List[Order], deadline: float,
+                        slowest: float) -> Tuple[List[Dict], bool]:
+        """Результаты раунда и признак истечения бюджета"""
+        # Раунд, кандидаты которого по опыту не успеют до срока, не начинается
+        if deadline - time.monotonic() <= slowest:
+            return [], True
+
+        pending = pool.imap_unordered(functools.partial(_evaluate, y), orders)
+        results = []
+        for _ in orders:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining <= 0:
+                    raise multiprocessing.TimeoutError
+                results.append(pending.next(timeout=remaining))
+            except multiprocessing.TimeoutError:
+                # Незавершенные кандидаты прерываются вместе с пулом
+                _discard_pool()
+                return results, True
+        return results, False
+
+
+class OrderCache:
+    """Выбранные порядки ARIMA по тикерам (JSON-файл на тикер) со сроком годности"""
+
+    def __init__(self, directory: Optional[str] = None, ttl_hours: Optional[float] = None):
+        self.directory = directory or Config.ARIMA_STATE_DIR
+        self.ttl = (ttl_hours if ttl_hours is not None else Config.ARIMA_ORDER_TTL_HOURS) * 3600
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        safe = re.sub(r'[^A-Za-z0-9._-]', '_', key.upper())
+        return os.path.join(self.directory, f"{safe}.order.json")
+
+    def get(self, key: str) -> Optional[Order]:
+        try:
+            with open(self._path(key), encoding='utf-8') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if time.time() - entry.get('searched_at', 0) > self.ttl:
+            return None
+        return tuple(entry['order'])
+
+    def put(self, key: str, result: OrderSearchResult):
+        entry = {'order': list(result.order), 'criterion': result.criterion,
+                 'score': result.score, 'complete': not result.timed_out,
+                 'searched_at': time.time()}
+        def write(path):
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(entry, f)
+
+        atomic_write(self._path(key), write)
+
+
+def find_order(y, key: Optional[str] = None, search: Optional[OrderSearch] = None,
+               cache: Optional[OrderCache] = None) -> Order:
+    """Порядок ARIMA для ряда: из кэша по ключу (тикеру) или подбором с записью в кэш"""
+    cache = cache or (OrderCache() if key else None)
+    if key and (order := cache.get(key)) is not None:
+        return order
+
+    with progress.stage('arima_order', 'Подбор порядка ARIMA'):
+        result = (search or OrderSearch()).search(y)
+    print(f"ARIMA{result.order}: {result.criterion}={result.score:.2f}, "
+          f"проверено {len(result.evaluated)}, отсечено {result.pruned}, "
+          f"{result.seconds:.1f} c{' (бюджет исчерпан)' if result.timed_out else ''}")
+
+    # Порядок из неполного перебора тоже кэшируется: иначе каждый запрос
+    # по тикеру снова тратил бы весь бюджет
+    if key and np.isfinite(result.score):
+        cache.put(key, result)
+    return result.order
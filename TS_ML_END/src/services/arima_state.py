@@ -0,0 +1,94 @@
+import os
+import pickle
+import re
+import threading
+import time
+import numpy as np
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional, Tuple
+from config import Config
+from services.atomic_io import atomic_write
+
+
+@dataclass
+class ArimaState:
+    """Параметры ARIMA ряда между запросами и ряд, на котором они получены"""
+    order: Tuple[int, int, int]
+    params: np.ndarray
+    y: np.ndarray
+    refit_at: float
+    updates: int = 0
+
+
+class ArimaStateStore:
+    """Состояние ARIMA по тикерам: на диске (общее для процессов пула) и
+    обученные объекты statsmodels в памяти процесса (LRU).
+
+    Полная переоценка параметров нужна раз в refit_every обновлений или
+    раз в refit_hours часов; между ними модель обновляется с прежними параметрами.
+    """
+
+    def __init__(self, directory: Optional[str] = None, refit_every: Optional[int] = None,
+                 refit_hours: Optional[float] = None, max_results: int = 32):
+        self.directory = directory or Config.ARIMA_STATE_DIR
+        self.refit_every = refit_every if refit_every is not None else Config.ARIMA_REFIT_EVERY
+        self.refit_after = (refit_hours if refit_hours is not None else Config.ARIMA_REFIT_HOURS) * 3600
+        self.max_results = max_results
+        self._results: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _path(self, key: str, order) -> str:
+        safe = re.sub(r'[^A-Za-z0-9._-]', '_', key.upper())
+        return os.path.join(self.directory, f"{safe}_{'_'.join(map(str, order))}.pkl")
+
+    def load(self, key: str, order) -> Optional[ArimaState]:
+        path = self._path(key, order)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, 'rb') as f:
+                return pickle.load(f)
+        except Exception as e:
+            print(f"Не удалось прочитать состояние ARIMA {key}: {e}")
+            return None
+
+    def save(self, key: str, state: ArimaState):
+        """Атомарная запись: параллельные процессы пула не видят недописанный файл"""
+        def write(path):
+            with open(path, 'wb') as f:
+                pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+        atomic_write(self._path(key, state.order), write)
+
+    def due_refit(self, state: ArimaState) -> bool:
+        return (state.updates >= self.refit_every
+                or time.time() - state.refit_at >= self.refit_after)
+
+    def results(self, key: str, order, nobs: int):
+        """Обученный объект statsmodels этого процесса, если он построен на nobs наблюдениях"""
+        with self._lock:
+            results = self._results.get((key.upper(), tuple(order)))
+            if results is None or results.nobs != nobs:
+                return None
+            self._results.move_to_end((key.upper(), tuple(order)))
+            return results
+
+    def keep_results(self, key: str, order, results):
+        with self._lock:
+            self._results[(key.upper(), tuple(order))] = results
+            self._results.move_to_end((key.upper(), tuple(order)))
+            while len(self._results) > self.max_results:
+                self._results.popitem(last=False)
+
+
+_store: Optional[ArimaStateStore] = None
+
+
+def get_arima_state_store() -> ArimaStateStore:
+    """Хранилище текущего процесса с настройками из Config"""
+    global _store
+    if _store is None:
+        _store = ArimaStateStore()
+    return _store
@@ -0,0 +1,22 @@
+import os
+import tempfile
+from typing import Callable
+
+
+def atomic_write(path: str, write: Callable[[str], None]):
+    """Атомарная запись файла: write(tmp_path) пишет во временный файл рядом
+    с целевым, который затем подменяет целевой через os.replace. Читатели
+    (в том числе другие процессы) видят либо прежний файл, либо новый целиком.
+    """
+    directory = os.path.dirname(path) or '.'
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    os.close(fd)
+    try:
+        write(tmp_path)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
@@ -0,0 +1,214 @@
+import copy
+import multiprocessing
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence, Tuple
+from models.ml_model import BaseModel
+from config import Config
+from services import progress
+
+
+@dataclass(frozen=True)
+class Fold:
+    """Границы фолда в строках: обучение [train_start, train_end), тест [train_end, test_end)"""
+    index: int
+    train_start: int
+    train_end: int
+    test_end: int
+
+
+def make_folds(n: int, folds: int, test_size: Optional[int] = None, window: str = 'expanding',
+               min_train: Optional[int] = None) -> List[Fold]:
+    """Фолды rolling-origin: тестовые отрезки идут подряд в конце ряда.
+
+    expanding - обучение с начала ряда до теста, sliding - окно фиксированной
+    длины перед тестом. По умолчанию тесты делят последние
+    (1 - TRAIN_TEST_SPLIT) строк ряда, как отложенная выборка обычного режима.
+    """
+    if window not in ('expanding', 'sliding'):
+        raise ValueError(f"Неизвестный тип окна: {window}")
+    if folds < 1:
+        raise ValueError("Число фолдов должно быть положительным")
+
+    test_size = test_size or max(1, int(n * (1 - Config.TRAIN_TEST_SPLIT)) // folds)
+    first_test = n - folds * test_size
+    train_size = min_train or first_test
+    if first_test < 1 or train_size > first_test:
+        raise ValueError(
+            f"Недостаточно данных для {folds} фолдов по {test_size} строк: всего {n} строк")
+
+    result = []
+    for k in range(folds):
+        train_end = first_test + k * test_size
+        train_start = 0 if window == 'expanding' else train_end - train_size
+        result.append(Fold(k, train_start, train_end, train_end + test_size))
+    return result
+
+
+@dataclass
+class BacktestResult:
+    """Метрики по фолдам и сводный рейтинг моделей (по среднему RMSE)"""
+    folds: List[Dict] = field(default_factory=list)
+    errors: Dict[str, str] = field(default_factory=dict)
+    # Модель каждого типа, обученная на последнем фолде, и ее прогноз на тесте
+    models: Dict[str, BaseModel] = field(default_factory=dict)
+    predictions: Dict[str, np.ndarray] = field(default_factory=dict)
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """Среднее и стандартное отклонение метрик по фолдам для каждой модели"""
+        by_model: Dict[str, List[Dict]] = {}
+        for record in self.folds:
+            by_model.setdefault(record['model'], []).append(record['metrics'])
+
+        summary = {}
+        for name, fold_metrics in by_model.items():
+            stats = {'folds': len(fold_metrics)}
+            for metric in Config.METRICS:
+                values = [m[metric] for m in fold_metrics if metric in m]
+                if values:
+                    stats[metric] = float(np.mean(values))
+                    stats[f'{metric}_std'] = float(np.std(values))
+            summary[name] = stats
+        return summary
+
+    def ranking(self) -> List[Tuple[str, Dict[str, float]]]:
+        """Модели по возрастанию среднего RMSE"""
+        return sorted(self.summary().items(), key=lambda item: item[1].get('rmse', float('inf')))
+
+
+def _frame(values: np.ndarray, columns: Sequence[str]) -> pd.DataFrame:
+    """DataFrame поверх среза матрицы без копирования данных"""
+    return pd.DataFrame(values, columns=columns, copy=False)
+
+
+def _run_chain(model: BaseModel, X: np.ndarray, y: np.ndarray, columns: Sequence[str],
+               folds: List[Fold], warm_start: bool) -> List[Tuple]:
+    """Обучение и оценка одной модели на последовательности фолдов.
+
+    При warm_start модель переходит из фолда в фолд и дообучается через partial_fit
+    только на добавившихся строках (если окно расширяется). Последний фолд
+    обучается заново: его модель идет в прогноз и в кэш и должна совпадать
+    с обычным fit (для леса - n_estimators деревьев, а не лес разного возраста).
+    Возвращает [(fold, metrics, predictions, model последнего фолда или None)].
+    """
+    results = []
+    previous: Optional[Fold] = None
+    model = copy.deepcopy(model)
+    if getattr(model, 'series_key', None):
+        # Параметры из прошлых запросов оценены на более поздних данных, чем ранние фолды
+        model.series_key = None
+
+    for fold in folds:
+        X_train = _frame(X[fold.train_start:fold.train_end], columns)
+        y_train = pd.Series(y[fold.train_start:fold.train_end], copy=False)
+
+        continues = (warm_start and previous is not None and fold is not folds[-1]
+                     and fold.train_start == previous.train_start
+                     and fold.train_end > previous.train_end)
+        if continues:
+            model.partial_fit(X_train, y_train, fold.train_end - previous.train_end)
+        else:
+            model.fit(X_train, y_train)
+
+        y_pred = np.asarray(model.predict(_frame(X[fold.train_end:fold.test_end], columns)), dtype=float)
+        metrics = model.evaluate(y[fold.train_end:fold.test_end], y_pred)
+        progress.report('backtest', 'progress', detail=f"{model.get_name()}: фолд {fold.index + 1}")
+        results.append((fold, metrics, y_pred, None))
+        previous = fold
+
+    if results:
+        fold, metrics, y_pred, _ = results[-1]
+        results[-1] = (fold, metrics, y_pred, model)
+    return results
+
+
+class Backtester:
+    """Walk-forward кросс-валидация моделей.
+
+    Матрица признаков строится один раз; фолды получают ее срезы без копирования.
+    С warm_start фолды одной модели идут по цепочке (модель дообучается,
+    а не обучается заново), параллельно обучаются разные модели. Без warm_start
+    каждый фолд каждой модели - отдельная задача пула процессов.
+    """
+
+    def __init__(self, folds: Optional[int] = None, window: Optional[str] = None,
+                 test_size: Optional[int] = None, warm_start: Optional[bool] = None,
+                 workers: Optional[int] = None):
+        self.folds = folds or Config.BACKTEST_FOLDS
+        self.window = window or Config.BACKTEST_WINDOW
+        self.test_size = test_size or Config.BACKTEST_TEST_SIZE or None
+        self.warm_start = Config.BACKTEST_WARM_START if warm_start is None else warm_start
+        self.workers = workers if workers is not None else Config.BACKTEST_WORKERS
+
+    def run(self, models: List[BaseModel], X: pd.DataFrame, y: pd.Series) -> BacktestResult:
+        columns = list(X.columns)
+        X_values = X.to_numpy(dtype=np.float64)
+        y_values = np.asarray(y, dtype=np.float64)
+        folds = make_folds(len(X_values), self.folds, self.test_size, self.window)
+
+        # Подбор гиперпараметров по ряду (порядок ARIMA) - один раз на самом длинном
+        # обучающем отрезке, а не в каждом фолде: копии в цепочках получают готовый порядок
+        last = folds[-1]
+        for model in models:
+            if hasattr(model, 'resolve_order'):
+                model.resolve_order(y_values[last.train_start:last.train_end])
+
+        # Задача - цепочка фолдов одной модели (warm_start) или один фолд
+        tasks = []
+        for model in models:
+            if self.warm_start:
+                tasks.append((model, folds))
+            else:
+                tasks.extend((model, [fold]) for fold in folds)
+
+        result = BacktestResult()
+        last_fold = folds[-1].index
+
+        def collect(model: BaseModel, chain):
+            for fold, metrics, y_pred, fitted in chain:
+                result.folds.append({
+                    'model': model.get_name(), 'fold': fold.index,
+                    'train': (fold.train_start, fold.train_end),
+                    'test': (fold.train_end, fold.test_end), 'metrics': metrics
+                })
+                if fold.index == last_fold:
+                    result.models[model.get_name()] = fitted
+                    result.predictions[model.get_name()] = y_pred
+
+        with progress.stage('backtest', f"Кросс-валидация: {self.folds} фолдов"):
+            if self.workers <= 1 or len(tasks) == 1:
+                for model, chain in tasks:
+                    try:
+                        collect(model, _run_chain(model, X_values, y_values, columns, chain,
+                                                  self.warm_start))
+                    except Exception as e:
+                        result.errors[model.get_name()] = str(e)
+            else:
+                self._run_parallel(tasks, X_values, y_values, columns, collect, result)
+
+        # Модель, упавшая хотя бы на одном фолде, в рейтинг не попадает
+        result.folds = sorted((r for r in result.folds if r['model'] not in result.errors),
+                              key=lambda r: (r['model'], r['fold']))
+        for name in result.errors:
+            result.models.pop(name, None)
+            result.predictions.pop(name, None)
+            print(f"Ошибка в модели {name}: {result.errors[name]}")
+        return result
+
+    def _run_parallel(self, tasks, X_values, y_values, columns, collect, result):
+        # spawn: как и в ForecastExecutor, форк процесса с потоками и torch небезопасен
+        with ProcessPoolExecutor(max_workers=min(self.workers, len(tasks)),
+                                 mp_context=multiprocessing.get_context('spawn')) as pool:
+            futures = {
+                pool.submit(progress.call_with_sink, progress.current_sink(), _run_chain,
+                            model, X_values, y_values, columns, chain, self.warm_start): model
+                for model, chain in tasks
+            }
+            for future in as_completed(futures):
+                model = futures[future]
+                try:
+                    collect(model, future.result())
+                except Exception as e:
+                    result.errors[model.get_name()] = str(e)
@@ -0,0 +1,134 @@
+import os
+import numpy as np
+import pandas as pd
+from abc import ABC, abstractmethod
+from typing import Optional
+from services.atomic_io import atomic_write
+
+
+class CacheBackend(ABC):
+    """Формат хранения котировок в кэше DataService"""
+    name: str = ''
+    extension: str = ''
+
+    def path(self, cache_dir: str, ticker: str) -> str:
+        return os.path.join(cache_dir, f"{ticker.lower()}{self.extension}")
+
+    @abstractmethod
+    def load(self, path: str) -> pd.DataFrame:
+        """Чтение кэша: float64-колонки и DatetimeIndex без часового пояса"""
+        pass
+
+    @abstractmethod
+    def _write(self, path: str, df: pd.DataFrame):
+        pass
+
+    def save(self, path: str, df: pd.DataFrame):
+        """Атомарная запись: временный файл рядом с целевым и os.replace"""
+        atomic_write(path, lambda tmp_path: self._write(tmp_path, df))
+
+    @staticmethod
+    def _numeric(df: pd.DataFrame) -> pd.DataFrame:
+        return df.select_dtypes(include='number').astype(np.float64)
+
+
+class CsvCacheBackend(CacheBackend):
+    name = 'csv'
+    extension = '.csv'
+
+    def load(self, path: str) -> pd.DataFrame:
+        return pd.read_csv(path, index_col=0)
+
+    def _write(self, path: str, df: pd.DataFrame):
+        df.to_csv(path)
+
+
+class NumpyCacheBackend(CacheBackend):
+    """Один .npy со структурированным массивом: дата int64 (нс) + float64 OHLCV.
+
+    Файл открывается через memory map, парсинга текста нет.
+    """
+    name = 'npy'
+    extension = '.npy'
+
+    def load(self, path: str) -> pd.DataFrame:
+        records = np.load(path, mmap_mode='r')
+        columns = [name for name in records.dtype.names if name != 'Date']
+        index = pd.DatetimeIndex(np.asarray(records['Date']).view('datetime64[ns]'), name='Date')
+        return pd.DataFrame({name: np.asarray(records[name]) for name in columns}, index=index)
+
+    def _write(self, path: str, df: pd.DataFrame):
+        numeric = self._numeric(df)
+        dtype = [('Date', np.int64)] + [(str(name), np.float64) for name in numeric.columns]
+        records = np.empty(len(numeric), dtype=dtype)
+        records['Date'] = pd.DatetimeIndex(numeric.index).as_unit('ns').asi8
+        for name in numeric.columns:
+            records[str(name)] = numeric[name].to_numpy()
+        with open(path, 'wb') as f:
+            np.save(f, records, allow_pickle=False)
+
+
+class ParquetCacheBackend(CacheBackend):
+    """Parquet через pyarrow (если установлен)"""
+    name = 'parquet'
+    extension = '.parquet'
+
+    def load(self, path: str) -> pd.DataFrame:
+        return pd.read_parquet(path)
+
+    def _write(self, path: str, df: pd.DataFrame):
+        numeric = self._numeric(df)
+        numeric.index = pd.DatetimeIndex(numeric.index, name='Date')
+        numeric.to_parquet(path, engine='pyarrow')
+
+
+def parquet_available() -> bool:
+    try:
+        import pyarrow  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def get_cache_backend(name: Optional[str] = None) -> CacheBackend:
+    """Бэкенд по имени: csv | npy | parquet | auto (parquet при наличии pyarrow, иначе npy)"""
+    from config import Config
+
+    name = (name or Config.CACHE_FORMAT).lower()
+    if name == 'auto':
+        name = 'parquet' if parquet_available() else 'npy'
+
+    backends = {
+        'csv': CsvCacheBackend,
+        'npy': NumpyCacheBackend,
+        'parquet': ParquetCacheBackend,
+    }
+    if name not in backends:
+        raise ValueError(f"Неизвестный формат кэша: {name}")
+    if name == 'parquet' and not parquet_available():
+        raise ValueError("Для формата parquet требуется пакет pyarrow")
+    return backends[name]()
+
+
+def migrate_csv_cache(cache_dir: str, backend: CacheBackend, remove_csv: bool = True) -> int:
+    """Однократный перенос CSV-кэша в другой формат. Возвращает число перенесенных тикеров."""
+    if isinstance(backend, CsvCacheBackend):
+        return 0
+
+    from services.data_service import DataService
+
+    csv_backend = CsvCacheBackend()
+    migrated = 0
+    for name in sorted(os.listdir(cache_dir)):
+        if not name.endswith(csv_backend.extension):
+            continue
+        ticker = name[:-len(csv_backend.extension)]
+        csv_path = os.path.join(cache_dir, name)
+
+        df = DataService._normalize_index(csv_backend.load(csv_path))
+        backend.save(backend.path(cache_dir, ticker), df)
+        if remove_csv:
+            os.remove(csv_path)
+        migrated += 1
+
+    return migrated
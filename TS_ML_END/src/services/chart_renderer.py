@@ -0,0 +1,116 @@
+import threading
+import numpy as np
+from io import BytesIO
+from datetime import datetime
+from typing import List, Sequence, Tuple
+from services.analytics_service import TradingPoint
+
+# Заготовки фигур: своя на каждый поток (и, значит, на каждый процесс пула)
+_templates = threading.local()
+
+
+def _matplotlib():
+    """Импорт matplotlib при первом рисовании, а не при старте бота"""
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.dates import date2num
+    from matplotlib.layout_engine import TightLayoutEngine
+    return Figure, FigureCanvasAgg, date2num, TightLayoutEngine
+
+
+class _Template:
+    """Фигура с осями, подписями и раскладкой, у которой меняются только данные"""
+
+    def __init__(self, figsize: Tuple[float, float]):
+        Figure, FigureCanvasAgg, date2num, TightLayoutEngine = _matplotlib()
+        self.date2num = date2num
+
+        self.fig = Figure(figsize=figsize)
+        FigureCanvasAgg(self.fig)
+        ax = self.ax = self.fig.add_subplot()
+
+        self.history, = ax.plot([], [], 'b-', label='Исторические данные', linewidth=2)
+        self.forecast, = ax.plot([], [], 'r--', label='Прогноз', linewidth=2)
+        self.separator = ax.axvline(x=0, color='gray', linestyle=':', alpha=0.5)
+        self.buy = ax.scatter([], [], color='green', s=100, marker='^', label='Покупка', zorder=5)
+        self.sell = ax.scatter([], [], color='red', s=100, marker='v', label='Продажа', zorder=5)
+        self.title = ax.set_title('', fontsize=14, fontweight='bold')
+
+        ax.set_xlabel('Дата')
+        ax.set_ylabel('Цена ($)')
+        ax.grid(True, alpha=0.3)
+        ax.xaxis_date()
+        ax.tick_params(axis='x', labelrotation=45)
+
+        self.layout = TightLayoutEngine()
+        # Подписи оси цен, для которых посчитаны поля
+        self.layout_key = None
+
+    def update(self, historical_prices: Sequence[float], forecast_prices: Sequence[float],
+               trading_points: List[TradingPoint], ticker: str):
+        # Даты - числа matplotlib: последний день прогноза - вчерашний день от текущего момента,
+        # как в исходном графике
+        total_days = len(historical_prices) + len(forecast_prices)
+        dates = self.date2num(datetime.now()) - (total_days - np.arange(total_days))
+        hist_dates = dates[:len(historical_prices)]
+        forecast_dates = dates[len(historical_prices):]
+
+        self.history.set_data(hist_dates, historical_prices)
+        self.forecast.set_data(forecast_dates, forecast_prices)
+        self.separator.set_xdata([hist_dates[-1], hist_dates[-1]])
+
+        handles = [self.history, self.forecast]
+        for collection, action in ((self.buy, 'buy'), (self.sell, 'sell')):
+            points = [tp for tp in trading_points if tp.action == action]
+            offsets = np.array([[forecast_dates[tp.date_index], tp.price] for tp in points])
+            collection.set_offsets(offsets if len(points) else np.empty((0, 2)))
+            if points:
+                handles.append(collection)
+
+        self.title.set_text(f'Прогноз цен акций {ticker}')
+        self.ax.legend(handles=handles)
+        self.ax.relim()
+        self.ax.autoscale_view()
+        self._fit_layout()
+
+    def _fit_layout(self):
+        """Поля (как tight_layout) пересчитываются, только когда меняется ширина
+        подписей делений оси цен или множитель оси. Движок раскладки у фигуры
+        не остается, иначе savefig каждый раз делает лишний пробный draw"""
+        formatter = self.ax.yaxis.get_major_formatter()
+        labels = formatter.format_ticks(self.ax.yaxis.get_majorticklocs())
+        key = (max(map(len, labels), default=0), formatter.get_offset())
+        if key != self.layout_key:
+            self.layout.execute(self.fig)
+            self.layout_key = key
+
+
+class ChartRenderer:
+    """Рисует график прогноза на переиспользуемой заготовке фигуры.
+
+    Оси, сетка, подписи и раскладка создаются один раз на поток,
+    на каждый запрос обновляются только линии, точки и заголовок.
+    """
+
+    def __init__(self, figsize: Tuple[float, float] = (12, 6), dpi: int = 150):
+        self.figsize = figsize
+        self.dpi = dpi
+
+    def _template(self) -> _Template:
+        cache = getattr(_templates, 'cache', None)
+        if cache is None:
+            cache = _templates.cache = {}
+        key = tuple(self.figsize)
+        if key not in cache:
+            cache[key] = _Template(self.figsize)
+        return cache[key]
+
+    def render(self, historical_prices: np.ndarray, forecast_prices: np.ndarray,
+               trading_points: List[TradingPoint], ticker: str) -> bytes:
+        """PNG-байты графика"""
+        template = self._template()
+        template.update(historical_prices, forecast_prices, trading_points, ticker)
+
+        buffer = BytesIO()
+        template.fig.savefig(buffer, format='png', dpi=self.dpi)
+        return buffer.getvalue()
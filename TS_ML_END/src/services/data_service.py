@@ -2,61 +2,213 @@ import yfinance as yf
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
+from typing import Callable, Dict, Optional
+import json
+import logging
 import os
+import threading
+import time
 from config import Config
+from services.cache_backend import CacheBackend, CsvCacheBackend, get_cache_backend
+from services import metrics, progress
+from services.atomic_io import atomic_write
+from services.features import FeaturePipeline
+
+logger = logging.getLogger(__name__)
+
+# Блокировки переноса CSV в текущий бэкенд, по файлу кэша
+_migration_locks: Dict[str, threading.Lock] = {}
+_migration_locks_guard = threading.Lock()
+
+
+def _migration_lock(path: str) -> threading.Lock:
+    with _migration_locks_guard:
+        return _migration_locks.setdefault(path, threading.Lock())
 
 
 class DataService:
-    def __init__(self, cache_dir=None):
+    def __init__(self, cache_dir=None, downloader: Optional[Callable] = None,
+                 refresh_hours: Optional[float] = None,
+                 refresh_overrides: Optional[Dict[str, float]] = None,
+                 backend: Optional[CacheBackend] = None):
         self.cache_dir = cache_dir or Config.YAHOO_CACHE_DIR
+        self.backend = backend or get_cache_backend()
+        # downloader(ticker, start, end) -> DataFrame; по умолчанию Yahoo Finance
+        self.downloader = downloader or self._download_yahoo
+        self.refresh_hours = refresh_hours if refresh_hours is not None else Config.CACHE_REFRESH_HOURS
+        self.refresh_overrides = {
+            ticker.upper(): hours for ticker, hours in
+            (refresh_overrides if refresh_overrides is not None else Config.CACHE_REFRESH_OVERRIDES).items()
+        }
         os.makedirs(self.cache_dir, exist_ok=True)
 
+    @staticmethod
+    def _download_yahoo(ticker: str, start: datetime, end: datetime) -> pd.DataFrame:
+        stock = yf.Ticker(ticker)
+        return stock.history(start=start, end=end)
+
+    @staticmethod
+    def _normalize_index(df: pd.DataFrame) -> pd.DataFrame:
+        """Индекс дат без часового пояса (локальное время биржи сохраняется)"""
+        index = df.index
+        if not isinstance(index, pd.DatetimeIndex):
+            index = pd.DatetimeIndex([pd.Timestamp(value).tz_localize(None) for value in index])
+        elif index.tz is not None:
+            index = index.tz_localize(None)
+        df.index = index
+        df.index.name = 'Date'
+        return df
+
+    def _cache_file(self, ticker: str) -> str:
+        return self.backend.path(self.cache_dir, ticker)
+
+    def _load_cached(self, ticker: str) -> Optional[pd.DataFrame]:
+        """Чтение кэша тикера; CSV старого формата переносится в текущий бэкенд"""
+        cache_file = self._cache_file(ticker)
+
+        if not os.path.exists(cache_file) and not isinstance(self.backend, CsvCacheBackend):
+            # Одновременные запросы тикера переносят CSV один раз; остальные
+            # (и другие процессы, у которых свои блокировки) читают перенесенный файл
+            with _migration_lock(cache_file):
+                csv_backend = CsvCacheBackend()
+                csv_file = csv_backend.path(self.cache_dir, ticker)
+                if not os.path.exists(cache_file) and os.path.exists(csv_file):
+                    try:
+                        df = self._normalize_index(csv_backend.load(csv_file))
+                        self.backend.save(cache_file, df)
+                        os.remove(csv_file)
+                        return df if not df.empty else None
+                    except FileNotFoundError:
+                        pass
+
+        if not os.path.exists(cache_file):
+            return None
+
+        df = self._normalize_index(self.backend.load(cache_file))
+        return df if not df.empty else None
+
+    def _meta_file(self, ticker: str) -> str:
+        return os.path.join(self.cache_dir, f"{ticker.lower()}.meta.json")
+
+    def _read_meta(self, ticker: str) -> Dict:
+        meta_file = self._meta_file(ticker)
+        if os.path.exists(meta_file):
+            try:
+                with open(meta_file, 'r', encoding='utf-8') as f:
+                    return json.load(f)
+            except (OSError, ValueError):
+                pass
+        # Кэш старого формата без метаданных: время обновления - mtime файла
+        for cache_file in (self._cache_file(ticker), CsvCacheBackend().path(self.cache_dir, ticker)):
+            if os.path.exists(cache_file):
+                mtime = os.path.getmtime(cache_file)
+                return {'refreshed_at': mtime, 'full_at': mtime}
+        return {}
+
+    def _write_cache(self, ticker: str, df: pd.DataFrame, full: bool, meta: Dict):
+        self.backend.save(self._cache_file(ticker), df)
+
+        now = time.time()
+        self._write_meta(ticker, {
+            'last_date': df.index[-1].isoformat(),
+            'refreshed_at': now,
+            'full_at': now if full else meta.get('full_at', now)
+        })
+
+    def _write_meta(self, ticker: str, meta: Dict):
+        def write_meta(path):
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(meta, f)
+
+        atomic_write(self._meta_file(ticker), write_meta)
+
+    def _record_failure(self, ticker: str, meta: Dict):
+        """Запоминает неудачную загрузку: повтор не раньше чем через CACHE_RETRY_MINUTES"""
+        self._write_meta(ticker, {**meta, 'failed_at': time.time()})
+
+    def refresh_interval(self, ticker: str) -> float:
+        """Интервал обновления кэша тикера в секундах"""
+        return self.refresh_overrides.get(ticker.upper(), self.refresh_hours) * 3600
+
+    @metrics.timed('fetch_stock_data')
     def fetch_stock_data(self, ticker: str) -> pd.DataFrame:
-        """Загружает исторические данные по тикеру"""
-        cache_file = os.path.join(self.cache_dir, f"{ticker.lower()}.csv")
-
-        if os.path.exists(cache_file):
-            df = pd.read_csv(cache_file, index_col=0, parse_dates=True)
-            if not df.empty:
-                return df
-
-        # Загружаем с Yahoo Finance
+        """Загружает исторические данные по тикеру.
+
+        Свежий кэш возвращается как есть. Устаревший дополняется только
+        недостающим хвостом начиная с последней записи (бар, сохраненный во время
+        торгов, перезаписывается). Раз в CACHE_EXPIRE_DAYS история скачивается
+        целиком (yfinance пересчитывает цены после сплитов и дивидендов). После
+        неудачной загрузки кэш отдается без обращения к источнику CACHE_RETRY_MINUTES минут.
+        """
+        with progress.stage('data', 'Загрузка котировок'):
+            return self._fetch_stock_data(ticker)
+
+    def _fetch_stock_data(self, ticker: str) -> pd.DataFrame:
         end_date = datetime.now()
         start_date = end_date - timedelta(days=Config.HISTORICAL_YEARS * 365)
 
+        meta = self._read_meta(ticker)
+        cached = self._load_cached(ticker)
+
+        now = time.time()
+        expired = now - meta.get('full_at', 0) > Config.CACHE_EXPIRE_DAYS * 86400
+
+        if cached is not None and now - meta.get('failed_at', 0) <= Config.CACHE_RETRY_MINUTES * 60:
+            return cached
+
+        if cached is not None and not expired:
+            if now - meta.get('refreshed_at', 0) <= self.refresh_interval(ticker):
+                return cached
+
+            # Догружаем хвост с последнего бара: он мог быть сохранен до закрытия торгов
+            progress.report('data', 'progress', detail=f"догрузка с {cached.index[-1]:%d.%m.%Y}")
+            try:
+                delta = self.downloader(ticker, cached.index[-1], end_date)
+            except Exception as e:
+                logger.warning("Не удалось обновить кэш %s, используются сохраненные данные: %s", ticker, e)
+                self._record_failure(ticker, meta)
+                return cached
+
+            if delta is not None and not delta.empty:
+                delta = self._normalize_index(delta)
+                df = pd.concat([cached, delta[cached.columns.intersection(delta.columns)]])
+                df = df[~df.index.duplicated(keep='last')].sort_index()
+                df = df[df.index >= pd.Timestamp(start_date).normalize()]
+            else:
+                df = cached
+
+            self._write_cache(ticker, df, full=False, meta=meta)
+            return df
+
+        # Загружаем с Yahoo Finance
+        progress.report('data', 'progress', detail="полная история с Yahoo Finance")
         try:
-            stock = yf.Ticker(ticker)
-            df = stock.history(start=start_date, end=end_date)
+            df = self.downloader(ticker, start_date, end_date)
 
-            if df.empty:
+            if df is None or df.empty:
                 raise ValueError(f"Нет данных для тикера {ticker}")
 
-            df.to_csv(cache_file)
+            df = self._normalize_index(df)
+            self._write_cache(ticker, df, full=True, meta=meta)
             return df
 
         except Exception as e:
+            if cached is not None:
+                logger.warning("Не удалось перезагрузить %s, используются сохраненные данные: %s", ticker, e)
+                self._record_failure(ticker, meta)
+                return cached
             raise ValueError(f"Ошибка загрузки данных для {ticker}: {str(e)}")
 
-    def preprocess_data(self, df: pd.DataFrame) -> pd.DataFrame:
-        """Предобработка данных и создание признаков"""
-        data = df[['Close']].copy()
-        data.columns = ['price']
-        data = data.dropna()
-
-        # Создание лаговых признаков
-        for lag in Config.LAG_FEATURES:
-            data[f'lag_{lag}'] = data['price'].shift(lag)
-
-        # Скользящие средние
-        for window in Config.WINDOW_SIZES:
-            data[f'sma_{window}'] = data['price'].rolling(window=window).mean()
-            data[f'std_{window}'] = data['price'].rolling(window=window).std()
-
-        # Целевая переменная (цена через 1 день)
-        data['target'] = data['price'].shift(-1)
-        data = data.dropna()
+    @metrics.timed('preprocess_data')
+    def preprocess_data(self, df: pd.DataFrame,
+                        pipeline: Optional[FeaturePipeline] = None) -> pd.DataFrame:
+        """Предобработка данных и создание признаков.
 
-        return data
+        Колонки: price, признаки pipeline (по умолчанию - из настроек) и target -
+        цена через 1 день. Строки с неполной историей отбрасываются.
+        """
+        prices = df['Close'].dropna()
+        return (pipeline or FeaturePipeline.default()).frame(prices)
 
     def split_data(self, data: pd.DataFrame) -> tuple:
         """Разделение данных на train и test"""
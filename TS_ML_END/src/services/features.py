@@ -0,0 +1,329 @@
+import re
+from abc import ABC, abstractmethod
+import numpy as np
+import pandas as pd
+from typing import Dict, Iterable, List, Optional, Sequence
+from config import Config
+
+
+class _Context:
+    """Общие для всех признаков промежуточные массивы, считаются один раз на ряд.
+
+    Цены центрируются по первой цене ряда: кумулятивные суммы квадратов
+    остаются небольшими, и дисперсия через разность сумм не теряет точность.
+    """
+
+    def __init__(self, prices: np.ndarray):
+        self.prices = prices
+        self.n = len(prices)
+        self._cache: Dict[str, np.ndarray] = {}
+
+    def cached(self, key: str, build):
+        if key not in self._cache:
+            self._cache[key] = build()
+        return self._cache[key]
+
+    @property
+    def ref(self) -> float:
+        return float(self.prices[0]) if self.n else 0.0
+
+    def cumsum(self, key: str, values) -> np.ndarray:
+        """Кумулятивная сумма с нулем в начале: сумма окна [i, j) = c[j] - c[i]"""
+        def build():
+            array = values()
+            out = np.empty(len(array) + 1)
+            out[0] = 0.0
+            np.cumsum(array, out=out[1:])
+            return out
+        return self.cached('cumsum:' + key, build)
+
+    def centered(self) -> np.ndarray:
+        return self.cached('centered', lambda: self.prices - self.ref)
+
+    def diff(self) -> np.ndarray:
+        return self.cached('diff', lambda: np.diff(self.prices))
+
+    def log_returns(self) -> np.ndarray:
+        return self.cached('log_returns', lambda: np.diff(np.log(self.prices)))
+
+
+def _rolling_mean_var(c1: np.ndarray, c2: np.ndarray, window: int):
+    """Скользящие среднее и несмещенная дисперсия по кумулятивным суммам значений и квадратов"""
+    s1 = c1[window:] - c1[:-window]
+    s2 = c2[window:] - c2[:-window]
+    mean = s1 / window
+    if window < 2:
+        return mean, np.full_like(mean, np.nan)
+    var = (s2 - s1 * mean) / (window - 1)
+    return mean, np.maximum(var, 0.0)
+
+
+class Feature(ABC):
+    """Признак ряда цен.
+
+    compute заполняет колонку для всего ряда (первые history - 1 значений - NaN),
+    last считает значение по последним history ценам - для дописывания одного бара
+    и рекурсивного прогноза. tail может быть двумерным: (n_series, history).
+    """
+    prefix = ''
+
+    def __init__(self, period: int):
+        if period < 1:
+            raise ValueError(f"Период признака {self.prefix} должен быть положительным: {period}")
+        self.period = period
+
+    @property
+    def name(self) -> str:
+        return f"{self.prefix}_{self.period}"
+
+    @property
+    def history(self) -> int:
+        """Сколько последних цен (включая текущую) нужно для одного значения"""
+        return self.period
+
+    @abstractmethod
+    def compute(self, ctx: _Context, out: np.ndarray):
+        """Заполнение колонки out для всего ряда"""
+        pass
+
+    @abstractmethod
+    def last(self, tail: np.ndarray) -> np.ndarray:
+        """Значение по последним history ценам"""
+        pass
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}({self.period})"
+
+
+class Lag(Feature):
+    """Цена period баров назад"""
+    prefix = 'lag'
+
+    @property
+    def history(self) -> int:
+        return self.period + 1
+
+    def compute(self, ctx, out):
+        out[self.period:] = ctx.prices[:-self.period]
+
+    def last(self, tail):
+        return tail[..., -1 - self.period]
+
+
+class SMA(Feature):
+    """Скользящее среднее"""
+    prefix = 'sma'
+
+    def compute(self, ctx, out):
+        c1 = ctx.cumsum('centered', ctx.centered)
+        s1 = c1[self.period:] - c1[:-self.period]
+        out[self.period - 1:] = s1 / self.period + ctx.ref
+
+    def last(self, tail):
+        return tail[..., -self.period:].mean(axis=-1)
+
+
+class Std(Feature):
+    """Скользящее стандартное отклонение (ddof=1, как rolling().std())"""
+    prefix = 'std'
+
+    def compute(self, ctx, out):
+        c1 = ctx.cumsum('centered', ctx.centered)
+        c2 = ctx.cumsum('centered_sq', lambda: ctx.centered() ** 2)
+        _, var = _rolling_mean_var(c1, c2, self.period)
+        out[self.period - 1:] = np.sqrt(var)
+
+    def last(self, tail):
+        return tail[..., -self.period:].std(axis=-1, ddof=1)
+
+
+class Return(Feature):
+    """Доходность за period баров: p_t / p_{t-period} - 1"""
+    prefix = 'ret'
+
+    @property
+    def history(self) -> int:
+        return self.period + 1
+
+    def compute(self, ctx, out):
+        out[self.period:] = ctx.prices[self.period:] / ctx.prices[:-self.period] - 1
+
+    def last(self, tail):
+        return tail[..., -1] / tail[..., -1 - self.period] - 1
+
+
+class Volatility(Feature):
+    """Стандартное отклонение логарифмических доходностей за period баров"""
+    prefix = 'vol'
+
+    @property
+    def history(self) -> int:
+        return self.period + 1
+
+    def compute(self, ctx, out):
+        c1 = ctx.cumsum('log_returns', ctx.log_returns)
+        c2 = ctx.cumsum('log_returns_sq', lambda: ctx.log_returns() ** 2)
+        _, var = _rolling_mean_var(c1, c2, self.period)
+        out[self.period:] = np.sqrt(var)
+
+    def last(self, tail):
+        returns = np.diff(np.log(tail[..., -self.period - 1:]), axis=-1)
+        return returns.std(axis=-1, ddof=1)
+
+
+class RSI(Feature):
+    """Индекс относительной силы по простым средним роста и падения за period баров"""
+    prefix = 'rsi'
+
+    @property
+    def history(self) -> int:
+        return self.period + 1
+
+    @staticmethod
+    def _rsi(gain: np.ndarray, loss: np.ndarray) -> np.ndarray:
+        # Без падений RSI = 100, без движения вовсе - 50
+        with np.errstate(divide='ignore', invalid='ignore'):
+            rsi = 100 - 100 / (1 + gain / loss)
+        rsi = np.where(loss == 0, 100.0, rsi)
+        return np.where((gain == 0) & (loss == 0), 50.0, rsi)
+
+    def compute(self, ctx, out):
+        gains = ctx.cumsum('gains', lambda: np.maximum(ctx.diff(), 0))
+        losses = ctx.cumsum('losses', lambda: np.maximum(-ctx.diff(), 0))
+        w = self.period
+        out[w:] = self._rsi(gains[w:] - gains[:-w], losses[w:] - losses[:-w])
+
+    def last(self, tail):
+        delta = np.diff(tail[..., -self.period - 1:], axis=-1)
+        return self._rsi(np.maximum(delta, 0).sum(axis=-1), np.maximum(-delta, 0).sum(axis=-1))
+
+
+FEATURE_TYPES = {cls.prefix: cls for cls in (Lag, SMA, Std, Return, Volatility, RSI)}
+FEATURE_PATTERN = re.compile(r'^(%s)_(\d+)$' % '|'.join(FEATURE_TYPES))
+
+
+def parse_feature(name: str) -> Optional[Feature]:
+    """Признак по имени колонки (lag_7, rsi_14, ...), None - для прочих колонок"""
+    match = FEATURE_PATTERN.match(name)
+    if not match:
+        return None
+    return FEATURE_TYPES[match.group(1)](int(match.group(2)))
+
+
+class FeaturePipeline:
+    """Декларативный набор признаков ряда цен.
+
+    Вся матрица признаков считается за один проход в заранее выделенный
+    float64-массив: скользящие средние и дисперсии - через кумулятивные суммы,
+    общие для всех окон. stream() считает признаки нового бара по последним
+    history ценам, не пересчитывая историю.
+    """
+
+    def __init__(self, features: Iterable[Feature]):
+        self.features: List[Feature] = list(features)
+        names = self.names
+        if len(set(names)) != len(names):
+            raise ValueError(f"Признаки повторяются: {names}")
+
+    @classmethod
+    def default(cls) -> 'FeaturePipeline':
+        """Признаки из настроек: лаги, затем пары sma/std по окнам, затем дополнительные"""
+        features: List[Feature] = [Lag(lag) for lag in Config.LAG_FEATURES]
+        for window in Config.WINDOW_SIZES:
+            features += [SMA(window), Std(window)]
+        features += [Return(period) for period in Config.RETURN_PERIODS]
+        features += [RSI(window) for window in Config.RSI_WINDOWS]
+        features += [Volatility(window) for window in Config.VOLATILITY_WINDOWS]
+        return cls(features)
+
+    @classmethod
+    def from_names(cls, names: Sequence[str]) -> 'FeaturePipeline':
+        """Набор по именам колонок; колонки без известного префикса пропускаются"""
+        return cls(feature for feature in map(parse_feature, names) if feature is not None)
+
+    @property
+    def names(self) -> List[str]:
+        return [feature.name for feature in self.features]
+
+    @property
+    def history(self) -> int:
+        """Сколько последних цен нужно, чтобы посчитать все признаки одного бара"""
+        return max([feature.history for feature in self.features] + [1])
+
+    def transform(self, prices, out: Optional[np.ndarray] = None) -> np.ndarray:
+        """Матрица признаков (n, len(features)); строки без полной истории - NaN.
+
+        out - готовый массив (например, срез более широкой матрицы), куда пишутся колонки.
+        """
+        prices = np.asarray(prices, dtype=np.float64)
+        if out is None:
+            out = np.empty((len(prices), len(self.features)))
+        out.fill(np.nan)
+
+        ctx = _Context(prices)
+        for j, feature in enumerate(self.features):
+            if feature.history <= len(prices):
+                feature.compute(ctx, out[:, j])
+        return out
+
+    def frame(self, prices: pd.Series) -> pd.DataFrame:
+        """Таблица в формате preprocess_data: price, признаки, target (цена следующего бара),
+        только строки без пропусков"""
+        values = prices.to_numpy(dtype=np.float64)
+        n = len(values)
+        columns = ['price'] + self.names + ['target']
+
+        matrix = np.empty((n, len(columns)))
+        matrix[:, 0] = values
+        self.transform(values, out=matrix[:, 1:-1])
+        matrix[:-1, -1] = values[1:]
+        matrix[-1:, -1] = np.nan
+
+        complete = ~np.isnan(matrix).any(axis=1)
+        return pd.DataFrame(matrix[complete], index=prices.index[complete], columns=columns)
+
+    def last(self, tail: np.ndarray) -> np.ndarray:
+        """Признаки последнего бара по хвосту цен формы (..., >= history)"""
+        tail = np.asarray(tail, dtype=np.float64)
+        return np.stack([feature.last(tail) for feature in self.features], axis=-1)
+
+    def stream(self, prices: Optional[Sequence[float]] = None) -> 'FeatureStream':
+        return FeatureStream(self, prices)
+
+
+class FeatureStream:
+    """Инкрементальный расчет: append(price) возвращает признаки нового бара.
+
+    Хранит только последние history цен, поэтому стоимость бара не зависит
+    от длины истории.
+    """
+
+    def __init__(self, pipeline: FeaturePipeline, prices: Optional[Sequence[float]] = None):
+        self.pipeline = pipeline
+        self.size = pipeline.history
+        self._buffer = np.empty(2 * self.size)
+        self._count = 0
+        self._end = 0
+        for price in np.asarray(prices if prices is not None else [], dtype=np.float64)[-self.size:]:
+            self._push(price)
+
+    def _push(self, price: float):
+        # Буфер двойной длины: сдвиг хвоста в начало раз в size баров
+        if self._end == len(self._buffer):
+            self._buffer[:self.size - 1] = self._buffer[self._end - self.size + 1:self._end]
+            self._end = self.size - 1
+        self._buffer[self._end] = price
+        self._end += 1
+        self._count += 1
+
+    @property
+    def ready(self) -> bool:
+        """Накоплено достаточно цен для всех признаков"""
+        return self._count >= self.size
+
+    def append(self, price: float) -> np.ndarray:
+        """Добавляет бар и возвращает его признаки (NaN, пока истории не хватает)"""
+        self._push(float(price))
+        if not self.ready:
+            return np.full(len(self.pipeline.features), np.nan)
+        return self.pipeline.last(self._buffer[self._end - self.size:self._end])
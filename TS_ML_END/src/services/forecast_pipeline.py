@@ -0,0 +1,53 @@
+import numpy as np
+import pandas as pd
+from typing import Dict
+
+from services.data_service import DataService
+from services.model_selector import ModelSelector
+from services.model_registry import ModelRegistry
+from services import progress
+from config import Config
+
+
+def run_forecast_pipeline(df: pd.DataFrame, ticker: str, steps: int) -> Dict:
+    """Предобработка, обучение моделей и прогноз.
+
+    Выполняется в пуле процессов, поэтому принимает и возвращает
+    только сериализуемые значения. Если для тех же данных и настроек
+    в кэше уже есть обученная модель, обучение пропускается.
+    """
+    data_service = DataService()
+    with progress.stage('preprocess', 'Подготовка признаков'):
+        processed_data = data_service.preprocess_data(df)
+
+    model_selector = ModelSelector(ticker=ticker)
+    registry = ModelRegistry()
+    cache_key = registry.make_key(ticker, processed_data, model_selector.models)
+    cached = registry.load(cache_key)
+
+    if cached is not None:
+        model_selector.set_best_model(cached['model'], cached['metrics'])
+        progress.report('models', 'done', 'Обучение моделей', 'модель из кэша', 0.0)
+    else:
+        if Config.MODEL_SELECTION == 'walk_forward':
+            results = model_selector.backtest(
+                processed_data.drop(['price', 'target'], axis=1), processed_data['target'])
+        else:
+            X_train, y_train, X_test, y_test, train_prices, test_prices = \
+                data_service.split_data(processed_data)
+            results = model_selector.train_and_evaluate(X_train, y_train, X_test, y_test)
+
+        best_model, best_metrics = model_selector.select_best_model(results)
+        registry.save(cache_key, best_model, best_metrics)
+
+    last_data = processed_data.iloc[-model_selector.best_model.forecast_context():]
+    with progress.stage('forecast', f"Прогноз на {steps} дн."):
+        forecast = model_selector.make_forecast(last_data, steps)
+
+    return {
+        'best_model': model_selector.best_model.get_name(),
+        'metrics': model_selector.best_metrics,
+        'forecast': np.asarray(forecast, dtype=float),
+        'prices': processed_data['price'].values,
+        'from_cache': cached is not None
+    }
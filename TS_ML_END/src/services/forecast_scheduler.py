@@ -0,0 +1,192 @@
+import asyncio
+import math
+import time
+from collections import OrderedDict, deque
+from typing import Awaitable, Callable, Deque, Dict, Hashable, Optional
+from config import Config
+
+
+class RateLimitError(RuntimeError):
+    """Пользователь превысил лимит запросов или число одновременных прогнозов"""
+    pass
+
+
+class TokenBucket:
+    """Корзина токенов: capacity запросов подряд, затем rate запросов в секунду"""
+
+    def __init__(self, capacity: float, rate: float):
+        self.capacity = capacity
+        self.rate = rate
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def take(self) -> bool:
+        self._refill()
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+    def retry_after(self) -> float:
+        """Через сколько секунд появится следующий токен"""
+        self._refill()
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate if self.rate > 0 else math.inf
+
+
+class _Waiter:
+    __slots__ = ('user_id', 'event', 'granted')
+
+    def __init__(self, user_id: Hashable):
+        self.user_id = user_id
+        self.event = asyncio.Event()
+        self.granted = False
+
+
+class FairScheduler:
+    """Очередь прогнозов перед пулом воркеров.
+
+    Каждый пользователь ограничен корзиной токенов и числом одновременных
+    заданий (в очереди и в работе). Свободный слот получает пользователь,
+    которого обслуживали давнее всех (обход по кругу), поэтому частые запросы
+    одного пользователя не задерживают остальных.
+    """
+
+    def __init__(self, slots: Optional[int] = None, rate_per_minute: Optional[float] = None,
+                 burst: Optional[int] = None, max_per_user: Optional[int] = None):
+        self.slots = slots or Config.FORECAST_WORKERS
+        self.rate = (rate_per_minute if rate_per_minute is not None
+                     else Config.RATE_LIMIT_PER_MINUTE) / 60
+        self.burst = burst or Config.RATE_LIMIT_BURST
+        self.max_per_user = max_per_user or Config.MAX_JOBS_PER_USER
+
+        self._buckets: Dict[Hashable, TokenBucket] = {}
+        self._in_flight: Dict[Hashable, int] = {}
+        # Очереди пользователей в порядке поступления и номер последнего обслуживания
+        self._queues: 'OrderedDict[Hashable, Deque[_Waiter]]' = OrderedDict()
+        self._served: Dict[Hashable, int] = {}
+        self._counter = 0
+        self._running = 0
+
+    @property
+    def running(self) -> int:
+        return self._running
+
+    @property
+    def queued(self) -> int:
+        return sum(len(queue) for queue in self._queues.values())
+
+    def _admit(self, user_id: Hashable):
+        """Проверяет лимиты пользователя до постановки в очередь"""
+        if self._in_flight.get(user_id, 0) >= self.max_per_user:
+            position = self._user_position(user_id)
+            where = f"место в очереди: {position}" if position else "уже выполняется"
+            raise RateLimitError(
+                f"Дождитесь завершения предыдущего прогноза ({where}).")
+
+        bucket = self._buckets.get(user_id)
+        if bucket is None:
+            bucket = self._buckets[user_id] = TokenBucket(self.burst, self.rate)
+        if not bucket.take():
+            wait = bucket.retry_after()
+            when = f"через {math.ceil(wait)} с" if math.isfinite(wait) else "позже"
+            raise RateLimitError(f"Слишком много запросов. Повторите {when}.")
+
+    def submit(self, user_id: Hashable) -> _Waiter:
+        """Ставит задание пользователя в очередь и сразу раздает свободные слоты"""
+        self._admit(user_id)
+        waiter = _Waiter(user_id)
+        self._in_flight[user_id] = self._in_flight.get(user_id, 0) + 1
+        self._queues.setdefault(user_id, deque()).append(waiter)
+        self._dispatch()
+        return waiter
+
+    @staticmethod
+    def _next_user(queues, served) -> Hashable:
+        # min стабилен: при равенстве выигрывает пользователь, вставший в очередь раньше
+        return min(queues, key=lambda user_id: served.get(user_id, -1))
+
+    def _dispatch(self):
+        while self._running < self.slots and self._queues:
+            user_id = self._next_user(self._queues, self._served)
+            queue = self._queues[user_id]
+            waiter = queue.popleft()
+            if not queue:
+                del self._queues[user_id]
+
+            self._served[user_id] = self._counter
+            self._counter += 1
+            waiter.granted = True
+            waiter.event.set()
+            self._running += 1
+
+        # Будим оставшихся, чтобы они обновили свое место в очереди
+        for queue in self._queues.values():
+            for waiter in queue:
+                waiter.event.set()
+
+    def position(self, waiter: _Waiter) -> int:
+        """Место в очереди (0 - уже получил слот): порядок выдачи слотов моделируется на копии"""
+        if waiter.granted:
+            return 0
+
+        queues = OrderedDict((user_id, deque(queue)) for user_id, queue in self._queues.items())
+        served = dict(self._served)
+        position = 0
+        while queues:
+            user_id = self._next_user(queues, served)
+            position += 1
+            if queues[user_id].popleft() is waiter:
+                return position
+            if not queues[user_id]:
+                del queues[user_id]
+            served[user_id] = self._counter + position
+        return 0
+
+    def _user_position(self, user_id: Hashable) -> int:
+        queue = self._queues.get(user_id)
+        return self.position(queue[0]) if queue else 0
+
+    def _finish(self, waiter: _Waiter):
+        if waiter.granted:
+            self._running -= 1
+        else:
+            queue = self._queues.get(waiter.user_id)
+            if queue is not None and waiter in queue:
+                queue.remove(waiter)
+                if not queue:
+                    del self._queues[waiter.user_id]
+
+        self._in_flight[waiter.user_id] -= 1
+        if not self._in_flight[waiter.user_id]:
+            del self._in_flight[waiter.user_id]
+        self._dispatch()
+
+    async def run(self, user_id: Hashable, func: Callable[[], Awaitable],
+                  on_queued: Optional[Callable[[int], Awaitable]] = None):
+        """Выполняет func, когда до пользователя дойдет очередь.
+
+        on_queued(position) вызывается, пока задание ждет, при каждом изменении места.
+        Превышение лимитов - RateLimitError.
+        """
+        waiter = self.submit(user_id)
+        try:
+            last_position = None
+            while not waiter.granted:
+                waiter.event.clear()
+                position = self.position(waiter)
+                if on_queued is not None and position != last_position:
+                    last_position = position
+                    await on_queued(position)
+                if not waiter.granted:
+                    await waiter.event.wait()
+
+            return await func()
+        finally:
+            self._finish(waiter)
@@ -0,0 +1,130 @@
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from typing import Callable, Optional
+from config import Config
+from services import metrics, progress
+from services.progress import ProgressHub
+
+
+def _call_in_process(metrics_enabled: bool, sink, func: Callable, *args, **kwargs):
+    """Точка входа процесса пула: вместе с результатом возвращает метрики, собранные
+    за время задачи, чтобы основной процесс добавил их в свой реестр"""
+    metrics.registry.enabled = metrics_enabled
+    if not metrics_enabled:
+        return progress.call_with_sink(sink, func, *args, **kwargs), None
+
+    metrics.registry.reset()
+    try:
+        result = progress.call_with_sink(sink, func, *args, **kwargs)
+    except BaseException as e:
+        # Метрики неудачной задачи тоже нужны: передаем их вместе с исключением
+        e.metrics_snapshot = metrics.registry.snapshot()
+        raise
+    return result, metrics.registry.snapshot()
+
+
+class ExecutorBusyError(RuntimeError):
+    """Очередь задач прогнозирования переполнена"""
+    pass
+
+
+class ForecastExecutor:
+    """Выполняет тяжелые этапы прогноза вне event loop бота.
+
+    CPU-задачи (обучение моделей, построение графиков) уходят в пул процессов,
+    I/O-задачи (загрузка данных, запись логов) - в пул потоков.
+    Количество одновременно принятых задач ограничено размером очереди.
+    """
+
+    def __init__(self, cpu_workers: Optional[int] = None, io_workers: Optional[int] = None,
+                 max_queue: Optional[int] = None):
+        self.cpu_workers = cpu_workers or Config.FORECAST_WORKERS
+        self.io_workers = io_workers or Config.IO_WORKERS
+        self.max_queue = max_queue or Config.FORECAST_QUEUE_SIZE
+        self._process_pool: Optional[ProcessPoolExecutor] = None
+        self._thread_pool: Optional[ThreadPoolExecutor] = None
+        self._manager = None
+        self._progress_hub: Optional[ProgressHub] = None
+        self._pending = 0
+
+    @property
+    def pending(self) -> int:
+        """Количество принятых, но еще не завершенных задач"""
+        return self._pending
+
+    def _get_process_pool(self) -> ProcessPoolExecutor:
+        if self._process_pool is None:
+            # spawn: форк процесса с запущенными потоками бота и torch небезопасен
+            self._process_pool = ProcessPoolExecutor(
+                max_workers=self.cpu_workers,
+                mp_context=multiprocessing.get_context('spawn')
+            )
+        return self._process_pool
+
+    def _get_thread_pool(self) -> ThreadPoolExecutor:
+        if self._thread_pool is None:
+            self._thread_pool = ThreadPoolExecutor(
+                max_workers=self.io_workers,
+                thread_name_prefix='forecast-io'
+            )
+        return self._thread_pool
+
+    def progress_hub(self) -> ProgressHub:
+        """Общая очередь событий прогресса всех заданий, доступная из процессов пула"""
+        if self._progress_hub is None:
+            self._manager = multiprocessing.get_context('spawn').Manager()
+            self._progress_hub = ProgressHub(self._manager.Queue())
+        return self._progress_hub
+
+    async def _submit(self, pool, func: Callable, *args, **kwargs):
+        if self._pending >= self.max_queue:
+            raise ExecutorBusyError(
+                "Сервер перегружен запросами. Попробуйте повторить через минуту.")
+
+        self._pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            # Получатель прогресса текущего задания передается в процесс или поток пула
+            if pool is self._process_pool:
+                task = partial(_call_in_process, metrics.registry.enabled,
+                               progress.current_sink(), func, *args, **kwargs)
+                try:
+                    result, snapshot = await loop.run_in_executor(pool, task)
+                except Exception as e:
+                    if getattr(e, 'metrics_snapshot', None):
+                        metrics.registry.merge(e.metrics_snapshot)
+                    raise
+                if snapshot:
+                    metrics.registry.merge(snapshot)
+                return result
+
+            task = partial(progress.call_with_sink, progress.current_sink(), func, *args, **kwargs)
+            return await loop.run_in_executor(pool, task)
+        finally:
+            self._pending -= 1
+
+    async def run_cpu(self, func: Callable, *args, **kwargs):
+        """Выполняет CPU-задачу в пуле процессов. Функция, аргументы и получатель прогресса
+        должны сериализоваться pickle."""
+        return await self._submit(self._get_process_pool(), func, *args, **kwargs)
+
+    async def run_io(self, func: Callable, *args, **kwargs):
+        """Выполняет блокирующую I/O-задачу в пуле потоков"""
+        return await self._submit(self._get_thread_pool(), func, *args, **kwargs)
+
+    def shutdown(self, wait: bool = True):
+        """Останавливает пулы, дожидаясь текущих задач"""
+        if self._process_pool is not None:
+            self._process_pool.shutdown(wait=wait, cancel_futures=True)
+            self._process_pool = None
+        if self._thread_pool is not None:
+            self._thread_pool.shutdown(wait=wait, cancel_futures=True)
+            self._thread_pool = None
+        if self._progress_hub is not None:
+            self._progress_hub.close()
+            self._progress_hub = None
+        if self._manager is not None:
+            self._manager.shutdown()
+            self._manager = None
@@ -1,36 +1,65 @@
 import csv
 import os
+import queue
+import threading
+import time
 from datetime import datetime
-from typing import Dict
+from typing import Dict, List, Optional
 from config import Config
+from services.log_store import LogStore
+
+FIELDS = [
+    'timestamp',
+    'user_id',
+    'ticker',
+    'investment_amount',
+    'best_model',
+    'rmse',
+    'mape',
+    'profit',
+    'profit_percentage',
+    'processing_time'
+]
+
+# Служебное сообщение для writer-потока: записать накопленное и остановиться
+_STOP = object()
+
 
 class LogService:
-    def __init__(self, log_file=None):
+    """Журнал запросов в CSV с буферизованной записью.
+
+    log_request только кладет строку в очередь. Единственный writer-поток
+    забирает строки и дописывает их пачкой (по batch_size строк или раз в
+    flush_interval секунд) с fsync, поэтому строки из разных потоков
+    не перемешиваются, а event loop не ждет диск. После каждой пачки новые
+    строки переносятся в индексированную базу LogStore рядом с CSV (logs.db).
+    """
+
+    def __init__(self, log_file=None, batch_size: Optional[int] = None,
+                 flush_interval: Optional[float] = None):
         self.log_file = log_file or Config.LOG_FILE
+        self.batch_size = batch_size or Config.LOG_BATCH_SIZE
+        self.flush_interval = flush_interval if flush_interval is not None else Config.LOG_FLUSH_INTERVAL
+        self._queue: queue.Queue = queue.Queue()
+        self._writer: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
         self._ensure_header()
-    
+
+        # Уже накопленный CSV импортируется writer-потоком, а не в event loop
+        self.store = LogStore(os.path.splitext(self.log_file)[0] + '.db')
+        self._ensure_writer()
+
     def _ensure_header(self):
         """Создание файла с заголовками, если не существует"""
         if not os.path.exists(self.log_file):
             with open(self.log_file, 'w', newline='', encoding='utf-8') as f:
                 writer = csv.writer(f)
-                writer.writerow([
-                    'timestamp',
-                    'user_id',
-                    'ticker',
-                    'investment_amount',
-                    'best_model',
-                    'rmse',
-                    'mape',
-                    'profit',
-                    'profit_percentage',
-                    'processing_time'
-                ])
-    
+                writer.writerow(FIELDS)
+
     def log_request(self, user_id: int, ticker: str, investment_amount: float,
-                   best_model: str, metrics: Dict, profit: float, 
+                   best_model: str, metrics: Dict, profit: float,
                    profit_percentage: float, processing_time: float):
-        """Логирование запроса пользователя"""
+        """Логирование запроса пользователя (запись на диск - в фоне)"""
         log_entry = {
             'timestamp': datetime.now().isoformat(),
             'user_id': user_id,
@@ -43,7 +72,78 @@ class LogService:
             'profit_percentage': profit_percentage,
             'processing_time': processing_time
         }
-        
-        with open(self.log_file, 'a', newline='', encoding='utf-8') as f:
-            writer = csv.DictWriter(f, fieldnames=log_entry.keys())
-            writer.writerow(log_entry)
\ No newline at end of file
+
+        self._ensure_writer()
+        self._queue.put(log_entry)
+
+    def _ensure_writer(self):
+        with self._lock:
+            if self._writer is None or not self._writer.is_alive():
+                self._writer = threading.Thread(target=self._run, name='log-writer', daemon=True)
+                self._writer.start()
+
+    def _run(self):
+        self._sync_store()
+        batch: List[Dict] = []
+        deadline = time.monotonic() + self.flush_interval
+
+        while True:
+            try:
+                item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                item = None
+
+            if isinstance(item, dict):
+                batch.append(item)
+                if len(batch) < self.batch_size and time.monotonic() < deadline:
+                    continue
+
+            # Порог по размеру или времени, запрос flush или остановка
+            self._write(batch)
+            batch = []
+            deadline = time.monotonic() + self.flush_interval
+
+            if isinstance(item, threading.Event):
+                item.set()
+            elif item is _STOP:
+                self.store.close()
+                return
+
+    def _write(self, batch: List[Dict]):
+        if not batch:
+            return
+        try:
+            with open(self.log_file, 'a', newline='', encoding='utf-8') as f:
+                writer = csv.DictWriter(f, fieldnames=FIELDS)
+                writer.writerows(batch)
+                f.flush()
+                os.fsync(f.fileno())
+        except OSError as e:
+            print(f"Не удалось записать {len(batch)} строк в {self.log_file}: {e}")
+            return
+        self._sync_store()
+
+    def _sync_store(self):
+        try:
+            self.store.sync_csv(self.log_file)
+        except Exception as e:
+            # CSV остается основным журналом: база догонит его при следующей синхронизации
+            print(f"Не удалось обновить базу журнала: {e}")
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Дожидается записи всех строк, поставленных в очередь до вызова"""
+        with self._lock:
+            if self._writer is None or not self._writer.is_alive():
+                return True
+            done = threading.Event()
+            self._queue.put(done)
+        return done.wait(timeout)
+
+    def close(self, timeout: Optional[float] = None):
+        """Записывает оставшиеся строки и останавливает writer-поток"""
+        with self._lock:
+            writer, self._writer = self._writer, None
+            if writer is None or not writer.is_alive():
+                return
+            self._queue.put(_STOP)
+        writer.join(timeout)
@@ -0,0 +1,184 @@
+import csv
+import hashlib
+import os
+import sqlite3
+import threading
+from typing import Dict, List, Optional
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS requests (
+    id INTEGER PRIMARY KEY,
+    timestamp TEXT NOT NULL,
+    user_id INTEGER NOT NULL,
+    ticker TEXT NOT NULL,
+    investment_amount REAL,
+    best_model TEXT,
+    rmse REAL,
+    mape REAL,
+    profit REAL,
+    profit_percentage REAL,
+    processing_time REAL,
+    source TEXT  -- CSV-журнал, из которого импортирована строка
+);
+CREATE INDEX IF NOT EXISTS idx_requests_user ON requests (user_id, timestamp);
+CREATE INDEX IF NOT EXISTS idx_requests_ticker ON requests (ticker, timestamp);
+CREATE INDEX IF NOT EXISTS idx_requests_timestamp ON requests (timestamp);
+-- Сколько байт CSV-журнала уже перенесено в базу и какого именно файла
+CREATE TABLE IF NOT EXISTS csv_imports (
+    path TEXT PRIMARY KEY,
+    offset INTEGER NOT NULL,
+    identity TEXT
+);
+"""
+
+COLUMNS = ['timestamp', 'user_id', 'ticker', 'investment_amount', 'best_model',
+           'rmse', 'mape', 'profit', 'profit_percentage', 'processing_time']
+
+
+class LogStore:
+    """Журнал запросов в SQLite (WAL) с индексами по user_id, тикеру и времени.
+
+    Источник строк - CSV-журнал LogService: sync_csv переносит в базу только
+    байты, дописанные после прошлой синхронизации, поэтому первый вызов
+    импортирует существующий logs.csv, а следующие - только новые пачки.
+    Если журнал пересоздан (другой inode или первая строка данных), строки
+    прежнего файла удаляются и он импортируется заново.
+    """
+
+    def __init__(self, db_file: str):
+        self.db_file = db_file
+        self._local = threading.local()
+        with self._connection() as conn:
+            conn.executescript(SCHEMA)
+            self._migrate(conn)
+
+    @staticmethod
+    def _migrate(conn: sqlite3.Connection):
+        """Колонки, добавленные после создания базы"""
+        if 'source' not in {row['name'] for row in conn.execute("PRAGMA table_info(requests)")}:
+            conn.execute("ALTER TABLE requests ADD COLUMN source TEXT")
+            # Прежние базы импортировали один журнал: его строки относим к нему
+            paths = conn.execute("SELECT path FROM csv_imports").fetchall()
+            if len(paths) == 1:
+                conn.execute("UPDATE requests SET source = ?", (paths[0]['path'],))
+        if 'identity' not in {row['name'] for row in conn.execute("PRAGMA table_info(csv_imports)")}:
+            conn.execute("ALTER TABLE csv_imports ADD COLUMN identity TEXT")
+
+    @staticmethod
+    def _identity(f, header: bytes) -> str:
+        """inode и хэш заголовка с первой строкой данных: у дописываемого журнала не меняются"""
+        first_row = f.readline()
+        if not first_row.endswith(b'\n'):
+            first_row = b''
+        digest = hashlib.sha1(header + first_row).hexdigest()
+        return f"{os.fstat(f.fileno()).st_ino}:{digest}"
+
+    def _connection(self) -> sqlite3.Connection:
+        """Соединение текущего потока (sqlite3 не разрешает делить его между потоками)"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_file, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.row_factory = sqlite3.Row
+            self._local.conn = conn
+        return conn
+
+    def sync_csv(self, csv_file: str) -> int:
+        """Переносит в базу новые строки CSV-журнала. Возвращает число добавленных строк."""
+        if not os.path.exists(csv_file):
+            return 0
+
+        path = os.path.abspath(csv_file)
+        conn = self._connection()
+        # IMMEDIATE: смещение читают и сдвигают под одной блокировкой записи
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT offset, identity FROM csv_imports WHERE path = ?",
+                               (path,)).fetchone()
+            offset = row['offset'] if row else 0
+
+            with open(csv_file, 'rb') as f:
+                header = f.readline()
+                identity = self._identity(f, header)
+                offset = max(offset, len(header))
+                recreated = os.fstat(f.fileno()).st_size < offset or \
+                    (row is not None and row['identity'] is not None and row['identity'] != identity)
+                if recreated:
+                    # Файл пересоздан: строки прежнего файла удаляются, импортируем заново
+                    conn.execute("DELETE FROM requests WHERE source = ?", (path,))
+                    offset = len(header)
+                f.seek(offset)
+                chunk = f.read()
+
+            # Незаконченную последнюю строку оставляем до следующей синхронизации
+            chunk = chunk[:chunk.rfind(b'\n') + 1]
+            fieldnames = next(csv.reader([header.decode('utf-8')]))
+            reader = csv.DictReader(chunk.decode('utf-8').splitlines(), fieldnames=fieldnames)
+            rows = [tuple(record.get(column) or None for column in COLUMNS) + (path,) for record in reader]
+
+            if rows:
+                conn.executemany(
+                    f"INSERT INTO requests ({', '.join(COLUMNS)}, source) "
+                    f"VALUES ({', '.join('?' for _ in COLUMNS)}, ?)",
+                    rows
+                )
+            conn.execute(
+                "INSERT INTO csv_imports (path, offset, identity) VALUES (?, ?, ?) "
+                "ON CONFLICT(path) DO UPDATE SET offset = excluded.offset, identity = excluded.identity",
+                (path, offset + len(chunk), identity)
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+        return len(rows)
+
+    def user_stats(self, user_id: int, top: int = 3) -> Optional[Dict]:
+        """Сводка по пользователю через индекс по user_id, None - если запросов не было"""
+        conn = self._connection()
+        summary = conn.execute(
+            """
+            SELECT COUNT(*) AS requests,
+                   AVG(processing_time) AS avg_processing_time,
+                   AVG(profit_percentage) AS avg_profit_percentage,
+                   SUM(investment_amount) AS total_investment,
+                   MIN(timestamp) AS first_request,
+                   MAX(timestamp) AS last_request
+            FROM requests WHERE user_id = ?
+            """,
+            (user_id,)
+        ).fetchone()
+        if not summary['requests']:
+            return None
+
+        tickers = conn.execute(
+            "SELECT ticker, COUNT(*) AS n FROM requests WHERE user_id = ? "
+            "GROUP BY ticker ORDER BY n DESC, ticker LIMIT ?",
+            (user_id, top)
+        ).fetchall()
+        models = conn.execute(
+            "SELECT best_model, COUNT(*) AS n FROM requests WHERE user_id = ? "
+            "GROUP BY best_model ORDER BY n DESC, best_model",
+            (user_id,)
+        ).fetchall()
+
+        stats = dict(summary)
+        stats['favourite_tickers'] = [(row['ticker'], row['n']) for row in tickers]
+        stats['models'] = {row['best_model']: row['n'] for row in models}
+        return stats
+
+    def recent(self, user_id: int, limit: int = 5) -> List[Dict]:
+        """Последние запросы пользователя"""
+        rows = self._connection().execute(
+            "SELECT * FROM requests WHERE user_id = ? ORDER BY timestamp DESC LIMIT ?",
+            (user_id, limit)
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+    def close(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
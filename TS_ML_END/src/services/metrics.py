@@ -0,0 +1,259 @@
+import functools
+import inspect
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Tuple
+from config import Config
+
+try:
+    import resource
+except ImportError:  # Windows: пиковый RSS не собирается
+    resource = None
+
+try:
+    _PAGE_SIZE = os.sysconf('SC_PAGE_SIZE')
+except (AttributeError, ValueError, OSError):
+    _PAGE_SIZE = 4096
+
+# Границы бакетов гистограмм времени, секунды
+BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def _labels(labels: Dict) -> Labels:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def peak_rss_bytes() -> int:
+    """Пиковый RSS процесса за все время жизни (ru_maxrss в Linux - в килобайтах)"""
+    if resource is None:
+        return 0
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def current_rss_bytes() -> Optional[int]:
+    """Текущий RSS процесса из /proc/self/statm, None - если /proc недоступен"""
+    try:
+        with open('/proc/self/statm', 'rb') as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+
+class Histogram:
+    __slots__ = ('counts', 'sum', 'count')
+
+    def __init__(self):
+        self.counts = [0] * len(BUCKETS)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.sum += value
+        self.count += 1
+        for i, bound in enumerate(BUCKETS):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+
+    def merge(self, counts: List[int], total: float, count: int):
+        self.counts = [a + b for a, b in zip(self.counts, counts)]
+        self.sum += total
+        self.count += count
+
+
+class MetricsRegistry:
+    """Счетчики, гистограммы и gauge-максимумы по этапам обработки запроса.
+
+    Выключенный реестр (METRICS_ENABLED=false) не собирает ничего:
+    обертки этапов проверяют один флаг и сразу вызывают функцию.
+    """
+
+    def __init__(self, enabled: Optional[bool] = None):
+        self.enabled = Config.METRICS_ENABLED if enabled is None else enabled
+        self._lock = threading.Lock()
+        self.counters: Dict[Tuple[str, Labels], float] = {}
+        self.histograms: Dict[Tuple[str, Labels], Histogram] = {}
+        self.gauges: Dict[Tuple[str, Labels], float] = {}
+
+    def inc(self, name: str, value: float = 1, **labels):
+        if not self.enabled:
+            return
+        key = (name, _labels(labels))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels):
+        if not self.enabled:
+            return
+        key = (name, _labels(labels))
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram()
+            histogram.observe(value)
+
+    def gauge_max(self, name: str, value: float, **labels):
+        if not self.enabled:
+            return
+        key = (name, _labels(labels))
+        with self._lock:
+            self.gauges[key] = max(self.gauges.get(key, value), value)
+
+    def _record(self, stage: str, labels: Dict, wall: float, cpu: float,
+                rss_growth: Optional[int], failed: bool):
+        self.inc('stage_calls_total', stage=stage, **labels)
+        if failed:
+            self.inc('stage_errors_total', stage=stage, **labels)
+        self.observe('stage_wall_seconds', wall, stage=stage, **labels)
+        self.observe('stage_cpu_seconds', cpu, stage=stage, **labels)
+        if rss_growth is not None:
+            self.gauge_max('stage_rss_growth_bytes', rss_growth, stage=stage, **labels)
+        # ru_maxrss - максимум за жизнь процесса (воркеры пула живут долго),
+        # поэтому он хранится без метки этапа
+        self.gauge_max('process_peak_rss_bytes', peak_rss_bytes())
+
+    @contextmanager
+    def timer(self, stage: str, **labels):
+        """Замер этапа: время, CPU-время потока и прирост RSS процесса за этап.
+
+        Возвращает словарь меток: метку, известную только внутри блока
+        (например, найденный маршрут), можно добавить в него.
+        """
+        if not self.enabled:
+            yield labels
+            return
+
+        wall, cpu, rss = time.perf_counter(), time.thread_time(), current_rss_bytes()
+        failed = True
+        try:
+            yield labels
+            failed = False
+        finally:
+            rss_after = current_rss_bytes()
+            rss_growth = max(0, rss_after - rss) if rss is not None and rss_after is not None else None
+            self._record(stage, labels, time.perf_counter() - wall, time.thread_time() - cpu,
+                         rss_growth, failed)
+
+    def timed(self, stage: str, **labels) -> Callable:
+        """Декоратор для функций и корутин: этап замеряется, только если реестр включен"""
+        def decorator(func):
+            if inspect.iscoroutinefunction(func):
+                @functools.wraps(func)
+                async def async_wrapper(*args, **kwargs):
+                    if not self.enabled:
+                        return await func(*args, **kwargs)
+                    # CPU-время потока event loop включает чужие задачи, поэтому
+                    # для корутин значим только wall time
+                    with self.timer(stage, **labels):
+                        return await func(*args, **kwargs)
+                return async_wrapper
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return func(*args, **kwargs)
+                with self.timer(stage, **labels):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    # Перенос метрик из процессов пула в основной процесс
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {
+                'counters': [[name, list(labels), value] for (name, labels), value in self.counters.items()],
+                'histograms': [[name, list(labels), h.counts, h.sum, h.count]
+                               for (name, labels), h in self.histograms.items()],
+                'gauges': [[name, list(labels), value] for (name, labels), value in self.gauges.items()],
+            }
+
+    def merge(self, snapshot: Dict):
+        with self._lock:
+            for name, labels, value in snapshot['counters']:
+                key = (name, tuple(map(tuple, labels)))
+                self.counters[key] = self.counters.get(key, 0) + value
+            for name, labels, counts, total, count in snapshot['histograms']:
+                key = (name, tuple(map(tuple, labels)))
+                histogram = self.histograms.get(key)
+                if histogram is None:
+                    histogram = self.histograms[key] = Histogram()
+                histogram.merge(counts, total, count)
+            for name, labels, value in snapshot['gauges']:
+                key = (name, tuple(map(tuple, labels)))
+                self.gauges[key] = max(self.gauges.get(key, value), value)
+
+    def reset(self):
+        with self._lock:
+            self.counters.clear()
+            self.histograms.clear()
+            self.gauges.clear()
+
+    # Экспорт
+
+    @staticmethod
+    def _format_labels(labels, extra: Labels = ()) -> str:
+        pairs = list(labels) + list(extra)
+        if not pairs:
+            return ''
+        escaped = (value.replace('\\', '\\\\').replace('"', '\\"') for _, value in pairs)
+        return '{' + ','.join(f'{key}="{value}"' for (key, _), value in zip(pairs, escaped)) + '}'
+
+    def export_prometheus(self) -> str:
+        """Текстовый формат экспозиции Prometheus"""
+        lines = []
+        with self._lock:
+            for kind, series in (('counter', self.counters), ('gauge', self.gauges)):
+                for name in sorted({name for name, _ in series}):
+                    lines.append(f"# TYPE {name} {kind}")
+                    for (series_name, labels), value in series.items():
+                        if series_name == name:
+                            lines.append(f"{name}{self._format_labels(labels)} {value}")
+
+            for name in sorted({name for name, _ in self.histograms}):
+                lines.append(f"# TYPE {name} histogram")
+                for (series_name, labels), histogram in self.histograms.items():
+                    if series_name != name:
+                        continue
+                    cumulative = 0
+                    for bound, count in zip(BUCKETS, histogram.counts):
+                        cumulative += count
+                        lines.append(f"{name}_bucket{self._format_labels(labels, (('le', str(bound)),))} {cumulative}")
+                    lines.append(f"{name}_bucket{self._format_labels(labels, (('le', '+Inf'),))} {histogram.count}")
+                    lines.append(f"{name}_sum{self._format_labels(labels)} {histogram.sum}")
+                    lines.append(f"{name}_count{self._format_labels(labels)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def export_jsonl(self, path: str):
+        """Дописывает снимок в JSONL: по строке на серию"""
+        now = time.time()
+        snapshot = self.snapshot()
+        with open(path, 'a', encoding='utf-8') as f:
+            for name, labels, value in snapshot['counters'] + snapshot['gauges']:
+                f.write(json.dumps({'ts': now, 'name': name, 'labels': dict(labels), 'value': value},
+                                   ensure_ascii=False) + "\n")
+            for name, labels, counts, total, count in snapshot['histograms']:
+                f.write(json.dumps({'ts': now, 'name': name, 'labels': dict(labels), 'count': count,
+                                    'sum': total, 'buckets': dict(zip(map(str, BUCKETS), counts))},
+                                   ensure_ascii=False) + "\n")
+
+    def write_exports(self):
+        """Выгрузка в файлы из настроек (METRICS_FILE, METRICS_PROM_FILE)"""
+        if not self.enabled:
+            return
+        if Config.METRICS_FILE:
+            self.export_jsonl(Config.METRICS_FILE)
+        if Config.METRICS_PROM_FILE:
+            with open(Config.METRICS_PROM_FILE, 'w', encoding='utf-8') as f:
+                f.write(self.export_prometheus())
+
+
+registry = MetricsRegistry()
+timer = registry.timer
+timed = registry.timed
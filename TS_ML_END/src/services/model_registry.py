@@ -0,0 +1,133 @@
+import hashlib
+import json
+import os
+import pickle
+import time
+import pandas as pd
+from typing import Dict, List, Optional
+from models.ml_model import BaseModel
+from config import Config
+from services.atomic_io import atomic_write
+
+
+class ModelRegistry:
+    """Дисковый кэш обученных моделей.
+
+    Запись хранит лучшую модель и ее метрики. Ключ строится из тикера,
+    хэша предобработанных данных, гиперпараметров всех моделей-кандидатов
+    и настроек выбора модели (holdout / walk_forward), поэтому любое
+    изменение данных или конфигурации дает новый ключ.
+    Размер кэша ограничен TTL и количеством записей (LRU по времени доступа).
+    TTL отсчитывается от создания записи и при загрузке, и при вытеснении:
+    время создания - mtime файла (файл не перезаписывается),
+    время доступа - atime.
+    """
+
+    def __init__(self, cache_dir=None, ttl_hours: Optional[float] = None,
+                 max_entries: Optional[int] = None):
+        self.cache_dir = cache_dir or Config.MODEL_CACHE_DIR
+        self.ttl = (ttl_hours if ttl_hours is not None else Config.MODEL_CACHE_TTL_HOURS) * 3600
+        self.max_entries = max_entries or Config.MODEL_CACHE_MAX_ENTRIES
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    @staticmethod
+    def data_fingerprint(data: pd.DataFrame) -> str:
+        """Хэш содержимого DataFrame вместе с индексом и названиями колонок"""
+        digest = hashlib.sha256()
+        digest.update(",".join(map(str, data.columns)).encode('utf-8'))
+        digest.update(pd.util.hash_pandas_object(data, index=True).values.tobytes())
+        return digest.hexdigest()
+
+    @staticmethod
+    def selection_config() -> Dict:
+        """Настройки выбора модели: от них зависит, какая модель станет лучшей"""
+        return {
+            'selection': Config.MODEL_SELECTION,
+            'train_test_split': Config.TRAIN_TEST_SPLIT,
+            'backtest': [Config.BACKTEST_FOLDS, Config.BACKTEST_WINDOW,
+                         Config.BACKTEST_TEST_SIZE, Config.BACKTEST_WARM_START]
+        }
+
+    def make_key(self, ticker: str, data: pd.DataFrame, models: List[BaseModel]) -> str:
+        """Ключ записи: тикер + отпечаток данных + гиперпараметры моделей и настройки выбора"""
+        model_config = json.dumps(
+            [[model.get_name(), model.get_params()] for model in models]
+            + [self.selection_config()],
+            sort_keys=True
+        )
+        digest = hashlib.sha256()
+        digest.update(self.data_fingerprint(data).encode('utf-8'))
+        digest.update(model_config.encode('utf-8'))
+        return f"{ticker.upper()}_{digest.hexdigest()[:32]}"
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.pkl")
+
+    def load(self, key: str) -> Optional[Dict]:
+        """Возвращает {'model', 'metrics', 'created_at'} или None, если записи нет или она устарела"""
+        path = self._path(key)
+        if not os.path.exists(path):
+            return None
+
+        try:
+            with open(path, 'rb') as f:
+                entry = pickle.load(f)
+        except Exception as e:
+            print(f"Не удалось прочитать кэш модели {key}: {e}")
+            self._remove(path)
+            return None
+
+        if time.time() - entry['created_at'] > self.ttl:
+            self._remove(path)
+            return None
+
+        # Время доступа для LRU храним в atime файла, mtime остается временем создания
+        try:
+            os.utime(path, (time.time(), os.path.getmtime(path)))
+        except OSError:
+            pass
+        return entry
+
+    def save(self, key: str, model: BaseModel, metrics: Dict):
+        """Атомарно сохраняет модель и метрики, затем вытесняет лишние записи"""
+        entry = {
+            'model': model,
+            'metrics': metrics,
+            'created_at': time.time()
+        }
+
+        def write(path):
+            with open(path, 'wb') as f:
+                pickle.dump(entry, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+        atomic_write(self._path(key), write)
+
+        self._evict()
+
+    def _evict(self):
+        """Удаляет устаревшие записи и самые давно использованные сверх лимита"""
+        now = time.time()
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith('.pkl'):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            if now - stat.st_mtime > self.ttl:
+                self._remove(path)
+            else:
+                entries.append((stat.st_atime, path))
+
+        entries.sort(reverse=True)
+        for _, path in entries[self.max_entries:]:
+            self._remove(path)
+
+    @staticmethod
+    def _remove(path: str):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
@@ -1,42 +1,83 @@
+import multiprocessing
+import time
 import numpy as np
-from typing import List, Dict, Tuple
+from multiprocessing.connection import wait
+from typing import List, Dict, Tuple, Optional
 from models.ml_model import BaseModel
 from models.rf_model import RandomForestModel
 from models.arima_model import ARIMAModel
 from models.lstm_model import PyTorchLSTMModel
+from config import Config
+from services import progress
+from services.backtest import Backtester, BacktestResult
+
+
+def _fit_and_evaluate(model: BaseModel, X_train, y_train, X_test, y_test) -> Dict:
+    """Обучение одной модели и оценка на тестовой выборке"""
+    # Обучение
+    model.fit(X_train, y_train)
+
+    # Прогноз на тестовой выборке
+    y_pred = model.predict(X_test)
+
+    # Оценка
+    metrics = model.evaluate(y_test.values, y_pred)
+    return {
+        'model': model,
+        'metrics': metrics,
+        'predictions': y_pred
+    }
+
+
+def _fit_worker(conn, sink, model: BaseModel, X_train, y_train, X_test, y_test):
+    """Точка входа процесса-воркера: отправляет результат или текст ошибки в pipe"""
+    try:
+        with progress.reporting(sink):
+            result = _fit_and_evaluate(model, X_train, y_train, X_test, y_test)
+        conn.send(('ok', result))
+    except Exception as e:
+        conn.send(('error', str(e)))
+    finally:
+        conn.close()
 
 
 class ModelSelector:
-    def __init__(self):
-        self.models: List[BaseModel] = [
+    def __init__(self, models: Optional[List[BaseModel]] = None, ticker: Optional[str] = None):
+        # По тикеру ARIMA переиспользует параметры, оцененные в прошлых запросах
+        self.models: List[BaseModel] = models or [
             RandomForestModel(n_estimators=100),
-            ARIMAModel(order=(5, 1, 0)),
+            ARIMAModel(order=Config.ARIMA_ORDER, series_key=ticker),
             PyTorchLSTMModel(sequence_length=30, epochs=30)
         ]
         self.best_model = None
         self.best_metrics = None
+        self.backtest_result: Optional[BacktestResult] = None
+
+    def train_and_evaluate(self, X_train, y_train, X_test, y_test,
+                           parallel: Optional[bool] = None,
+                           timeout: Optional[float] = None) -> Dict:
+        """Обучение и оценка всех моделей.
+
+        В параллельном режиме каждая модель обучается в отдельном процессе,
+        а модели, не уложившиеся в timeout секунд, исключаются из выбора
+        так же, как модели, завершившиеся с ошибкой.
+        """
+        if parallel is None:
+            parallel = Config.PARALLEL_TRAINING
+        if parallel:
+            return self._train_parallel(
+                X_train, y_train, X_test, y_test,
+                timeout if timeout is not None else Config.MODEL_TIMEOUT
+            )
 
-    def train_and_evaluate(self, X_train, y_train, X_test, y_test) -> Dict:
-        """Обучение и оценка всех моделей"""
         results = {}
 
         for model in self.models:
             try:
-                # Обучение
-                model.fit(X_train, y_train)
-
-                # Прогноз на тестовой выборке
-                y_pred = model.predict(X_test)
-
-                # Оценка
-                metrics = model.evaluate(y_test.values, y_pred)
-                results[model.get_name()] = {
-                    'model': model,
-                    'metrics': metrics,
-                    'predictions': y_pred
-                }
-
-                print(f"{model.get_name()}: {metrics}")
+                with progress.stage(model.get_name(), f"Обучение {model.get_name()}"):
+                    results[model.get_name()] = _fit_and_evaluate(
+                        model, X_train, y_train, X_test, y_test)
+                print(f"{model.get_name()}: {results[model.get_name()]['metrics']}")
 
             except Exception as e:
                 print(f"Ошибка в модели {model.get_name()}: {str(e)}")
@@ -44,6 +85,85 @@ class ModelSelector:
 
         return results
 
+    def backtest(self, X, y, backtester: Optional[Backtester] = None) -> Dict:
+        """Walk-forward выбор: метрики моделей - средние по фолдам.
+
+        Результат в формате train_and_evaluate: модель последнего фолда, средние
+        метрики и прогноз на последнем тесте; полный отчет - в self.backtest_result.
+        """
+        result: BacktestResult = (backtester or Backtester()).run(self.models, X, y)
+        self.backtest_result = result
+
+        summary = result.summary()
+        for name, stats in result.ranking():
+            print(f"{name}: {stats}")
+
+        return {
+            name: {
+                'model': model,
+                'metrics': {metric: summary[name][metric] for metric in Config.METRICS
+                            if metric in summary[name]},
+                'predictions': result.predictions[name]
+            }
+            for name, model in result.models.items()
+        }
+
+    def _train_parallel(self, X_train, y_train, X_test, y_test, timeout: float) -> Dict:
+        """Обучение моделей в отдельных процессах со сбором результатов по мере готовности"""
+        ctx = multiprocessing.get_context('spawn')
+        workers = {}
+        sink = progress.current_sink()
+        started = time.perf_counter()
+
+        for model in self.models:
+            progress.report(model.get_name(), 'start', f"Обучение {model.get_name()}")
+            parent_conn, child_conn = ctx.Pipe(duplex=False)
+            process = ctx.Process(
+                target=_fit_worker,
+                args=(child_conn, sink, model, X_train, y_train, X_test, y_test),
+                name=f"fit-{model.get_name()}"
+            )
+            process.start()
+            child_conn.close()
+            workers[parent_conn] = (model.get_name(), process)
+
+        results = {}
+        deadline = time.monotonic() + timeout
+
+        while workers:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+
+            for conn in wait(list(workers), timeout=remaining):
+                name, process = workers.pop(conn)
+                try:
+                    status, payload = conn.recv()
+                except EOFError:
+                    status, payload = 'error', f"процесс завершился с кодом {process.exitcode}"
+                finally:
+                    conn.close()
+                process.join()
+
+                elapsed = time.perf_counter() - started
+                if status == 'ok':
+                    results[name] = payload
+                    progress.report(name, 'done', elapsed=elapsed)
+                    print(f"{name}: {payload['metrics']}")
+                else:
+                    progress.report(name, 'error', detail=payload, elapsed=elapsed)
+                    print(f"Ошибка в модели {name}: {payload}")
+
+        # Модели, не уложившиеся в отведенное время, исключаются
+        for conn, (name, process) in workers.items():
+            print(f"Ошибка в модели {name}: превышено время обучения ({timeout:.0f} c)")
+            progress.report(name, 'error', detail="превышено время", elapsed=timeout)
+            process.terminate()
+            process.join()
+            conn.close()
+
+        return results
+
     def select_best_model(self, results: Dict) -> Tuple[BaseModel, Dict]:
         """Выбор лучшей модели по RMSE"""
         if not results:
@@ -63,6 +183,11 @@ class ModelSelector:
 
         return self.best_model, self.best_metrics
 
+    def set_best_model(self, model: BaseModel, metrics: Dict):
+        """Использует ранее обученную модель (например, из кэша моделей)"""
+        self.best_model = model
+        self.best_metrics = metrics
+
     def make_forecast(self, last_data, steps: int) -> np.ndarray:
         """Прогноз на будущее с использованием лучшей модели"""
         if self.best_model is None:
@@ -1,71 +1,75 @@
-import matplotlib.pyplot as plt
 import numpy as np
-from typing import List
+from typing import List, Optional
 import os
-from datetime import datetime, timedelta
+import time
+from datetime import datetime
 from services.analytics_service import TradingPoint
+from services.chart_renderer import ChartRenderer
+from services import metrics, progress
+from config import Config
 
 
 class PlotService:
-    def __init__(self, output_dir='./plots'):
-        self.output_dir = output_dir
-        os.makedirs(output_dir, exist_ok=True)
+    """Графики прогноза в PNG.
 
+    Рисование идет через ChartRenderer (объектный API Figure с холстом Agg,
+    без pyplot и глобального состояния), поэтому безопасно в потоках и процессах
+    пула. Картинка возвращается байтами; на диск она попадает только при включенном
+    архиве, размер которого ограничен числом файлов и возрастом.
+    """
+
+    def __init__(self, archive_dir: Optional[str] = None, max_files: Optional[int] = None,
+                 max_age_days: Optional[float] = None):
+        self.archive_dir = archive_dir if archive_dir is not None else Config.PLOT_ARCHIVE_DIR
+        self.max_files = max_files if max_files is not None else Config.PLOT_ARCHIVE_MAX_FILES
+        self.max_age = (max_age_days if max_age_days is not None
+                        else Config.PLOT_ARCHIVE_MAX_DAYS) * 86400
+        self.renderer = ChartRenderer()
+        if self.archive_dir:
+            os.makedirs(self.archive_dir, exist_ok=True)
+
+    @metrics.timed('create_forecast_plot')
     def create_forecast_plot(self,
                              historical_prices: np.ndarray,
                              forecast_prices: np.ndarray,
                              trading_points: List[TradingPoint],
-                             ticker: str) -> str:
-        """Создание графика с прогнозом и торговыми точками"""
-        plt.figure(figsize=(12, 6))
-
-        # Подготовка данных
-        total_days = len(historical_prices) + len(forecast_prices)
-        dates = [datetime.now() - timedelta(days=total_days - i)
-                 for i in range(total_days)]
-
-        # Исторические данные
-        hist_dates = dates[:len(historical_prices)]
-        plt.plot(hist_dates, historical_prices, 'b-', label='Исторические данные', linewidth=2)
-
-        # Прогноз
-        forecast_dates = dates[len(historical_prices):]
-        plt.plot(forecast_dates, forecast_prices, 'r--', label='Прогноз', linewidth=2)
-
-        # Вертикальная линия разделения
-        separation_date = hist_dates[-1]
-        plt.axvline(x=separation_date, color='gray', linestyle=':', alpha=0.5)
-
-        # Торговые точки
-        buy_points = [tp for tp in trading_points if tp.action == 'buy']
-        sell_points = [tp for tp in trading_points if tp.action == 'sell']
-
-        if buy_points:
-            buy_dates = [forecast_dates[tp.date_index] for tp in buy_points]
-            buy_prices = [tp.price for tp in buy_points]
-            plt.scatter(buy_dates, buy_prices, color='green', s=100,
-                        marker='^', label='Покупка', zorder=5)
+                             ticker: str) -> bytes:
+        """Создание графика с прогнозом и торговыми точками (PNG-байты)"""
+        with progress.stage('plot', 'Построение графика'):
+            image = self.renderer.render(historical_prices, forecast_prices, trading_points, ticker)
+            if self.archive_dir:
+                self._archive(image, ticker)
+            return image
 
-        if sell_points:
-            sell_dates = [forecast_dates[tp.date_index] for tp in sell_points]
-            sell_prices = [tp.price for tp in sell_points]
-            plt.scatter(sell_dates, sell_prices, color='red', s=100,
-                        marker='v', label='Продажа', zorder=5)
+    def _archive(self, image: bytes, ticker: str):
+        """Сохраняет копию в архив и удаляет файлы сверх лимитов"""
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+        filepath = os.path.join(self.archive_dir, f"{ticker}_{timestamp}.png")
+        with open(filepath, 'wb') as f:
+            f.write(image)
 
-        # Настройки графика
-        plt.title(f'Прогноз цен акций {ticker}', fontsize=14, fontweight='bold')
-        plt.xlabel('Дата')
-        plt.ylabel('Цена ($)')
-        plt.legend()
-        plt.grid(True, alpha=0.3)
-        plt.xticks(rotation=45)
-        plt.tight_layout()
+        now = time.time()
+        files = []
+        for name in os.listdir(self.archive_dir):
+            if not name.endswith('.png'):
+                continue
+            path = os.path.join(self.archive_dir, name)
+            try:
+                mtime = os.path.getmtime(path)
+            except OSError:
+                continue
+            if self.max_age and now - mtime > self.max_age:
+                self._remove(path)
+            else:
+                files.append((mtime, path))
 
-        # Сохранение
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"{ticker}_{timestamp}.png"
-        filepath = os.path.join(self.output_dir, filename)
-        plt.savefig(filepath, dpi=150)
-        plt.close()
+        files.sort(reverse=True)
+        for _, path in files[self.max_files:] if self.max_files else []:
+            self._remove(path)
 
-        return filepath
+    @staticmethod
+    def _remove(path: str):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
@@ -0,0 +1,229 @@
+import asyncio
+import contextvars
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+from config import Config
+
+# Получатель событий текущего задания. Без получателя report() ничего не делает,
+# поэтому сервисы можно вызывать и вне бота (тесты, prefetch.py)
+_sink: contextvars.ContextVar[Optional[Callable[[Dict], None]]] = \
+    contextvars.ContextVar('progress_sink', default=None)
+
+
+class QueueSink:
+    """Отправляет события задания request_id в очередь ProgressHub
+    (multiprocessing.Manager().Queue() работает между процессами)"""
+
+    def __init__(self, queue, request_id: Optional[str] = None):
+        self.queue = queue
+        self.request_id = request_id
+
+    def __call__(self, event: Optional[Dict]):
+        try:
+            self.queue.put((self.request_id, event))
+        except Exception:
+            # Прогресс не должен ломать прогноз
+            pass
+
+
+class ProgressHub:
+    """Одна очередь событий прогресса на все задания.
+
+    События приходят с номером задания и читаются одним потоком-диспетчером,
+    который передает их в event loop подписчика. Ожидание очереди не занимает
+    по потоку общего пула asyncio на каждый прогноз.
+    """
+
+    def __init__(self, queue):
+        self.queue = queue
+        self._subscribers: Dict[str, Tuple[asyncio.AbstractEventLoop, Callable]] = {}
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def subscribe(self, callback: Callable[[Optional[Dict]], None]) -> QueueSink:
+        """Получатель для нового задания; callback вызывается в текущем event loop"""
+        request_id = uuid.uuid4().hex
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            self._subscribers[request_id] = (loop, callback)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._dispatch, name='progress-hub', daemon=True)
+                self._thread.start()
+        return QueueSink(self.queue, request_id)
+
+    def unsubscribe(self, request_id: str):
+        with self._lock:
+            self._subscribers.pop(request_id, None)
+
+    def _dispatch(self):
+        while True:
+            try:
+                item = self.queue.get()
+            except (EOFError, OSError):
+                return  # Manager остановлен
+            if item is None:
+                return
+            request_id, event = item
+            with self._lock:
+                subscriber = self._subscribers.get(request_id)
+            if subscriber is None:
+                continue
+            loop, callback = subscriber
+            try:
+                loop.call_soon_threadsafe(callback, event)
+            except RuntimeError:
+                pass  # event loop подписчика уже закрыт
+
+    def close(self):
+        """Останавливает поток-диспетчер"""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self.queue.put(None)
+            thread.join(timeout=5)
+
+
+def current_sink() -> Optional[Callable[[Dict], None]]:
+    return _sink.get()
+
+
+@contextmanager
+def reporting(sink: Optional[Callable[[Dict], None]]):
+    """Направляет события прогресса в sink внутри блока (для текущего задания asyncio/потока)"""
+    token = _sink.set(sink)
+    try:
+        yield
+    finally:
+        _sink.reset(token)
+
+
+def call_with_sink(sink, func: Callable, *args, **kwargs):
+    """Вызывает func с установленным получателем. Точка входа для пулов процессов и потоков."""
+    with reporting(sink):
+        return func(*args, **kwargs)
+
+
+def report(stage: str, status: str, title: str = '', detail: str = '',
+           elapsed: Optional[float] = None):
+    """Событие этапа: status - start | progress | done | error"""
+    sink = _sink.get()
+    if sink is None:
+        return
+    sink({'stage': stage, 'status': status, 'title': title, 'detail': detail,
+          'elapsed': elapsed, 'time': time.time()})
+
+
+@contextmanager
+def stage(name: str, title: str):
+    """Этап с замером времени: события start и done (или error)"""
+    if _sink.get() is None:
+        yield
+        return
+
+    start = time.perf_counter()
+    report(name, 'start', title)
+    try:
+        yield
+    except Exception as e:
+        report(name, 'error', title, str(e), time.perf_counter() - start)
+        raise
+    report(name, 'done', title, elapsed=time.perf_counter() - start)
+
+
+class ProgressReporter:
+    """Собирает события прогноза и обновляет одно сообщение пользователя.
+
+    События задания приходят через общий ProgressHub, сообщение редактируется
+    не чаще раза в min_interval секунд (последнее состояние не теряется и
+    показывается при выходе из блока), длительность каждого этапа сохраняется в timings.
+    Получатель sink доступен внутри блока async with.
+    """
+
+    ICONS = {'start': '⏳', 'progress': '⏳', 'done': '✅', 'error': '❌'}
+
+    def __init__(self, render: Callable[[str], Awaitable], hub: ProgressHub, title: str = '',
+                 min_interval: Optional[float] = None):
+        self.render = render
+        self.hub = hub
+        self.title = title
+        self.min_interval = min_interval if min_interval is not None else Config.PROGRESS_EDIT_INTERVAL
+        self.sink: Optional[QueueSink] = None
+        self.stages: Dict[str, Dict] = {}
+        self.timings: Dict[str, float] = {}
+
+        self._flush_task: Optional[asyncio.Task] = None
+        self._last_render = 0.0
+        self._last_text = None
+        self._drained = asyncio.Event()
+        self._closing = asyncio.Event()
+
+    async def __aenter__(self):
+        self.sink = self.hub.subscribe(self._receive)
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        # None - метка конца: после нее в очереди нет событий этого задания
+        try:
+            self.hub.queue.put((self.sink.request_id, None))
+        except Exception:
+            pass
+        else:
+            await self._drained.wait()
+        self.hub.unsubscribe(self.sink.request_id)
+        # Отложенное обновление не ждет конца интервала, а сразу показывает
+        # итоговое состояние с временем последних этапов
+        self._closing.set()
+        if self._flush_task is not None:
+            await self._flush_task
+
+    def _receive(self, event: Optional[Dict]):
+        if event is None:
+            self._drained.set()
+            return
+        self.handle(event)
+        self._schedule_render()
+
+    def handle(self, event: Dict):
+        stage = self.stages.setdefault(event['stage'], {'title': event['title']})
+        stage['status'] = event['status']
+        stage['detail'] = event['detail']
+        if event['title']:
+            stage['title'] = event['title']
+        if event['elapsed'] is not None:
+            self.timings[event['stage']] = event['elapsed']
+
+    def text(self) -> str:
+        lines = [f"<b>{self.title}</b>"] if self.title else []
+        for name, stage in self.stages.items():
+            line = f"{self.ICONS.get(stage['status'], '•')} {stage['title'] or name}"
+            if stage['status'] in ('done', 'error') and name in self.timings:
+                line += f" - {self.timings[name]:.1f} c"
+            if stage['detail']:
+                line += f" ({stage['detail']})"
+            lines.append(line)
+        return "\n".join(lines)
+
+    def _schedule_render(self):
+        if self._flush_task is not None and not self._flush_task.done():
+            return  # Отложенное обновление уже запланировано и покажет последнее состояние
+        delay = max(0.0, self._last_render + self.min_interval - time.monotonic())
+        self._flush_task = asyncio.create_task(self._flush(delay))
+
+    async def _flush(self, delay: float):
+        if delay:
+            try:
+                await asyncio.wait_for(self._closing.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
+        text = self.text()
+        if text == self._last_text:
+            return
+        self._last_render = time.monotonic()
+        self._last_text = text
+        try:
+            await self.render(text)
+        except Exception as e:
+            print(f"Не удалось обновить прогресс: {e}")
@@ -0,0 +1,34 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+class SingleFlight:
+    """Дедупликация одновременных вычислений по ключу.
+
+    Пока вычисление для ключа выполняется, повторные вызовы с тем же ключом
+    ждут тот же результат (или ту же ошибку), а не запускают работу заново.
+    После завершения ключ освобождается: следующий вызов считает заново.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+
+    def in_flight(self, key: Hashable) -> bool:
+        return key in self._inflight
+
+    async def do(self, key: Hashable, func: Callable[[], Awaitable[Any]]) -> Any:
+        future = self._inflight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(func())
+            self._inflight[key] = future
+            future.add_done_callback(lambda done: self._release(key, done))
+
+        # shield: отмена одного ожидающего не отменяет общее вычисление
+        return await asyncio.shield(future)
+
+    def _release(self, key: Hashable, future: asyncio.Future):
+        if self._inflight.get(key) is future:
+            del self._inflight[key]
+        # Ошибку получают ожидающие; помечаем ее обработанной, если ждать уже некому
+        if not future.cancelled():
+            future.exception()
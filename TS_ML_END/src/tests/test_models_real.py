@@ -206,3 +206,91 @@ class TestModelsReal:
             best_model = min(results, key=results.get)
             print(f"\n🎯 Лучшая модель: {best_model} (RMSE: {results[best_model]:.4f})")
             assert best_model in ['RandomForest', 'ARIMA']
+
+    def test_lstm_create_sequences(self, real_stock_data):
+        """Окна create_sequences совпадают с построением через pandas"""
+        print("\n=== Тестируем окна LSTM ===")
+
+        from models.lstm_model import create_sequences
+
+        seq_length = 10
+        frame = real_stock_data.drop(['price'], axis=1)
+        values = frame.to_numpy(dtype=float)
+        windows, targets = create_sequences(values, seq_length)
+
+        features = frame.drop(['target'], axis=1)
+        expected_windows = np.stack([
+            features.iloc[end - seq_length + 1:end + 1].to_numpy()
+            for end in range(seq_length - 1, len(frame))
+        ])
+        expected_targets = frame['target'].iloc[seq_length - 1:].to_numpy()
+
+        assert windows.shape == (len(frame) - seq_length + 1, seq_length, features.shape[1])
+        np.testing.assert_array_equal(windows, expected_windows)
+        np.testing.assert_array_equal(targets, expected_targets)
+        # Окна - представления над исходным массивом, без копирования
+        assert np.shares_memory(windows, values)
+
+        print(f"Окон: {len(windows)}")
+        print("✅ Окна LSTM строятся корректно")
+
+    def test_lstm_predict_length(self, real_stock_data):
+        """predict возвращает по прогнозу на каждую строку X, даже короче окна"""
+        print("\n=== Тестируем LSTM predict ===")
+
+        split_idx = int(len(real_stock_data) * 0.8)
+        train_data = real_stock_data.iloc[:split_idx]
+        test_data = real_stock_data.iloc[split_idx:]
+        X_train = train_data.drop(['price', 'target'], axis=1)
+        X_test = test_data.drop(['price', 'target'], axis=1)
+
+        model = PyTorchLSTMModel(sequence_length=10, epochs=1, batch_size=8)
+        model.fit(X_train, train_data['target'])
+
+        predictions = model.predict(X_test)
+        assert len(predictions) == len(X_test)
+        assert np.all(np.isfinite(predictions))
+        # Окна первых строк берут контекст из хвоста обучающей выборки
+        assert len(model.predict(X_test.iloc[:3])) == 3
+        np.testing.assert_allclose(model.predict(X_test.iloc[:3]), predictions[:3], rtol=1e-5)
+
+        print("✅ LSTM predict работает корректно")
+
+    def test_lstm_stateful_forecast(self, real_stock_data):
+        """Прогноз с переносом состояния (h, c) совпадает с прогоном растущей последовательности заново"""
+        print("\n=== Тестируем LSTM forecast ===")
+
+        import torch
+        from models.feature_roller import FeatureRoller
+
+        X = real_stock_data.drop(['price', 'target'], axis=1)
+        model = PyTorchLSTMModel(sequence_length=10, epochs=1, batch_size=8)
+        model.fit(X, real_stock_data['target'])
+
+        last_data = real_stock_data.drop(['target'], axis=1).iloc[-20:]
+        steps = 5
+        forecast = model.forecast(last_data, steps)
+
+        # Без состояния: на каждом шаге сеть заново читает окно и все новые строки
+        roller = FeatureRoller(model.feature_names)
+        row = roller.start([last_data], steps)
+        window = last_data.reindex(columns=model.feature_names) \
+            .iloc[-model.sequence_length:].to_numpy(dtype=float)
+        sequence = model._scale_features(window)
+        expected = []
+        model.model.eval()
+        with torch.no_grad():
+            for step in range(steps):
+                if step:
+                    roller.push(row, np.array(expected[-1:]))
+                    roller.apply_calendar(row, step)
+                    sequence = np.vstack([sequence, model._scale_features(row)])
+                output = model.model(torch.from_numpy(sequence).unsqueeze(0).to(model.device))
+                expected.append(float(model._unscale_target(output.item())))
+
+        np.testing.assert_allclose(forecast, expected, rtol=1e-4)
+        # Первый шаг - обычный прогноз по окну последних sequence_length строк
+        np.testing.assert_allclose(forecast[0], model.predict(X.iloc[-model.sequence_length:])[-1], rtol=1e-4)
+
+        print(f"LSTM прогноз: {forecast}")
+        print("✅ LSTM forecast работает корректно")
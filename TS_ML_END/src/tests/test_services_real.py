@@ -1,4 +1,5 @@
 import pytest
+import time
 import numpy as np
 import pandas as pd
 from datetime import datetime
@@ -12,6 +13,33 @@ from services.analytics_service import AnalyticsService
 from services.plot_service import PlotService
 from services.log_service import LogService
 
+from models.ml_model import BaseModel
+
+
+# Модели-заглушки для параллельного обучения: процессы spawn импортируют их по имени модуля
+class _MeanModel(BaseModel):
+    def fit(self, X_train, y_train):
+        self.mean = float(np.mean(y_train))
+        return self
+
+    def predict(self, X):
+        return np.full(len(X), self.mean)
+
+    def forecast(self, last_data, steps):
+        return np.full(steps, self.mean)
+
+
+class _SlowModel(_MeanModel):
+    def fit(self, X_train, y_train):
+        time.sleep(300)
+        return super().fit(X_train, y_train)
+
+
+class _BrokenModel(_MeanModel):
+    def fit(self, X_train, y_train):
+        raise ValueError("обучение не удалось")
+
+
 class TestServicesReal:
     """Реальные тесты сервисов"""
     
@@ -54,6 +82,198 @@ class TestServicesReal:
         print(f"Train: {len(X_train)}, Test: {len(X_test)}")
         print("✅ DataService работает корректно")
     
+    def test_data_service_incremental_cache(self, tmp_path):
+        """Тест инкрементального кэша DataService с заглушкой вместо yfinance"""
+        print("\n=== Тестируем кэш DataService ===")
+
+        history = pd.DataFrame(
+            {'Close': np.arange(30, dtype=float)},
+            index=pd.date_range(datetime.now() - pd.Timedelta(days=40), periods=30, freq='D',
+                                tz='America/New_York').normalize()
+        )
+        calls = []
+        available = {'rows': 20}
+
+        def downloader(ticker, start, end):
+            calls.append(pd.Timestamp(start))
+            visible = history.iloc[:available['rows']]
+            return visible[visible.index.tz_localize(None) >= pd.Timestamp(start).normalize()]
+
+        service = DataService(cache_dir=str(tmp_path), downloader=downloader)
+
+        # Первая загрузка скачивает всю историю
+        df = service.fetch_stock_data("TEST")
+        assert len(df) == 20 and len(calls) == 1
+
+        # Свежий кэш не обращается к источнику, даже если появились новые бары
+        available['rows'] = 30
+        assert len(service.fetch_stock_data("TEST")) == 20
+        assert len(calls) == 1
+
+        # Бар последнего дня сохранен во время торгов, к закрытию цена изменилась
+        history.iloc[19, 0] = 19.5
+
+        # Устаревший кэш догружает хвост с последней даты и перезаписывает ее бар
+        stale = DataService(cache_dir=str(tmp_path), downloader=downloader, refresh_hours=0)
+        df = stale.fetch_stock_data("TEST")
+        assert len(calls) == 2
+        assert calls[1].normalize() == df.index[19]
+        assert len(df) == 30
+        assert df.index.is_monotonic_increasing and not df.index.has_duplicates
+        assert list(df['Close']) == list(range(19)) + [19.5] + list(range(20, 30))
+
+        # Недоступный источник: кэш отдается, повтор откладывается на CACHE_RETRY_MINUTES
+        def failing(ticker, start, end):
+            calls.append(pd.Timestamp(start))
+            raise ConnectionError("Yahoo недоступен")
+
+        broken = DataService(cache_dir=str(tmp_path), downloader=failing, refresh_hours=0)
+        assert len(broken.fetch_stock_data("TEST")) == 30
+        assert len(broken.fetch_stock_data("TEST")) == 30
+        assert len(calls) == 3
+
+        print("✅ Кэш DataService работает корректно")
+
+    def test_cache_backends_migration(self, tmp_path):
+        """Тест форматов кэша и переноса CSV-кэша"""
+        print("\n=== Тестируем форматы кэша ===")
+
+        from services.cache_backend import CsvCacheBackend, NumpyCacheBackend, migrate_csv_cache
+
+        dates = pd.date_range('2024-01-02', periods=50, freq='B', tz='America/New_York')
+        df = pd.DataFrame({
+            'Open': np.linspace(100, 110, 50),
+            'Close': np.linspace(101, 111, 50),
+            'Volume': np.arange(50) * 1000
+        }, index=dates)
+
+        csv_backend = CsvCacheBackend()
+        csv_backend.save(csv_backend.path(str(tmp_path), "TEST"), df)
+
+        backend = NumpyCacheBackend()
+        assert migrate_csv_cache(str(tmp_path), backend) == 1
+        assert not os.path.exists(csv_backend.path(str(tmp_path), "TEST"))
+
+        loaded = backend.load(backend.path(str(tmp_path), "TEST"))
+        assert list(loaded.columns) == ['Open', 'Close', 'Volume']
+        assert (loaded.dtypes == np.float64).all()
+        assert loaded.index.tz is None
+        assert (loaded.index == dates.tz_localize(None)).all()
+        assert np.allclose(loaded['Close'].values, df['Close'].values)
+
+        # DataService читает перенесенный кэш без обращения к источнику
+        def downloader(ticker, start, end):
+            raise AssertionError("кэш должен использоваться без загрузки")
+
+        service = DataService(cache_dir=str(tmp_path), downloader=downloader, backend=backend,
+                              refresh_hours=1e6)
+        assert len(service.fetch_stock_data("TEST")) == 50
+
+        # Одновременные запросы тикера со старым CSV-кэшем переносят его один раз
+        import threading
+        from concurrent.futures import ThreadPoolExecutor
+
+        class SlowBackend(NumpyCacheBackend):
+            saves = 0
+
+            def save(self, path, df):
+                SlowBackend.saves += 1
+                time.sleep(0.05)
+                super().save(path, df)
+
+        csv_backend.save(csv_backend.path(str(tmp_path), "RACE"), df)
+        racing = DataService(cache_dir=str(tmp_path), downloader=downloader, backend=SlowBackend())
+        barrier = threading.Barrier(4)
+
+        def load():
+            barrier.wait()
+            return racing._load_cached("RACE")
+
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            frames = list(pool.map(lambda _: load(), range(4)))
+        assert all(len(frame) == 50 for frame in frames)
+        assert SlowBackend.saves == 1
+
+        print("✅ Форматы кэша работают корректно")
+
+    def test_prefetch_offline(self, tmp_path):
+        """Тест прогрева кэша с заглушкой вместо yfinance"""
+        print("\n=== Тестируем prefetch ===")
+
+        import asyncio
+        import threading
+        import time
+        from prefetch import prefetch, load_watchlist
+
+        watchlist = tmp_path / "watchlist.txt"
+        watchlist.write_text("AAPL, MSFT  # крупные\nNFLX\nBAD\naapl\n", encoding='utf-8')
+        tickers = load_watchlist(str(watchlist))
+        assert tickers == ['AAPL', 'MSFT', 'NFLX', 'BAD']
+
+        lock = threading.Lock()
+        active = {'now': 0, 'max': 0}
+
+        def downloader(ticker, start, end):
+            with lock:
+                active['now'] += 1
+                active['max'] = max(active['max'], active['now'])
+            time.sleep(0.05)
+            with lock:
+                active['now'] -= 1
+            if ticker == 'BAD':
+                return pd.DataFrame()
+            dates = pd.date_range(end=datetime.now(), periods=10, freq='D')
+            return pd.DataFrame({'Close': np.arange(10.0)}, index=dates)
+
+        service = DataService(cache_dir=str(tmp_path / "cache"), downloader=downloader)
+        reports = asyncio.run(prefetch(tickers, data_service=service, concurrency=2))
+
+        assert [report['ticker'] for report in reports] == tickers
+        assert active['max'] <= 2
+        assert all(report['rows'] == 10 and report['fetch_time'] is not None
+                   for report in reports[:3])
+        assert reports[3]['error'] is not None
+
+        print("✅ prefetch работает корректно")
+
+    def test_single_flight(self):
+        """Тест SingleFlight: одно вычисление на ключ для одновременных запросов"""
+        print("\n=== Тестируем SingleFlight ===")
+
+        import asyncio
+        from services.single_flight import SingleFlight
+
+        calls = []
+
+        async def compute(key):
+            calls.append(key)
+            await asyncio.sleep(0.05)
+            if key == 'bad':
+                raise ValueError("ошибка вычисления")
+            return {'key': key}
+
+        async def scenario():
+            flight = SingleFlight()
+            results = await asyncio.gather(
+                *[flight.do('AAPL', lambda: compute('AAPL')) for _ in range(5)],
+                flight.do('MSFT', lambda: compute('MSFT')),
+                *[flight.do('bad', lambda: compute('bad')) for _ in range(2)],
+                return_exceptions=True
+            )
+            assert not flight.in_flight('AAPL')
+            # После завершения ключ освобождается
+            await flight.do('AAPL', lambda: compute('AAPL'))
+            return results
+
+        results = asyncio.run(scenario())
+
+        assert all(result is results[0] for result in results[:5])
+        assert results[5] == {'key': 'MSFT'}
+        assert all(isinstance(result, ValueError) for result in results[6:])
+        assert calls == ['AAPL', 'MSFT', 'bad', 'AAPL']
+
+        print("✅ SingleFlight работает корректно")
+
     def test_analytics_service(self):
         """Тест AnalyticsService"""
         print("\n=== Тестируем AnalyticsService ===")
@@ -95,7 +315,7 @@ class TestServicesReal:
         """Тест PlotService"""
         print("\n=== Тестируем PlotService ===")
         
-        service = PlotService(output_dir=str(tmp_path))
+        service = PlotService(archive_dir='')
         
         # Тестовые данные
         historical = np.random.randn(100) * 10 + 150
@@ -109,18 +329,47 @@ class TestServicesReal:
         ]
         
         # Создаем график
-        plot_path = service.create_forecast_plot(
+        image = service.create_forecast_plot(
             historical_prices=historical,
             forecast_prices=forecast,
             trading_points=points,
             ticker="TEST"
         )
         
-        assert os.path.exists(plot_path)
-        assert plot_path.endswith('.png')
-        print(f"График сохранен: {plot_path}")
+        assert isinstance(image, bytes)
+        assert image.startswith(b'\x89PNG')
+        print(f"График построен в памяти: {len(image)} байт")
+
+        # Архив хранит не больше max_files последних графиков
+        archive = PlotService(archive_dir=str(tmp_path), max_files=2, max_age_days=1)
+        for _ in range(3):
+            archive.create_forecast_plot(historical, forecast, points, "TEST")
+        assert len(os.listdir(tmp_path)) == 2
         
         print("✅ PlotService работает корректно")
+
+    def test_chart_layout_price_ranges(self):
+        """Тест ChartRenderer: подпись оси цен не обрезается при любом масштабе цен"""
+        print("\n=== Тестируем поля графика ===")
+
+        from services.chart_renderer import ChartRenderer
+
+        renderer = ChartRenderer()
+        for base in (150, 650000, 0.0123, 1.5e9, 150):
+            image = renderer.render(np.linspace(base, base * 1.4, 100),
+                                    np.linspace(base * 1.4, base * 1.5, 30), [], "TEST")
+            assert image.startswith(b'\x89PNG')
+
+            template = renderer._template()
+            canvas = template.fig.canvas.get_renderer()
+            width, height = template.fig.bbox.width, template.fig.bbox.height
+            label = template.ax.yaxis.label.get_window_extent(canvas)
+            bbox = template.fig.get_tightbbox(canvas).transformed(template.fig.dpi_scale_trans)
+            assert label.x0 >= 0, f"подпись оси обрезана при цене {base}"
+            assert bbox.x0 >= 0 and bbox.y0 >= 0 and bbox.x1 <= width and bbox.y1 <= height
+            print(f"Цена {base}: левый край подписи {label.x0:.0f} px")
+
+        print("✅ Поля графика работают корректно")
     
     def test_log_service(self, tmp_path):
         """Тест LogService"""
@@ -140,6 +389,7 @@ class TestServicesReal:
             profit_percentage=15.0,
             processing_time=3.5
         )
+        service.flush()
         
         # Проверяем, что файл создан
         assert os.path.exists(log_file)
@@ -151,4 +401,863 @@ class TestServicesReal:
         assert logs.iloc[0]['profit'] == 150
         
         print(f"Запись в лог: {logs.iloc[0].to_dict()}")
-        print("✅ LogService работает корректно")
\ No newline at end of file
+        print("✅ LogService работает корректно")
+
+    def test_log_service_concurrent(self, tmp_path):
+        """Тест LogService: запись из нескольких потоков без потерь и перемешивания строк"""
+        print("\n=== Тестируем LogService из нескольких потоков ===")
+
+        import threading
+
+        log_file = tmp_path / "concurrent_log.csv"
+        service = LogService(log_file=str(log_file), batch_size=16, flush_interval=0.05)
+        workers, rows = 8, 100
+
+        def worker(user_id):
+            for i in range(rows):
+                service.log_request(
+                    user_id=user_id, ticker=f"T{i}", investment_amount=i,
+                    best_model="RandomForestModel", metrics={'rmse': 1.0, 'mape': 2.0},
+                    profit=i, profit_percentage=0.5, processing_time=0.1
+                )
+
+        threads = [threading.Thread(target=worker, args=(user_id,)) for user_id in range(workers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        service.close()
+
+        logs = pd.read_csv(log_file)
+        assert len(logs) == workers * rows
+        assert logs.notna().all().all()
+        # Каждая строка цела: тикер и сумма из одного вызова
+        assert (logs['ticker'] == "T" + logs['investment_amount'].astype(str)).all()
+        assert logs.groupby('user_id').size().eq(rows).all()
+
+        print(f"Записано строк: {len(logs)}")
+        print("✅ LogService работает корректно из нескольких потоков")
+
+    def test_model_registry(self, tmp_path, monkeypatch):
+        """Тест ModelRegistry: сохранение, загрузка и вытеснение"""
+        print("\n=== Тестируем ModelRegistry ===")
+
+        from models.rf_model import RandomForestModel
+        from services.model_registry import ModelRegistry
+
+        dates = pd.date_range('2023-01-01', periods=60, freq='D')
+        data = pd.DataFrame({'lag_1': np.arange(60.0), 'target': np.arange(60.0) + 1}, index=dates)
+        model = RandomForestModel(n_estimators=5).fit(data[['lag_1']], data['target'])
+
+        registry = ModelRegistry(cache_dir=str(tmp_path), ttl_hours=1, max_entries=2)
+        key = registry.make_key("aapl", data, [model])
+
+        assert registry.load(key) is None
+        registry.save(key, model, {'rmse': 1.0})
+
+        entry = registry.load(key)
+        assert entry['metrics']['rmse'] == 1.0
+        assert len(entry['model'].predict(data[['lag_1']])) == 60
+
+        # Другие данные или параметры дают другой ключ
+        assert registry.make_key("aapl", data.iloc[:-1], [model]) != key
+        assert registry.make_key("aapl", data, [RandomForestModel(n_estimators=7)]) != key
+
+        # Модель, выбранная в другом режиме, не берется из кэша
+        from config import Config
+        monkeypatch.setattr(Config, 'MODEL_SELECTION', 'walk_forward')
+        walk_forward_key = registry.make_key("aapl", data, [model])
+        assert walk_forward_key != key
+        monkeypatch.setattr(Config, 'BACKTEST_FOLDS', Config.BACKTEST_FOLDS + 1)
+        assert registry.make_key("aapl", data, [model]) != walk_forward_key
+        monkeypatch.undo()
+        assert registry.make_key("aapl", data, [model]) == key
+
+        # Лимит записей: самая давно использованная запись вытесняется
+        accessed = datetime.now().timestamp() - 60
+        os.utime(registry._path(key), (accessed, accessed))
+        registry.save("MSFT_1", model, {})
+        registry.save("NFLX_2", model, {})
+        assert registry.load(key) is None
+        assert registry.load("NFLX_2") is not None
+
+        # TTL считается от создания записи: часто читаемая запись тоже устаревает на диске
+        created = datetime.now().timestamp() - 7200
+        os.utime(registry._path("NFLX_2"), (datetime.now().timestamp(), created))
+        registry._evict()
+        assert not os.path.exists(registry._path("NFLX_2"))
+        assert os.path.exists(registry._path("MSFT_1"))
+
+        print("✅ ModelRegistry работает корректно")
+
+    def test_route_index(self):
+        """Тест RouteIndex: приоритет статических путей и разбор параметров"""
+        print("\n=== Тестируем RouteIndex ===")
+
+        from router.route_index import RouteIndex
+
+        index = RouteIndex()
+        assert index.add("/item/{item_id}") == []
+        warnings = index.add("/item/new")
+        assert len(warnings) == 1
+        index.add("/item/{item_id}/page/{page}")
+        index.add("/report_{ticker}")
+
+        # Статический путь выигрывает независимо от порядка регистрации
+        assert index.match("/item/new") == ("/item/new", {})
+        assert index.match("/item/42") == ("/item/{item_id}", {'item_id': '42'})
+        assert index.match("/item/42/page/2") == (
+            "/item/{item_id}/page/{page}", {'item_id': '42', 'page': '2'})
+        assert index.match("/report_AAPL") == ("/report_{ticker}", {'ticker': 'AAPL'})
+        assert index.match("/item/") is None
+        assert index.match("/unknown") is None
+
+        print(f"Предупреждения о пересечениях: {warnings}")
+        print("✅ RouteIndex работает корректно")
+
+    def test_route_handler(self):
+        """Тест RouteHandler: фильтрация kwargs, None для отсутствующих параметров
+        и распознавание обработчиков, возвращающих функцию"""
+        print("\n=== Тестируем RouteHandler ===")
+
+        import asyncio
+        from functools import partial
+        from types import SimpleNamespace
+        from router.router import Router, RouteHandler
+        from router.session_store import MemorySessionStore
+
+        rendered = []
+
+        async def render(content, **kwargs):
+            rendered.append((content, sorted(kwargs)))
+            return content
+
+        def sync_handler(update, item_id, page=1):
+            return partial(render, content=(item_id, page))
+
+        async def async_handler(update, ticker):
+            return partial(render, content=ticker)
+
+        def text_handler(update):
+            return "не функция"
+
+        router = Router(sessions=MemorySessionStore())
+        sync_route = RouteHandler.compile(sync_handler, router.returns_a_function(sync_handler))
+        async_route = RouteHandler.compile(async_handler, router.returns_a_function(async_handler))
+        text_route = RouteHandler.compile(text_handler, router.returns_a_function(text_handler))
+
+        assert sync_route.params == (('update', None), ('item_id', None), ('page', 1))
+        assert (sync_route.returns_function, sync_route.is_coroutine) == (True, False)
+        assert (async_route.returns_function, async_route.is_coroutine) == (True, True)
+        assert text_route.returns_function is False
+
+        # Лишние kwargs отбрасываются, отсутствующие параметры - по умолчанию или None
+        assert sync_route.build_kwargs({'update': 'u', 'extra': 1}) == \
+            {'update': 'u', 'item_id': None, 'page': 1}
+        assert sync_route.build_kwargs({'item_id': '7', 'page': 3}) == \
+            {'update': None, 'item_id': '7', 'page': 3}
+
+        router.route("/item/{item_id}", sync_handler)
+        router.route("/report_{ticker}", async_handler)
+        router.route("/text", text_handler)
+        update = SimpleNamespace(effective_chat=SimpleNamespace(id=1))
+
+        assert asyncio.run(router.handle("/item/42", update=update, newMessage=True)) == ('42', 1)
+        assert asyncio.run(router.handle("/report_AAPL", update=update)) == 'AAPL'
+        # Функция отрисовки получает исходные kwargs вместе с параметрами пути
+        assert rendered[0][1] == ['item_id', 'newMessage', 'update']
+        with pytest.raises(ValueError):
+            asyncio.run(router.handle("/text", update=update))
+
+        print(f"Параметры: {sync_route.params}")
+        print("✅ RouteHandler работает корректно")
+
+    def test_session_store(self, tmp_path):
+        """Тест хранилищ сессий и независимых форм в разных чатах"""
+        print("\n=== Тестируем SessionStore ===")
+
+        import asyncio
+        from types import SimpleNamespace
+        from router.router import Router
+        from router.session_store import DiskSessionStore, MemorySessionStore
+        from view.base import FormField, MViewItem
+
+        # LRU: при превышении лимита вытесняется самый давно использованный чат
+        memory = MemorySessionStore(max_sessions=2, ttl_hours=1)
+        for chat_id in (1, 2):
+            memory.save(memory.get(chat_id))
+        memory.get(1)
+        memory.save(memory.get(3))
+        assert len(memory) == 2 and memory._load(2) is None
+
+        # TTL: устаревшая сессия заменяется пустой
+        session = memory.get(1)
+        session.data['x'] = 1
+        memory.save(session)
+        session.updated_at -= 7200
+        assert memory.get(1).data == {}
+
+        # Формы двух чатов не мешают друг другу, прогресс переживает перезапуск
+        def make_form():
+            return MViewItem(title="Форма", text="", current_form_step=0, form_fields=[
+                FormField(name='ticker', field_type='choice', title='Тикер', options=['AAPL', 'MSFT']),
+                FormField(name='amount', field_type='choice', title='Сумма', options=['100', '1000']),
+            ])
+
+        def update(chat_id):
+            return SimpleNamespace(effective_chat=SimpleNamespace(id=chat_id))
+
+        router = Router(sessions=DiskSessionStore(directory=str(tmp_path), ttl_hours=1))
+        router.set_current_item(10, make_form())
+        router.set_current_item(20, make_form())
+
+        asyncio.run(router.handle("form_choice:0:AAPL", update=update(10)))
+        asyncio.run(router.handle("form_choice:0:MSFT", update=update(20)))
+        result = asyncio.run(router.handle("form_choice:1:100", update=update(10)))
+        assert result == {'ticker': 'AAPL', 'amount': '100'}
+
+        restarted = Router(sessions=DiskSessionStore(directory=str(tmp_path), ttl_hours=1))
+        form = restarted.get_current_item(20)
+        assert form.current_form_step == 1
+        assert form.form_fields[0].current_value == 'MSFT'
+
+        # message_id текстового поля, назначенный при рендере, сохраняется на диск
+        from view.telegram import TelegramClient
+
+        client = TelegramClient(token='test')
+        client.router = restarted
+
+        async def fake_render_text(**kwargs):
+            return 555
+
+        client._render_text = fake_render_text
+        text_form = MViewItem(title="Форма", text="", current_form_step=0, form_fields=[
+            FormField(name='ticker', field_type='text', title='Тикер')])
+        restarted.set_current_item(30, text_form)
+        asyncio.run(client._render_form(text_form, chat_id=30, message_id=42))
+        reloaded = Router(sessions=DiskSessionStore(directory=str(tmp_path), ttl_hours=1))
+        assert reloaded.get_current_item(30).form_fields[0].message_id == 42
+
+        print("✅ SessionStore работает корректно")
+
+    def test_forecast_session_state(self, tmp_path):
+        """Тест: прогноз не затирает форму, начатую в чате, пока он выполнялся"""
+        print("\n=== Тестируем состояние прогноза в сессии ===")
+
+        pytest.importorskip('torch')
+        import asyncio
+        from types import SimpleNamespace
+        from controllers.stock_controller import StockController
+        from router.router import Router
+        from router.session_store import DiskSessionStore, MemorySessionStore
+        from services.single_flight import SingleFlight
+
+        class FakeExecutor:
+            async def run_io(self, func, *args):
+                return func(*args)
+
+        prices = pd.DataFrame({'Close': np.linspace(100, 110, 50)},
+                              index=pd.date_range('2024-01-01', periods=50, freq='D'))
+        for store in (MemorySessionStore(ttl_hours=1),
+                      DiskSessionStore(directory=str(tmp_path / 'forecast'), ttl_hours=1)):
+            chat_router = Router(sessions=store)
+            controller = StockController.__new__(StockController)
+            # Рендер не вызывается: контроллер возвращает partial для роутера
+            driver = SimpleNamespace(getRouter=lambda: chat_router, render_message=print)
+            controller.ctx = SimpleNamespace(driver=driver, executor=FakeExecutor())
+            controller.data_service = SimpleNamespace(fetch_stock_data=lambda ticker: prices)
+            controller.forecasts = SingleFlight()
+            chat = SimpleNamespace(effective_chat=SimpleNamespace(id=40),
+                                   effective_user=SimpleNamespace(id=7))
+
+            # Пока прогноз считается, в чате начинают новый /forecast
+            async def build_forecast(df, ticker):
+                await controller.start_forecast(chat)
+                raise RuntimeError("модель не обучилась")
+
+            controller._build_forecast = build_forecast
+            asyncio.run(controller.start_forecast(chat))
+            session = chat_router.session(40)
+            session.current_item.form_fields[0].current_value = 'AAPL'
+            chat_router.save_session(session)
+            asyncio.run(controller._run_forecast(chat, {'ticker': 'AAPL', 'amount': '100'}))
+
+            session = chat_router.session(40)
+            assert session.data['forecast'] == {'step': 'ticker', 'data': {}}
+            assert session.current_item.form_fields[0].current_value is None
+
+        print("✅ Состояние прогноза в сессии очищается корректно")
+
+    def test_fair_scheduler(self):
+        """Тест FairScheduler: лимиты пользователя, обход по кругу и место в очереди"""
+        print("\n=== Тестируем FairScheduler ===")
+
+        import asyncio
+        from services.forecast_scheduler import FairScheduler, RateLimitError
+
+        async def scenario():
+            scheduler = FairScheduler(slots=1, rate_per_minute=0, burst=2, max_per_user=2)
+            release = asyncio.Event()
+            order, positions = [], {}
+
+            def job(name):
+                async def run():
+                    order.append(name)
+                    await release.wait()
+                return run
+
+            def track(name):
+                async def on_queued(position):
+                    positions.setdefault(name, []).append(position)
+                return on_queued
+
+            tasks = [asyncio.create_task(scheduler.run(user, job(name), on_queued=track(name)))
+                     for user, name in (('a', 'a1'), ('a', 'a2'), ('b', 'b1'))]
+            await asyncio.sleep(0)
+
+            # Третье одновременное задание пользователя a отклоняется
+            with pytest.raises(RateLimitError):
+                await scheduler.run('a', job('a3'))
+
+            release.set()
+            await asyncio.gather(*tasks)
+
+            # Корзина пуста: токены не пополняются при rate=0
+            with pytest.raises(RateLimitError):
+                await scheduler.run('a', job('a4'))
+            return order, positions
+
+        order, positions = asyncio.run(scenario())
+        # b обслуживается раньше второго задания a, место a2 сдвигается
+        assert order == ['a1', 'b1', 'a2']
+        assert positions == {'a2': [1, 2], 'b1': [1]}
+
+        print(f"Порядок выполнения: {order}, места в очереди: {positions}")
+        print("✅ FairScheduler работает корректно")
+
+    def test_progress_reporter(self, tmp_path):
+        """Тест ProgressReporter: этапы DataService, замер времени и ограничение частоты правок"""
+        print("\n=== Тестируем ProgressReporter ===")
+
+        import asyncio
+        import queue
+        from services import progress
+        from services.progress import ProgressHub, ProgressReporter
+
+        def downloader(ticker, start, end):
+            dates = pd.bdate_range(end=end, periods=50)
+            return pd.DataFrame({'Close': np.linspace(100, 110, 50)}, index=dates)
+
+        async def scenario():
+            texts = []
+
+            async def render(text):
+                texts.append(text)
+
+            hub = ProgressHub(queue.Queue())
+            reporter = ProgressReporter(render, hub, title="Прогноз", min_interval=60)
+            other = ProgressReporter(render, hub, title="Другой прогноз", min_interval=60)
+            service = DataService(cache_dir=str(tmp_path), downloader=downloader)
+            async with reporter, other:
+                # Задания пишут в одну очередь, каждое событие попадает только своему получателю
+                with progress.reporting(other.sink):
+                    progress.report('rf', 'start', 'Обучение RF')
+                with progress.reporting(reporter.sink):
+                    service.fetch_stock_data("TEST")
+                    await asyncio.sleep(0.05)
+                    for epoch in range(5):
+                        progress.report('lstm', 'progress', 'Обучение LSTM', f"эпоха {epoch + 1}/5")
+                    await asyncio.sleep(0.05)
+            hub.close()
+            assert list(other.stages) == ['rf']
+            return reporter, [text for text in texts if text.startswith("<b>Прогноз")]
+
+        reporter, texts = asyncio.run(scenario())
+
+        # Первое событие показывается сразу, остальные ждут интервала,
+        # но при выходе из блока итоговое состояние показывается без ожидания
+        assert len(texts) == 2
+        assert texts[-1] == reporter.text()
+        assert "эпоха 5/5" in texts[-1] and " c" in texts[-1]
+        assert 'data' in reporter.timings
+        assert reporter.stages['data']['status'] == 'done'
+        assert reporter.stages['lstm']['detail'] == "эпоха 5/5"
+        assert "✅ Загрузка котировок" in reporter.text()
+
+        # Без получателя события игнорируются
+        progress.report('data', 'start')
+
+        print(reporter.text())
+        print("✅ ProgressReporter работает корректно")
+
+    def test_log_store(self, tmp_path):
+        """Тест LogStore: импорт CSV, догрузка новых строк и статистика пользователя"""
+        print("\n=== Тестируем LogStore ===")
+
+        from services.log_store import LogStore
+
+        log_file = tmp_path / "logs.csv"
+        log_file.write_text(
+            "timestamp,user_id,ticker,investment_amount,best_model,rmse,mape,profit,profit_percentage,processing_time\n"
+            "2026-01-14T22:05:38,1,AAPL,1000,RandomForestModel,2.5,1.5,10,1.0,20\n"
+            "2026-01-14T22:07:34,1,MSFT,1000,ARIMAModel,1.5,0.5,0,0.0,4\n"
+            "2026-01-15T10:00:00,2,TSLA,500,RandomForestModel,3.0,2.0,5,1.0,6\n",
+            encoding='utf-8'
+        )
+
+        # Существующий журнал импортируется writer-потоком при создании сервиса
+        service = LogService(log_file=str(log_file), flush_interval=0.05)
+        store = service.store
+        assert service.flush(timeout=5)
+        assert store.sync_csv(str(log_file)) == 0
+
+        service.log_request(
+            user_id=1, ticker="aapl", investment_amount=2000, best_model="RandomForestModel",
+            metrics={'rmse': 1.0, 'mape': 1.0}, profit=30, profit_percentage=1.5, processing_time=6
+        )
+        service.close()
+
+        stats = store.user_stats(1)
+        assert stats['requests'] == 3
+        assert stats['avg_processing_time'] == pytest.approx(10.0)
+        assert stats['favourite_tickers'][0] == ('AAPL', 2)
+        assert stats['models'] == {'RandomForestModel': 2, 'ARIMAModel': 1}
+        assert store.user_stats(42) is None
+
+        # Повторная синхронизация и новый экземпляр не дублируют строки
+        assert LogStore(store.db_file).sync_csv(str(log_file)) == 0
+
+        # Пересозданный журнал (даже длиннее прежнего) заменяет строки старого, а не дополняет
+        rows = log_file.read_text(encoding='utf-8').splitlines()
+        log_file.unlink()
+        log_file.write_text("\n".join(rows[:1] + rows[2:] + rows[1:2] * 3) + "\n", encoding='utf-8')
+        assert store.sync_csv(str(log_file)) == 6
+        assert store.user_stats(1)['requests'] == 5
+        assert store.user_stats(2)['requests'] == 1
+
+        # Выборка по пользователю идет через индекс, без полного просмотра таблицы
+        plan = store._connection().execute(
+            "EXPLAIN QUERY PLAN SELECT COUNT(*) FROM requests WHERE user_id = ?", (1,)).fetchall()
+        assert any('idx_requests_user' in row[-1] for row in plan)
+
+        print(f"Статистика пользователя: {stats}")
+        print("✅ LogStore работает корректно")
+
+    def test_metrics(self, tmp_path):
+        """Тест метрик этапов: замеры включенного реестра, экспорт и выключенный режим"""
+        print("\n=== Тестируем метрики ===")
+
+        import json
+        from services import metrics
+        from models.ml_model import BaseModel
+
+        class MeanModel(BaseModel):
+            def fit(self, X_train, y_train):
+                self.mean = float(np.mean(y_train))
+                return self
+
+            def predict(self, X):
+                return np.full(len(X), self.mean)
+
+            def forecast(self, last_data, steps):
+                return np.full(steps, self.mean)
+
+        registry = metrics.registry
+        enabled = registry.enabled
+        registry.reset()
+        try:
+            # Выключенный реестр ничего не собирает
+            registry.enabled = False
+            MeanModel().fit(np.zeros((3, 1)), np.arange(3))
+            assert registry.snapshot() == {'counters': [], 'histograms': [], 'gauges': []}
+
+            registry.enabled = True
+            dates = pd.date_range('2023-01-01', periods=100, freq='D')
+            df = pd.DataFrame({'Close': 100 + np.arange(100.0)}, index=dates)
+            DataService().preprocess_data(df)
+
+            model = MeanModel().fit(np.zeros((3, 1)), np.arange(3))
+            model.forecast(None, 5)
+            with pytest.raises(ZeroDivisionError):
+                with metrics.timer('broken'):
+                    1 / 0
+
+            # Прирост RSS считается за этап, а не берется из пика за жизнь процесса
+            with metrics.timer('allocate'):
+                block = np.ones(64 * 2 ** 20 // 8)
+            del block
+            with metrics.timer('small'):
+                pass
+            gauges = {(name, dict(labels).get('stage')): value
+                      for name, labels, value in registry.snapshot()['gauges']}
+            assert gauges[('stage_rss_growth_bytes', 'allocate')] >= 48 * 2 ** 20
+            assert gauges[('stage_rss_growth_bytes', 'small')] < 8 * 2 ** 20
+            assert gauges[('process_peak_rss_bytes', None)] >= gauges[('stage_rss_growth_bytes', 'allocate')]
+
+            calls = {dict(labels)['stage']: value for name, labels, value in registry.snapshot()['counters']
+                     if name == 'stage_calls_total'}
+            assert calls == {'preprocess_data': 1, 'model.fit': 1, 'model.forecast': 1, 'broken': 1,
+                             'allocate': 1, 'small': 1}
+
+            # Снимок из процесса пула добавляется к счетчикам основного процесса
+            registry.merge(registry.snapshot())
+            text = registry.export_prometheus()
+            assert '# TYPE stage_wall_seconds histogram' in text
+            assert 'stage_calls_total{model="MeanModel",stage="model.fit"} 2' in text
+            assert 'stage_errors_total{stage="broken"} 2' in text
+            assert 'stage_wall_seconds_count{stage="preprocess_data"} 2' in text
+
+            jsonl = tmp_path / "metrics.jsonl"
+            registry.export_jsonl(str(jsonl))
+            rows = [json.loads(line) for line in jsonl.read_text(encoding='utf-8').splitlines()]
+            assert {'stage_calls_total', 'stage_cpu_seconds', 'stage_rss_growth_bytes'} <= {r['name'] for r in rows}
+
+            # router_dispatch - только работа роутера, без обработчика и рендера
+            import asyncio
+            from functools import partial
+            from router.router import Router
+
+            async def render(**kwargs):
+                await asyncio.sleep(0.1)
+
+            async def slow_handler(update, item_id):
+                await asyncio.sleep(0.2)
+                return partial(render)
+
+            registry.reset()
+            router = Router()
+            router.route("/item/{item_id}", slow_handler)
+            asyncio.run(router.handle("/item/5", update=None))
+            dispatch = [(dict(labels), total) for name, labels, counts, total, count
+                        in registry.snapshot()['histograms'] if name == 'stage_wall_seconds']
+            assert dispatch == [({'stage': 'router_dispatch', 'route': '/item/{item_id}'}, dispatch[0][1])]
+            assert dispatch[0][1] < 0.1
+        finally:
+            registry.enabled = enabled
+            registry.reset()
+
+        print(text.splitlines()[0])
+        print("✅ Метрики работают корректно")
+
+    def test_feature_roller_matches_preprocess(self, monkeypatch):
+        """Тест FeatureRoller: признаки шагов рекурсивного прогноза совпадают с preprocess_data
+        на ряде, дополненном прогнозами"""
+        print("\n=== Тестируем FeatureRoller ===")
+
+        from config import Config
+        from models.feature_roller import FeatureRoller
+        from models.rf_model import RandomForestModel
+        from services.features import FeaturePipeline, Return, RSI, Volatility
+
+        rng = np.random.default_rng(6)
+        dates = pd.bdate_range('2023-01-02', periods=120)
+        df = pd.DataFrame({'Close': 100 * np.exp(np.cumsum(rng.normal(0, 0.02, 120)))}, index=dates)
+        service = DataService()
+
+        default = FeaturePipeline.default()
+        extended_pipeline = FeaturePipeline(default.features + [Return(1), RSI(14), Volatility(10)])
+        for pipeline in (default, extended_pipeline):
+            processed = service.preprocess_data(df, pipeline)
+            feature_names = pipeline.names
+            last_data = processed.iloc[-pipeline.history:]
+
+            rows = []
+            forecast = processed['price'].iloc[-1] * np.array([1.03, 0.98, 1.01])
+
+            def predict(X):
+                rows.append(X[0].copy())
+                return forecast[len(rows) - 1:len(rows)]
+
+            FeatureRoller(feature_names).rollout(predict, [last_data], len(forecast))
+
+            # Первая строка - последний бар истории без изменений
+            np.testing.assert_allclose(rows[0], last_data[feature_names].iloc[-1].to_numpy())
+
+            # Строка шага k - признаки бара с ценой forecast[k-1] на ряде цен processed,
+            # продолженном прогнозами; лишний бар в конце нужен, чтобы у строки
+            # была цель и она не отбросилась
+            extended = pd.concat([processed['price'], pd.Series(
+                np.append(forecast, forecast[-1]),
+                index=pd.bdate_range(processed.index[-1], periods=len(forecast) + 2)[1:])])
+            recomputed = service.preprocess_data(extended.to_frame('Close'), pipeline)
+            for step in range(1, len(forecast)):
+                expected = recomputed[feature_names].iloc[-len(forecast) - 1 + step].to_numpy()
+                np.testing.assert_allclose(rows[step], expected, rtol=1e-7, atol=1e-9,
+                                           err_msg=f"шаг {step}")
+
+            print(f"Признаки: {feature_names}")
+
+        # Контекст прогноза следует настройкам признаков, а не фиксированной длине
+        assert RandomForestModel().forecast_context() == FeaturePipeline.default().history
+        monkeypatch.setattr(Config, 'RSI_WINDOWS', [80])
+        assert RandomForestModel().forecast_context() == RSI(80).history > 60
+        print("✅ FeatureRoller работает корректно")
+
+    def test_feature_pipeline(self):
+        """Тест FeaturePipeline: совпадение с pandas, доп. признаки и инкрементальный расчет"""
+        print("\n=== Тестируем FeaturePipeline ===")
+
+        from services.features import FeaturePipeline, Lag, SMA, Std, Return, RSI, Volatility
+
+        rng = np.random.default_rng(0)
+        dates = pd.date_range('2020-01-01', periods=600, freq='D')
+        prices = pd.Series(100 * np.exp(np.cumsum(rng.normal(0, 0.02, 600))), index=dates)
+
+        # Колонки по умолчанию - те же, что строились через shift и rolling
+        processed = DataService().preprocess_data(pd.DataFrame({'Close': prices}))
+        expected = pd.DataFrame({'price': prices})
+        for lag in [1, 2, 3, 5, 7, 14]:
+            expected[f'lag_{lag}'] = prices.shift(lag)
+        for window in [7, 14, 30]:
+            expected[f'sma_{window}'] = prices.rolling(window).mean()
+            expected[f'std_{window}'] = prices.rolling(window).std()
+        expected['target'] = prices.shift(-1)
+        expected = expected.dropna()
+
+        assert list(processed.columns) == list(expected.columns)
+        assert processed.index.equals(expected.index)
+        np.testing.assert_allclose(processed.values, expected.values, rtol=1e-7)
+
+        # Дополнительные признаки
+        pipeline = FeaturePipeline([Lag(1), SMA(5), Std(5), Return(3), RSI(14), Volatility(10)])
+        matrix = pipeline.transform(prices.values)
+        delta = prices.diff()
+        gain = delta.clip(lower=0).rolling(14).mean()
+        loss = (-delta).clip(lower=0).rolling(14).mean()
+        np.testing.assert_allclose(matrix[14:, 4], (100 - 100 / (1 + gain / loss))[14:], rtol=1e-8)
+        np.testing.assert_allclose(matrix[3:, 3], prices.pct_change(3)[3:], rtol=1e-10)
+        np.testing.assert_allclose(matrix[10:, 5], np.log(prices).diff().rolling(10).std()[10:], rtol=1e-7)
+
+        # Новый бар считается по хвосту цен так же, как полным пересчетом
+        stream = pipeline.stream(prices.values[:500])
+        for i in range(500, 600):
+            np.testing.assert_allclose(stream.append(prices.values[i]), matrix[i], rtol=1e-7)
+
+        with pytest.raises(ValueError):
+            FeaturePipeline([SMA(5), SMA(5)])
+        # Признак без compute/last не создается
+        from services.features import Feature
+        with pytest.raises(TypeError):
+            Feature(5)
+
+        print(f"Признаки: {pipeline.names}")
+        print("✅ FeaturePipeline работает корректно")
+
+    def test_backtester(self, monkeypatch):
+        """Тест walk-forward: фолды, метрики по фолдам, warm start и режим ModelSelector"""
+        print("\n=== Тестируем Backtester ===")
+
+        from services.backtest import Backtester, make_folds
+        from models.rf_model import RandomForestModel
+        from models.arima_model import ARIMAModel
+
+        folds = make_folds(100, 4, test_size=5)
+        assert [(f.train_start, f.train_end, f.test_end) for f in folds][-1] == (0, 95, 100)
+        sliding = make_folds(100, 4, test_size=5, window='sliding')
+        assert {f.train_end - f.train_start for f in sliding} == {80}
+        with pytest.raises(ValueError):
+            make_folds(10, 5, test_size=5)
+
+        rng = np.random.default_rng(1)
+        dates = pd.date_range('2022-01-01', periods=300, freq='D')
+        df = pd.DataFrame({'Close': 100 + np.cumsum(rng.normal(0, 1, 300))}, index=dates)
+        processed = DataService().preprocess_data(df)
+        X, y = processed.drop(['price', 'target'], axis=1), processed['target']
+
+        partial_fits = []
+        partial_fit = RandomForestModel.partial_fit
+
+        def counting_partial_fit(model, X_train, y_train, n_new):
+            partial_fits.append(len(X_train))
+            return partial_fit(model, X_train, y_train, n_new)
+
+        monkeypatch.setattr(RandomForestModel, 'partial_fit', counting_partial_fit)
+
+        models = [RandomForestModel(n_estimators=8, warm_start_trees=2), ARIMAModel(order=(1, 1, 0))]
+        result = Backtester(folds=3, warm_start=True, workers=1).run(models, X, y)
+
+        assert not result.errors
+        assert len(result.folds) == 6
+        assert [name for name, _ in result.ranking()] == sorted(
+            result.summary(), key=lambda name: result.summary()[name]['rmse'])
+        # Лес дообучался только на втором фолде; последний обучен заново,
+        # и в прогноз идет лес из заданных 8 деревьев
+        assert partial_fits == [result.folds[1]['train'][1]]
+        forest = result.models['RandomForestModel'].model
+        assert forest.n_estimators == len(forest.estimators_) == 8
+        arima = result.models['ARIMAModel']
+        assert arima.model.nobs == result.folds[-1]['train'][1] and arima.fit_mode == 'full'
+
+        for name, stats in result.ranking():
+            print(f"{name}: {stats}")
+        print("✅ Backtester работает корректно")
+
+    def test_model_selector_parallel(self):
+        """Тест параллельного обучения: модели с ошибкой и превысившие время исключаются"""
+        print("\n=== Тестируем параллельное обучение ===")
+
+        pytest.importorskip('torch')
+        import multiprocessing
+        from services.model_selector import ModelSelector
+
+        X = pd.DataFrame({'lag_1': np.arange(60.0)})
+        y = pd.Series(np.arange(60.0) + 1)
+        selector = ModelSelector(models=[_MeanModel(), _SlowModel(), _BrokenModel()])
+
+        started = time.monotonic()
+        results = selector.train_and_evaluate(X.iloc[:50], y.iloc[:50], X.iloc[50:], y.iloc[50:],
+                                              parallel=True, timeout=10)
+        elapsed = time.monotonic() - started
+
+        assert list(results) == ['_MeanModel']
+        assert len(results['_MeanModel']['predictions']) == 10
+        # Процесс модели, превысившей время, завершен, а не оставлен работать
+        assert elapsed < 30
+        assert not multiprocessing.active_children()
+        assert selector.select_best_model(results)[0].get_name() == '_MeanModel'
+
+        print(f"Обучение заняло {elapsed:.1f} c, результаты: {list(results)}")
+        print("✅ Параллельное обучение работает корректно")
+
+    def test_model_selector_walk_forward(self):
+        """Тест выбора модели по средним метрикам walk-forward"""
+        print("\n=== Тестируем ModelSelector.backtest ===")
+
+        pytest.importorskip('torch')
+        from services.backtest import Backtester
+        from services.model_selector import ModelSelector
+        from models.rf_model import RandomForestModel
+        from models.arima_model import ARIMAModel
+
+        rng = np.random.default_rng(2)
+        dates = pd.date_range('2022-01-01', periods=300, freq='D')
+        df = pd.DataFrame({'Close': 100 + np.cumsum(rng.normal(0, 1, 300))}, index=dates)
+        processed = DataService().preprocess_data(df)
+        X, y = processed.drop(['price', 'target'], axis=1), processed['target']
+
+        selector = ModelSelector(models=[RandomForestModel(n_estimators=8), ARIMAModel(order=(1, 1, 0))])
+        results = selector.backtest(X, y, Backtester(folds=3, warm_start=False, workers=1))
+        best_model, best_metrics = selector.select_best_model(results)
+
+        assert best_metrics['rmse'] == min(r['metrics']['rmse'] for r in results.values())
+        assert selector.backtest_result.summary()[best_model.get_name()]['folds'] == 3
+        assert len(selector.make_forecast(processed.iloc[-60:], 5)) == 5
+
+        print(f"Лучшая модель: {best_model.get_name()} {best_metrics}")
+        print("✅ ModelSelector.backtest работает корректно")
+
+    def test_arima_incremental(self, tmp_path):
+        """Тест обновления ARIMA между запросами: append, фильтр и полная оценка по расписанию"""
+        print("\n=== Тестируем инкрементальную ARIMA ===")
+
+        from services import arima_state
+        from models.arima_model import ARIMAModel
+
+        rng = np.random.default_rng(3)
+        prices = 100 + np.cumsum(rng.normal(0, 1, 260))
+
+        store = arima_state._store
+        arima_state._store = arima_state.ArimaStateStore(directory=str(tmp_path), refit_every=3)
+        try:
+            model = ARIMAModel(order=(2, 1, 0), series_key='test')
+            modes = []
+            for y in (prices[:250], prices[:252], prices[2:253], prices[3:254], prices[4:255]):
+                model.fit(None, y)
+                modes.append(model.fit_mode)
+            assert modes == ['full', 'append', 'filter', 'filter', 'full']
+
+            # Новый процесс (без объекта statsmodels в памяти) продолжает с сохраненными параметрами
+            arima_state._store = arima_state.ArimaStateStore(directory=str(tmp_path), refit_every=3)
+            fresh = ARIMAModel(order=(2, 1, 0), series_key='TEST').fit(None, prices[4:256])
+            assert fresh.fit_mode == 'filter'
+            np.testing.assert_allclose(fresh.model.params, model.model.params)
+            assert len(fresh.forecast(None, 5)) == 5
+        finally:
+            arima_state._store = store
+
+        print(f"Режимы обновления: {modes}")
+        print("✅ Инкрементальная ARIMA работает корректно")
+
+    def test_arima_order_search(self, tmp_path):
+        """Тест подбора порядка ARIMA: выбор по AIC, отсечение, бюджет времени и кэш по тикеру"""
+        print("\n=== Тестируем подбор порядка ARIMA ===")
+
+        from services.arima_order import OrderSearch, OrderCache, find_order, choose_d
+        from models.arima_model import ARIMAModel
+
+        rng = np.random.default_rng(4)
+        noise = rng.normal(0, 1, 400)
+        returns = np.zeros(400)
+        for t in range(2, 400):
+            returns[t] = 0.6 * returns[t - 1] - 0.3 * returns[t - 2] + noise[t]
+        y = 100 + np.cumsum(returns)
+
+        assert choose_d(y) == 1
+        result = OrderSearch(p_values=[0, 1, 2, 3, 4], q_values=[0, 1, 2], workers=1, budget=60).search(y)
+        assert result.order[1] == 1 and result.order[0] >= 2
+        assert result.pruned > 0 and not result.timed_out
+        assert result.score == min(r['aic'] for r in result.evaluated if 'aic' in r)
+
+        # Бюджет исчерпан до первого кандидата: порядок по умолчанию
+        empty = OrderSearch(d_values=[1], workers=1, budget=0).search(y)
+        assert empty.timed_out and empty.order == (5, 1, 0)
+
+        cache = OrderCache(directory=str(tmp_path), ttl_hours=1)
+        search = OrderSearch(p_values=[0, 1, 2], q_values=[0, 1], workers=1, budget=60)
+        order = find_order(y, key='test', search=search, cache=cache)
+        assert cache.get('TEST') == order
+        # Повторный запрос по тикеру берет порядок из кэша без подбора
+        assert find_order(y, key='test', search=OrderSearch(budget=0), cache=cache) == order
+
+        assert ARIMAModel(order='auto').get_params() == {'order': 'auto'}
+        assert ARIMAModel(order='2,1,0').order == (2, 1, 0)
+
+        # Раунд, который по опыту не успеет до срока, не начинается
+        results, timed_out = OrderSearch._evaluate_round(
+            None, y, [(1, 1, 0)], time.monotonic() + 5, slowest=10.0)
+        assert timed_out and results == []
+
+        # Бюджет жесткий: первый кандидат и тест ADF прерываются по сроку
+        long_y = 100 + np.cumsum(rng.normal(0, 1, 20000))
+        for d_values in ([1], None):
+            started = time.perf_counter()
+            cut = OrderSearch(p_values=[5], q_values=[2], d_values=d_values, workers=1, budget=0.3).search(long_y)
+            assert cut.timed_out and cut.evaluated == [] and cut.order == (5, 1, 0)
+            assert time.perf_counter() - started < 2
+
+        print(f"Порядок: {result.order}, проверено {len(result.evaluated)}, отсечено {result.pruned}")
+        print("✅ Подбор порядка ARIMA работает корректно")
+
+    def test_arima_order_backtest(self, monkeypatch):
+        """Тест walk-forward с order='auto': порядок подбирается один раз на весь запрос"""
+        print("\n=== Тестируем подбор порядка ARIMA в Backtester ===")
+
+        from services import arima_order
+        from services.backtest import Backtester
+        from models.arima_model import ARIMAModel
+
+        calls = []
+
+        def fake_find_order(y, key=None, search=None, cache=None):
+            calls.append(len(y))
+            return (1, 1, 0)
+
+        monkeypatch.setattr(arima_order, 'find_order', fake_find_order)
+
+        rng = np.random.default_rng(5)
+        dates = pd.date_range('2022-01-01', periods=300, freq='D')
+        df = pd.DataFrame({'Close': 100 + np.cumsum(rng.normal(0, 1, 300))}, index=dates)
+        processed = DataService().preprocess_data(df)
+        X, y = processed.drop(['price', 'target'], axis=1), processed['target']
+
+        model = ARIMAModel(order='auto', series_key='test')
+        result = Backtester(folds=4, warm_start=False, workers=1).run([model], X, y)
+
+        assert not result.errors and len(result.folds) == 4
+        # Один поиск на самом длинном обучающем отрезке вместо поиска в каждом фолде
+        assert calls == [result.folds[-1]['train'][1]]
+        assert model.order == result.models['ARIMAModel'].order == (1, 1, 0)
+        assert model.get_params() == {'order': 'auto'}
+
+        print(f"Поисков порядка: {len(calls)}")
+        print("✅ Подбор порядка ARIMA в Backtester работает корректно")
@@ -1,5 +1,5 @@
 from io import BytesIO
-from typing import Callable, Optional, Union
+from typing import Callable, List, Optional, Union
 from telegram import InputMediaPhoto, Update, InlineKeyboardButton, InlineKeyboardMarkup, WebAppInfo
 from telegram.ext import (
     Application,
@@ -13,6 +13,7 @@ from telegram.ext import (
 import inspect
 
 from view.base import MViewItem
+from services import metrics
 from router.router import Router
 from telegram.error import BadRequest
 
@@ -25,11 +26,17 @@ class TelegramClient:
         self.router: Optional[Router] = None
         # Добавляем обработчик состояния (по умолчанию None)
         self.state_handler: Optional[Callable] = None
+        # Вызываются при остановке бота (сброс буферов, закрытие ресурсов)
+        self.shutdown_hooks: List[Callable] = []
 
     def set_state_handler(self, handler: Callable):
         """Устанавливает функцию-обработчик состояния, которая будет вызываться перед отправкой сообщений."""
         self.state_handler = handler
 
+    def add_shutdown_hook(self, hook: Callable):
+        """Функция (обычная или async), вызываемая в stop() после остановки бота"""
+        self.shutdown_hooks.append(hook)
+
     async def init(self, callback=None, router: Optional['Router'] = None):
         """Инициализация бота"""
         self.router = router
@@ -134,6 +141,7 @@ class TelegramClient:
         else:
             raise Exception('Ошибка: не удалось найти router')
 
+    @metrics.timed('telegram_api', method='render_text')
     async def _render_text(
         self,
         text: str,
@@ -168,6 +176,7 @@ class TelegramClient:
             )
             return msg.message_id
 
+    @metrics.timed('telegram_api', method='render_photo')
     async def _render_photo(
         self,
         chat_id: int,
@@ -220,6 +229,7 @@ class TelegramClient:
             return InlineKeyboardMarkup(buttons)
         return None
 
+    @metrics.timed('telegram_api', method='delete_message')
     async def delete_message(self, message_id: int | None, **kwargs) -> bool:
 
         update = kwargs.get('update')
@@ -243,6 +253,14 @@ class TelegramClient:
             await self.application.shutdown()
         self._is_running = False
 
+        for hook in self.shutdown_hooks:
+            try:
+                result = hook()
+                if inspect.isawaitable(result):
+                    await result
+            except Exception as e:
+                print(f"Shutdown hook error: {e}")
+
     async def _render_item(
         self,
         item: MViewItem,
@@ -312,6 +330,10 @@ class TelegramClient:
             # Для текстового поля просто просим ввести текст
             buttons = []
             form_field.message_id = message_id
+            # Шаг формы уже сохранен в сессии до рендера: без повторного сохранения
+            # message_id не попадет в дисковое хранилище
+            if self.router:
+                self.router.set_current_item(chat_id, item)
             if item.current_form_step > 0:
                 buttons.append([InlineKeyboardButton("← Назад", callback_data=f"form_back:{item.current_form_step}")])
             else:
@@ -337,8 +359,8 @@ class TelegramClient:
         if not self.router:
             return
 
-        current_item = self.router.get_current_item()
-        if (current_item := self.router.get_current_item()) and getattr(current_item, 'form_fields', None):
+        chat_id = update.effective_chat.id
+        if (current_item := self.router.get_current_item(chat_id)) and getattr(current_item, 'form_fields', None):
             form_field = current_item.getFormField(current_item.current_form_step)
             if form_field.field_type in ['text', 'number', 'email']:  # Добавьте нужные типы
                 form_field.current_value = update.message.text.strip()
@@ -354,6 +376,7 @@ class TelegramClient:
     async def _process_form_step(self, current_item, update):
         """Обрабатывает переход между шагами формы"""
         current_item.current_form_step += 1
+        self._save_form(current_item, update)
 
         # Если есть следующие шаги - показываем следующий
         if current_item.current_form_step < len(current_item.form_fields):
@@ -406,7 +429,7 @@ class TelegramClient:
 
     async def _handle_form_actions(self, action, callback_query, update):
         """Обрабатывает основные действия формы"""
-        current_item = self.getRouter().get_current_item()
+        current_item = self.getRouter().get_current_item(update.effective_chat.id)
 
         if not self._is_valid_form(current_item):
             await callback_query.answer("Форма не активна")
@@ -417,11 +440,12 @@ class TelegramClient:
             await self.router.handle(current_item.form_complete, update=update, request=form_data)
         else:  # form_edit
             current_item.current_form_step = 0
+            self._save_form(current_item, update)
             await self.render_message(content=current_item, update=update)
 
     async def _handle_form_navigation(self, callback_data, callback_query, update):
         """Обрабатывает навигацию по форме"""
-        current_item = self.getRouter().get_current_item()
+        current_item = self.getRouter().get_current_item(update.effective_chat.id)
 
         if not self._is_valid_form(current_item):
             await callback_query.answer("Форма не активна")
@@ -439,8 +463,13 @@ class TelegramClient:
         elif callback_data.startswith("form_back:"):
             step = int(callback_data.split(":")[1])
             current_item.current_form_step = max(0, step - 1) if step > 0 else 0
+            self._save_form(current_item, update)
             await self.render_message(content=current_item, update=update)
 
+    def _save_form(self, current_item: MViewItem, update):
+        """Сохраняет прогресс формы в сессии чата (нужно для дискового хранилища)"""
+        self.getRouter().set_current_item(update.effective_chat.id, current_item)
+
     def _is_valid_form(self, current_item):
         """Проверяет валидность формы"""
         return (current_item and